@@ -100,6 +100,7 @@ kw = {
         "smartcard.scard",
         "smartcard.sw",
         "smartcard.util",
+        "smartcard.virtual",
         "smartcard.wx",
     ],
     "package_dir": {"": "src"},
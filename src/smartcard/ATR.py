@@ -295,6 +295,49 @@ class ATR:
         """Return True if T=15 is supported."""
         return "T=15" in self.getSupportedProtocols()
 
+    def getCardCapabilities(self) -> list[int] | None:
+        """Return the card capabilities bytes of the historical bytes.
+
+        The card capabilities are the compact-TLV data object with tag 7,
+        defined in ISO 7816-4, section 12.1.1.
+
+        @return: the 1 to 3 card capabilities bytes, or None if the
+            historical bytes do not contain card capabilities
+        """
+        hb = self.historicalBytes
+        if not hb:
+            return None
+        if hb[0] == 0x80:
+            objects = hb[1:]
+        elif hb[0] == 0x00:
+            # the last 3 bytes are the status indicator
+            objects = hb[1:-3]
+        else:
+            return None
+        offset = 0
+        while offset < len(objects):
+            tag = objects[offset] >> 4
+            length = objects[offset] & 0x0F
+            if tag == 7:
+                return objects[offset + 1 : offset + 1 + length]
+            offset += 1 + length
+        return None
+
+    def isCommandChainingSupported(self) -> bool:
+        """Return True if the card capabilities announce command chaining."""
+        capabilities = self.getCardCapabilities()
+        if capabilities is None or len(capabilities) < 3:
+            return False
+        return bool(capabilities[2] & 0x80)
+
+    def isExtendedLengthSupported(self) -> bool:
+        """Return True if the card capabilities announce extended Lc and
+        Le fields."""
+        capabilities = self.getCardCapabilities()
+        if capabilities is None or len(capabilities) < 3:
+            return False
+        return bool(capabilities[2] & 0x40)
+
     def render(self) -> str:
         """Render the ATR to a readable format."""
 
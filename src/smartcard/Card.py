@@ -43,10 +43,10 @@ class Card:
         return toHexString(self.atr) + " / " + str(self.reader)
 
     def __eq__(self, other):
-        """Return True if self==other (same reader and same atr).
+        """Return True if self==other (same reader name and same atr).
         Return False otherwise."""
         if isinstance(other, Card):
-            return self.atr == other.atr and repr(self.reader) == repr(other.reader)
+            return self._key() == other._key()
 
         return False
 
@@ -56,8 +56,14 @@ class Card:
         return not self.__eq__(other)
 
     def __hash__(self):
-        """Returns a hash value for this object (str(self) is unique)."""
-        return hash(str(self))
+        """Returns a hash value for this object, consistent with
+        equality."""
+        return hash(self._key())
+
+    def _key(self):
+        """Return the (reader name, ATR bytes) identifying the card, so
+        that cards can be compared and hashed without formatting them."""
+        return str(self.reader), None if self.atr is None else bytes(self.atr)
 
     def createConnection(self):
         """Return a CardConnection to the Card object."""
@@ -23,13 +23,47 @@ along with pyscard; if not, write to the Free Software
 Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 """
 
-from smartcard.CardConnectionEvent import CardConnectionEvent
+from smartcard.CardConnectionEvent import EVENT_TYPES, CardConnectionEvent
+from smartcard.Exceptions import CardConnectionException, SmartcardException
 from smartcard.Observer import Observable
 
 
+def _expectedLength(command):
+    """Return the maximum length of the response data to a command APDU,
+    from its Le field; 0 if the command has no Le field or is not a valid
+    APDU."""
+    length = len(command)
+    if length == 5:
+        return command[4] or 256
+    if length < 7:
+        return 0
+    if command[4] != 0:
+        # short APDU with data
+        return (command[-1] or 256) if length == 6 + command[4] else 0
+    if length not in (7, 9 + (command[5] << 8 | command[6])):
+        return 0
+    return (command[-2] << 8 | command[-1]) or 65536
+
+
+def swaccepted(stop_on, sw1, sw2):
+    """Check status words against the stop_on list of
+    L{CardConnection.transmit_many()}.
+
+    @param stop_on: None, or list of accepted status words; an item lower
+        than 0x100 is a SW1 value accepting any SW2
+
+    @return: True if stop_on is None or accepts sw1 sw2
+    """
+    if stop_on is None:
+        return True
+    return sw1 in stop_on or (sw1 << 8 | sw2) in stop_on
+
+
 class CardConnection(Observable):
     """Card connection abstract class."""
 
+    # pylint: disable=too-many-public-methods
+
     T0_protocol = 0x00000001
     """ protocol T=0 """
 
@@ -55,6 +89,10 @@ class CardConnection(Observable):
         """ see L{setErrorCheckingChain} """
         self.defaultprotocol = CardConnection.T0_protocol | CardConnection.T1_protocol
         """ see L{setProtocol} and L{getProtocol} """
+        self.subscriptions = {}
+        """ event types subscribed by each observer id, None for all """
+        self.eventobservers = {}
+        """ tuple of the observers of each event type, see L{addObserver} """
 
     def __del__(self):
         """Connect to card."""
@@ -70,13 +108,51 @@ class CardConnection(Observable):
         if self.errorcheckingchain is not None:
             self.errorcheckingchain[0].addFilterException(exClass)
 
-    def addObserver(self, observer):
-        """Add a L{CardConnection} observer."""
-        Observable.addObserver(self, observer)
+    def addObserver(self, observer, events=None):
+        """Add a L{CardConnection} observer.
+
+        @param observer: the L{CardConnectionObserver}
+        @param events:   the types of the L{CardConnectionEvent} to notify
+            to the observer, e.g. {"response"}, or None for all the events.
+            Adding an observer again replaces its event types.
+
+        Events of types no observer subscribed to are not built."""
+        if events is not None:
+            events = frozenset(events)
+            if not events <= EVENT_TYPES:
+                raise ValueError(f"unknown event types: {set(events - EVENT_TYPES)}")
+        with self.mutex:
+            Observable.addObserver(self, observer)
+            self.subscriptions[id(observer)] = events
+            self._publishObservers()
 
     def deleteObserver(self, observer):
         """Remove a L{CardConnection} observer."""
-        Observable.deleteObserver(self, observer)
+        with self.mutex:
+            Observable.deleteObserver(self, observer)
+            self._publishObservers()
+
+    def deleteObservers(self):
+        """Remove all the L{CardConnection} observers."""
+        with self.mutex:
+            Observable.deleteObservers(self)
+            self._publishObservers()
+
+    def _publishObservers(self):
+        """Build the tuples of observers per event type, replaced and
+        not modified so that they can be read without lock."""
+        self.subscriptions = {
+            id(observer): self.subscriptions.get(id(observer)) for observer in self.obs
+        }
+        eventobservers = {}
+        for observer in self.obs:
+            events = self.subscriptions[id(observer)]
+            for eventtype in EVENT_TYPES if events is None else events:
+                eventobservers.setdefault(eventtype, []).append(observer)
+        self.eventobservers = {
+            eventtype: tuple(observers)
+            for eventtype, observers in eventobservers.items()
+        }
 
     def connect(self, protocol=None, mode=None, disposition=None):
         """Connect to card.
@@ -94,8 +170,8 @@ class CardConnection(Observable):
         C{smartcard.scard.SCARD_EJECT_CARD}
         """
         # pylint: disable=unused-argument
-        Observable.setChanged(self)
-        Observable.notifyObservers(self, CardConnectionEvent("connect"))
+        if "connect" in self.eventobservers:
+            self._notify("connect")
 
     def reconnect(self, protocol=None, mode=None, disposition=None):
         """Reconnect to card.
@@ -113,18 +189,18 @@ class CardConnection(Observable):
         C{smartcard.scard.SCARD_EJECT_CARD}
         """
         # pylint: disable=unused-argument
-        Observable.setChanged(self)
-        Observable.notifyObservers(self, CardConnectionEvent("reconnect"))
+        if "reconnect" in self.eventobservers:
+            self._notify("reconnect")
 
     def disconnect(self):
         """Disconnect from card."""
-        Observable.setChanged(self)
-        Observable.notifyObservers(self, CardConnectionEvent("disconnect"))
+        if "disconnect" in self.eventobservers:
+            self._notify("disconnect")
 
     def release(self):
         """Release the context."""
-        Observable.setChanged(self)
-        Observable.notifyObservers(self, CardConnectionEvent("release"))
+        if "release" in self.eventobservers:
+            self._notify("release")
 
     def getATR(self):
         """Return card ATR"""
@@ -160,27 +236,30 @@ class CardConnection(Observable):
         """
         self.defaultprotocol = protocol
 
-    def transmit(self, command, protocol=None):
+    def transmit(self, command, protocol=None, as_bytes=False):
         """Transmit an apdu. Internally calls L{doTransmit()} class method
         and notify observers upon command/response APDU events.
         Subclasses must override the L{doTransmit()} class method.
 
-        @param command:    list of bytes to transmit
+        @param command:    list of bytes (or bytes-like object) to transmit
 
         @param protocol:   the transmission protocol, from
                     L{CardConnection.T0_protocol},
                     L{CardConnection.T1_protocol}, or
                     L{CardConnection.RAW_protocol}
+
+        @param as_bytes:   if True, the response data is returned as an
+                    immutable bytes object, using L{doTransmitBytes()},
+                    instead of a list of bytes
         """
-        Observable.setChanged(self)
-        Observable.notifyObservers(
-            self, CardConnectionEvent("command", [command, protocol])
-        )
-        data, sw1, sw2 = self.doTransmit(command, protocol)
-        Observable.setChanged(self)
-        Observable.notifyObservers(
-            self, CardConnectionEvent("response", [data, sw1, sw2])
-        )
+        if "command" in self.eventobservers:
+            self._notify("command", [command, protocol])
+        if as_bytes:
+            data, sw1, sw2 = self.doTransmitBytes(command, protocol)
+        else:
+            data, sw1, sw2 = self.doTransmit(command, protocol)
+        if "response" in self.eventobservers:
+            self._notify("response", [data, sw1, sw2])
         if self.errorcheckingchain is not None:
             self.errorcheckingchain[0](data, sw1, sw2)
         return data, sw1, sw2
@@ -193,6 +272,165 @@ class CardConnection(Observable):
         # pylint: disable=unused-argument
         return [], 0, 0
 
+    def doTransmitBytes(self, command, protocol):
+        """Performs the command APDU transmission and returns the response
+        data as a bytes object.
+
+        The default implementation converts the result of L{doTransmit()}.
+        Subclasses may override this method to build the bytes response
+        directly."""
+        data, sw1, sw2 = self.doTransmit(command, protocol)
+        return bytes(data), sw1, sw2
+
+    def transmit_many(self, commands, protocol=None, stop_on=None, as_bytes=False):
+        """Transmit a sequence of apdus. Internally calls
+        L{doTransmitMany()} class method, then notify observers upon the
+        command/response APDU events of all the transmitted apdus.
+
+        @param commands:   list of apdus to transmit, each a list of bytes
+                    or a bytes-like object
+
+        @param protocol:   the transmission protocol, from
+                    L{CardConnection.T0_protocol},
+                    L{CardConnection.T1_protocol}, or
+                    L{CardConnection.RAW_protocol}
+
+        @param stop_on:    None to transmit all the apdus, or a list of
+                    accepted status words, e.g. [0x9000, 0x61]; the sequence
+                    stops after the first response with a status word not
+                    in the list. An item lower than 0x100 is a SW1 value
+                    accepting any SW2.
+
+        @param as_bytes:   if True, the response data are bytes objects
+                    instead of lists of bytes
+
+        @return:     the list of (response, sw1, sw2) tuples of the
+                    transmitted apdus
+
+        If the transmission fails after some apdus reached the card, the
+        observers are notified of these apdus, and the
+        L{SmartcardException} raised has a responses attribute, the list
+        of their (response, sw1, sw2) tuples.
+        """
+        commands = list(commands)
+        try:
+            responses = self.doTransmitMany(commands, protocol, stop_on)
+        except SmartcardException as exc:
+            responses = getattr(exc, "responses", None)
+            if responses:
+                exc.responses = self._transmitted(
+                    commands, responses, protocol, as_bytes
+                )
+            raise
+        responses = self._transmitted(commands, responses, protocol, as_bytes)
+        if self.errorcheckingchain is not None:
+            for data, sw1, sw2 in responses:
+                self.errorcheckingchain[0](data, sw1, sw2)
+        return responses
+
+    def _transmitted(self, commands, responses, protocol, as_bytes):
+        """Notify the observers of the transmitted apdus of a sequence.
+
+        @return: the responses, the data as lists of bytes unless as_bytes
+        """
+        if not as_bytes:
+            responses = [(list(data), sw1, sw2) for data, sw1, sw2 in responses]
+        commandobserved = "command" in self.eventobservers
+        responseobserved = "response" in self.eventobservers
+        if commandobserved or responseobserved:
+            for command, (data, sw1, sw2) in zip(commands, responses):
+                if commandobserved:
+                    self._notify("command", [command, protocol])
+                if responseobserved:
+                    self._notify("response", [data, sw1, sw2])
+        return responses
+
+    def doTransmitMany(self, commands, protocol, stop_on):
+        """Performs the transmission of a sequence of command APDUs and
+        returns the list of (bytes, sw1, sw2) responses.
+
+        The default implementation calls L{doTransmitBytes()} for each
+        apdu. Subclasses may override this method to transmit the whole
+        sequence at once. If the transmission fails, the exception raised
+        has a responses attribute, the responses received before the
+        failure."""
+        responses = []
+        for command in commands:
+            try:
+                data, sw1, sw2 = self.doTransmitBytes(command, protocol)
+            except SmartcardException as exc:
+                exc.responses = responses
+                raise
+            responses.append((data, sw1, sw2))
+            if not swaccepted(stop_on, sw1, sw2):
+                break
+        return responses
+
+    def transmit_into(self, command, outbuf, protocol=None):
+        """Transmit an apdu and write the response data into a caller
+        supplied buffer. Internally calls L{doTransmitInto()} class method
+        and notify observers upon command/response APDU events.
+
+        @param command:    list of bytes (or bytes-like object) to transmit
+
+        @param outbuf:     writable bytes-like object, e.g. a bytearray, a
+                    memoryview or a mmap, receiving the response data
+
+        @param protocol:   the transmission protocol, from
+                    L{CardConnection.T0_protocol},
+                    L{CardConnection.T1_protocol}, or
+                    L{CardConnection.RAW_protocol}
+
+        @return:     a tuple (length, sw1, sw2) where length is the number
+                    of response bytes written into outbuf
+
+        A command whose Le field is larger than outbuf is not transmitted,
+        and raises L{CardConnectionException}: its response would be
+        lost after the card executed it. The response data view notified
+        to the observers is released after the notification.
+        """
+        with memoryview(outbuf) as view:
+            size = view.nbytes
+        expected = _expectedLength(command)
+        if expected > size:
+            raise CardConnectionException(
+                f"Response of up to {expected} bytes does not fit in buffer "
+                f"of {size} bytes"
+            )
+        if "command" in self.eventobservers:
+            self._notify("command", [command, protocol])
+        length, sw1, sw2 = self.doTransmitInto(command, outbuf, protocol)
+        responseobserved = "response" in self.eventobservers
+        if responseobserved or self.errorcheckingchain is not None:
+            # release the views, so that outbuf can be resized or closed
+            with memoryview(outbuf) as view:
+                with view.cast("B")[:length].toreadonly() as data:
+                    if responseobserved:
+                        # outbuf may be reused before an asynchronous dispatch
+                        event = bytes(data) if self.dispatcher is not None else data
+                        self._notify("response", [event, sw1, sw2])
+                    if self.errorcheckingchain is not None:
+                        self.errorcheckingchain[0](data, sw1, sw2)
+        return length, sw1, sw2
+
+    def doTransmitInto(self, command, outbuf, protocol):
+        """Performs the command APDU transmission and writes the response
+        data into outbuf.
+
+        The default implementation copies the result of
+        L{doTransmitBytes()}. Subclasses may override this method to
+        receive the response directly into outbuf."""
+        data, sw1, sw2 = self.doTransmitBytes(command, protocol)
+        length = len(data)
+        with memoryview(outbuf) as view:
+            if length > view.nbytes:
+                raise CardConnectionException(
+                    f"Response of {length} bytes does not fit in buffer "
+                    f"of {view.nbytes} bytes"
+                )
+            view.cast("B")[:length] = data
+        return length, sw1, sw2
+
     def control(self, controlCode, command=None):
         """Send a control command and buffer.  Internally calls
         L{doControl()} class method and notify observers upon
@@ -205,13 +443,11 @@ class CardConnection(Observable):
         """
         if command is None:
             command = []
-        Observable.setChanged(self)
-        Observable.notifyObservers(
-            self, CardConnectionEvent("command", [controlCode, command])
-        )
+        if "command" in self.eventobservers:
+            self._notify("command", [controlCode, command])
         data = self.doControl(controlCode, command)
-        Observable.setChanged(self)
-        Observable.notifyObservers(self, CardConnectionEvent("response", data))
+        if "response" in self.eventobservers:
+            self._notify("response", data)
         if self.errorcheckingchain is not None:
             self.errorcheckingchain[0](data)
         return data
@@ -229,8 +465,8 @@ class CardConnection(Observable):
         @param attribId: attribute id like
         C{smartcard.scard.SCARD_ATTR_VENDOR_NAME}
         """
-        Observable.setChanged(self)
-        Observable.notifyObservers(self, CardConnectionEvent("attrib", [attribId]))
+        if "attrib" in self.eventobservers:
+            self._notify("attrib", [attribId])
         data = self.doGetAttrib(attribId)
         if self.errorcheckingchain is not None:
             self.errorcheckingchain[0](data)
@@ -243,6 +479,18 @@ class CardConnection(Observable):
         # pylint: disable=unused-argument
         return []
 
+    def _notify(self, eventtype, args=None):
+        """Notify the observers of a L{CardConnectionEvent}.
+
+        The callers check first that the event type has observers, so that
+        no event is built and no lock is taken when there is none."""
+        Observable.setChanged(self)
+        Observable.notifyObservers(
+            self,
+            CardConnectionEvent(eventtype, args),
+            self.eventobservers.get(eventtype, ()),
+        )
+
     def __enter__(self):
         """Enter the runtime context."""
         return self
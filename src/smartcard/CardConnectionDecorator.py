@@ -39,9 +39,13 @@ class CardConnectionDecorator:
         """call inner component addSWExceptionToFilter"""
         self.component.addSWExceptionToFilter(exClass)
 
-    def addObserver(self, observer):
+    def addObserver(self, observer, events=None):
         """call inner component addObserver"""
-        self.component.addObserver(observer)
+        if events is None:
+            # inner components may predate event filtering
+            self.component.addObserver(observer)
+        else:
+            self.component.addObserver(observer, events=events)
 
     def deleteObserver(self, observer):
         """call inner component deleteObserver"""
@@ -83,10 +87,28 @@ class CardConnectionDecorator:
         """call inner component setProtocol"""
         return self.component.setProtocol(protocol)
 
-    def transmit(self, command, protocol=None):
+    def setAutoGetResponse(self, enable=True):
+        """call inner component setAutoGetResponse"""
+        return self.component.setAutoGetResponse(enable)
+
+    def transmit(self, command, protocol=None, as_bytes=False):
         """call inner component transmit"""
+        # as_bytes is passed only when set, to components overriding
+        # transmit(command, protocol)
+        if as_bytes:
+            return self.component.transmit(command, protocol, as_bytes=True)
         return self.component.transmit(command, protocol)
 
+    def transmit_many(self, commands, protocol=None, stop_on=None, as_bytes=False):
+        """call inner component transmit_many"""
+        return self.component.transmit_many(
+            commands, protocol, stop_on=stop_on, as_bytes=as_bytes
+        )
+
+    def transmit_into(self, command, outbuf, protocol=None):
+        """call inner component transmit_into"""
+        return self.component.transmit_into(command, outbuf, protocol)
+
     def control(self, controlCode, command=None):
         """call inner component control"""
         if command is None:
@@ -25,6 +25,11 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
 # pylint: disable=too-few-public-methods
 
+EVENT_TYPES = frozenset(
+    ("connect", "reconnect", "disconnect", "release", "command", "response", "attrib")
+)
+""" the types of the events notified by CardConnection objects """
+
 
 class CardConnectionEvent:
     """Base class for card connection events.
@@ -33,7 +38,8 @@ class CardConnectionEvent:
 
     def __init__(self, event_type, args=None):
         """
-        @param event_type:   'connect', 'reconnect', 'disconnect', 'command', 'response'
+        @param event_type:   'connect', 'reconnect', 'disconnect', 'release',
+                'command', 'response' or 'attrib'
         @param args:   None for 'connect', 'reconnect' or 'disconnect'
                 command APDU byte list for 'command'
                 [response data, sw1, sw2] for 'response'
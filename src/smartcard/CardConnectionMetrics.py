@@ -0,0 +1,516 @@
+"""CardConnectionMetrics: per-APDU latency histograms and status word
+counters of card connections, exported in the OpenMetrics text format
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import http.server
+import threading
+import time
+import typing
+import weakref
+
+from smartcard.CardConnectionDecorator import CardConnectionDecorator
+
+SUB_BUCKETS = 16
+""" the number of buckets of a histogram per power of two, i.e. a
+relative precision of 1/16 """
+
+BOUNDS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+""" the bucket bounds of the exported histograms, in seconds """
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _bucket(ns):
+    """Return the index of the histogram bucket of a duration: values
+    lower than 32 ns have their own bucket, larger values are bucketed
+    by their 5 most significant bits."""
+    if ns < 2 * SUB_BUCKETS:
+        return max(ns, 0)
+    exponent = ns.bit_length()
+    return ((exponent - 4) << 4) + (ns >> (exponent - 5)) - SUB_BUCKETS
+
+
+def _bucketBounds(index):
+    """Return the [lower, upper) bounds of a histogram bucket, in ns."""
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+    shift = (index >> 4) + 4 - 5
+    mantissa = (index & 15) + SUB_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """HDR-style histogram of durations, in nanoseconds, with log-linear
+    buckets of 1/16 relative width, stored sparsely."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        """ the sum of the durations """
+        self.min = None
+        self.max = None
+        self.buckets = {}
+        """ the count of each bucket index """
+
+    def record(self, ns):
+        """Record a duration.
+
+        @param ns: the duration in nanoseconds
+        """
+        index = _bucket(ns)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if self.max is None or ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        """Add the durations of another histogram."""
+        for index, count in other.buckets.copy().items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """Return a percentile of the durations.
+
+        @param percent: the percentile, from 0 to 100
+
+        @return: the upper bound of the bucket of the percentile, in ns,
+            capped by the maximum duration; None if the histogram is empty
+        """
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(_bucketBounds(index)[1] - 1, self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """Return the number of durations lower than each bound.
+
+        @param bounds: increasing bounds, in nanoseconds
+
+        @return: the list of counts, a duration being counted for a bound
+            if the upper bound of its bucket is not greater than the bound
+        """
+        counts = [0] * len(bounds)
+        for index, count in self.buckets.items():
+            upper = _bucketBounds(index)[1] - 1
+            for i, bound in enumerate(bounds):
+                if upper <= bound:
+                    counts[i] += count
+        return counts
+
+
+class MetricsSnapshot(typing.NamedTuple):
+    """Merged metrics of all the threads."""
+
+    latencies: dict
+    """ the L{LatencyHistogram} of each (reader, phase, cla, ins) key,
+    cla and ins being None for the phases other than transmit """
+    sws: dict
+    """ the count of each (reader, cla, ins, sw) key, sw being the 16
+    bits status word """
+    errors: dict
+    """ the count of exceptions of each (reader, phase) key """
+
+
+class _ThreadMetrics:
+    """The metrics recorded by one thread."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self.latencies = {}
+        self.sws = {}
+        self.errors = {}
+
+    def merge(self, other):
+        """Add the metrics of another thread."""
+        for key, histogram in other.latencies.copy().items():
+            self.latencies.setdefault(key, LatencyHistogram()).merge(histogram)
+        for counts, merged in ((other.sws, self.sws), (other.errors, self.errors)):
+            for key, count in counts.copy().items():
+                merged[key] = merged.get(key, 0) + count
+
+
+class _ThreadToken:  # pylint: disable=too-few-public-methods
+    """Thread-local object released when its thread ends."""
+
+
+class Metrics:
+    """Registry of the latency histograms, status word counters and error
+    counters of card connections.
+
+    Each thread records into its own histograms and counters, with no
+    lock; L{snapshot()} merges them. A snapshot taken while other
+    threads record may miss their last records. The metrics of a thread
+    are folded into the retired metrics when the thread ends, so that
+    short-lived threads do not accumulate."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.retired = _ThreadMetrics()
+        """ the merged metrics of the ended threads """
+
+    def _thread(self):
+        """Return the metrics of the calling thread."""
+        try:
+            return self.local.metrics
+        except AttributeError:
+            metrics = self.local.metrics = _ThreadMetrics()
+            with self.lock:
+                self.threads.append(metrics)
+            # the thread-local token is released when the thread ends
+            self.local.token = _ThreadToken()
+            weakref.finalize(self.local.token, self._retire, metrics).atexit = False
+            return metrics
+
+    def _retire(self, metrics):
+        """Fold the metrics of an ended thread into the retired metrics."""
+        with self.lock:
+            self.threads.remove(metrics)
+            self.retired.merge(metrics)
+
+    def record(self, reader, phase, ns, cla=None, ins=None):
+        """Record the duration of an operation.
+
+        @param reader: the reader name
+        @param phase: the operation, e.g. "transmit"
+        @param ns: the duration in nanoseconds
+        @param cla: the class byte of a command APDU
+        @param ins: the instruction byte of a command APDU
+        """
+        latencies = self._thread().latencies
+        key = (reader, phase, cla, ins)
+        histogram = latencies.get(key)
+        if histogram is None:
+            histogram = latencies[key] = LatencyHistogram()
+        histogram.record(ns)
+
+    def countSW(self, reader, sw1, sw2, cla=None, ins=None):
+        """Count a response status word.
+
+        @param reader: the reader name
+        @param sw1: the SW1 of the response
+        @param sw2: the SW2 of the response
+        @param cla: the class byte of the command APDU
+        @param ins: the instruction byte of the command APDU
+        """
+        sws = self._thread().sws
+        key = (reader, cla, ins, sw1 << 8 | sw2)
+        sws[key] = sws.get(key, 0) + 1
+
+    def countError(self, reader, phase):
+        """Count an exception raised by an operation.
+
+        @param reader: the reader name
+        @param phase: the operation, e.g. "transmit"
+        """
+        errors = self._thread().errors
+        key = (reader, phase)
+        errors[key] = errors.get(key, 0) + 1
+
+    def snapshot(self):
+        """Return the L{MetricsSnapshot} of the metrics of all the
+        threads."""
+        merged = _ThreadMetrics()
+        with self.lock:
+            threads = list(self.threads)
+            merged.merge(self.retired)
+        for metrics in threads:
+            merged.merge(metrics)
+        return MetricsSnapshot(merged.latencies, merged.sws, merged.errors)
+
+    def reset(self):
+        """Clear the metrics of all the threads."""
+        with self.lock:
+            self.retired = _ThreadMetrics()
+            for metrics in self.threads:
+                metrics.latencies = {}
+                metrics.sws = {}
+                metrics.errors = {}
+
+
+_metrics = Metrics()
+
+
+def getMetrics():
+    """Return the process-wide L{Metrics}."""
+    return _metrics
+
+
+def _commandHeader(command):
+    """Return the (CLA, INS) of a command APDU, (None, None) if too
+    short."""
+    if len(command) < 2:
+        return None, None
+    return command[0], command[1]
+
+
+class MetricsCardConnection(CardConnectionDecorator):
+    """This decorator records the duration of the operations of a card
+    connection in the L{Metrics}, e.g. of a L{PCSCCardConnection}:
+
+        >>> connection = MetricsCardConnection(reader.createConnection())
+
+    The durations are keyed by reader and phase: connect, reconnect,
+    transmit, control and getAttrib. The transmit durations are keyed by
+    the (CLA, INS) of the command too, and the status words of the
+    responses are counted. The duration of a L{transmit_many()} is
+    evenly shared among the transmitted APDUs.
+
+    An operation raising an exception is counted as an error, and its
+    duration recorded."""
+
+    def __init__(self, cardconnection, metrics=None):
+        """Construct a new metrics card connection decorator.
+
+        @param cardconnection: the decorated card connection
+        @param metrics: the L{Metrics}; default is L{getMetrics()}
+        """
+        CardConnectionDecorator.__init__(self, cardconnection)
+        self.metrics = metrics if metrics is not None else getMetrics()
+        self.readername = str(cardconnection.getReader())
+
+    def _timed(self, phase, function, *args):
+        """Call a function of the component, and record its duration."""
+        start = time.perf_counter_ns()
+        try:
+            return function(*args)
+        except Exception:
+            self.metrics.countError(self.readername, phase)
+            raise
+        finally:
+            self.metrics.record(self.readername, phase, time.perf_counter_ns() - start)
+
+    def connect(self, protocol=None, mode=None, disposition=None):
+        """call inner component connect, timed"""
+        self._timed("connect", self.component.connect, protocol, mode, disposition)
+
+    def reconnect(self, protocol=None, mode=None, disposition=None):
+        """call inner component reconnect, timed"""
+        self._timed("reconnect", self.component.reconnect, protocol, mode, disposition)
+
+    def _transmitted(self, command, start, sw1, sw2):
+        """Record a transmit and its status word."""
+        ns = time.perf_counter_ns() - start
+        cla, ins = _commandHeader(command)
+        self.metrics.record(self.readername, "transmit", ns, cla, ins)
+        self.metrics.countSW(self.readername, sw1, sw2, cla, ins)
+
+    def _transmitError(self, command, start):
+        """Record a transmit raising an exception."""
+        ns = time.perf_counter_ns() - start
+        cla, ins = _commandHeader(command)
+        self.metrics.record(self.readername, "transmit", ns, cla, ins)
+        self.metrics.countError(self.readername, "transmit")
+
+    def transmit(self, command, protocol=None, as_bytes=False):
+        """call inner component transmit, timed"""
+        start = time.perf_counter_ns()
+        try:
+            data, sw1, sw2 = CardConnectionDecorator.transmit(
+                self, command, protocol, as_bytes=as_bytes
+            )
+        except Exception:
+            self._transmitError(command, start)
+            raise
+        self._transmitted(command, start, sw1, sw2)
+        return data, sw1, sw2
+
+    def transmit_into(self, command, outbuf, protocol=None):
+        """call inner component transmit_into, timed"""
+        start = time.perf_counter_ns()
+        try:
+            length, sw1, sw2 = self.component.transmit_into(command, outbuf, protocol)
+        except Exception:
+            self._transmitError(command, start)
+            raise
+        self._transmitted(command, start, sw1, sw2)
+        return length, sw1, sw2
+
+    def transmit_many(self, commands, protocol=None, stop_on=None, as_bytes=False):
+        """call inner component transmit_many, timed"""
+        # the commands are needed after the transmits, e.g. of a generator
+        commands = list(commands)
+        start = time.perf_counter_ns()
+        try:
+            responses = CardConnectionDecorator.transmit_many(
+                self, commands, protocol, stop_on=stop_on, as_bytes=as_bytes
+            )
+        except Exception as exc:
+            self.metrics.countError(self.readername, "transmit")
+            self._transmittedMany(commands, start, getattr(exc, "responses", []))
+            raise
+        self._transmittedMany(commands, start, responses)
+        return responses
+
+    def _transmittedMany(self, commands, start, responses):
+        """Record the transmits of a transmit_many()."""
+        if responses:
+            ns = (time.perf_counter_ns() - start) // len(responses)
+            for command, (_data, sw1, sw2) in zip(commands, responses):
+                cla, ins = _commandHeader(command)
+                self.metrics.record(self.readername, "transmit", ns, cla, ins)
+                self.metrics.countSW(self.readername, sw1, sw2, cla, ins)
+
+    def control(self, controlCode, command=None):
+        """call inner component control, timed"""
+        if command is None:
+            command = []
+        return self._timed("control", self.component.control, controlCode, command)
+
+    def getAttrib(self, attribId):
+        """call inner component getAttrib, timed"""
+        return self._timed("getAttrib", self.component.getAttrib, attribId)
+
+
+def _labels(**labels):
+    """Format OpenMetrics labels, the None values omitted."""
+    escaped = []
+    for name, value in labels.items():
+        if value is None:
+            continue
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"'.replace("\n", "\\n"))
+    return "{" + ",".join(escaped) + "}"
+
+
+def _byte(value):
+    """Format a CLA or INS label value."""
+    return None if value is None else f"{value:02X}"
+
+
+def toOpenMetrics(snapshot=None, bounds=BOUNDS):
+    """Return metrics in the OpenMetrics text format.
+
+    @param snapshot: the L{MetricsSnapshot}; default is a snapshot of
+        L{getMetrics()}
+    @param bounds: the bucket bounds of the histograms, in seconds
+
+    @return: the text exposition, ending with "# EOF"
+    """
+    if snapshot is None:
+        snapshot = getMetrics().snapshot()
+    nsbounds = [int(bound * 1e9) for bound in bounds]
+    lines = [
+        "# TYPE pyscard_operation_duration_seconds histogram",
+        "# UNIT pyscard_operation_duration_seconds seconds",
+        "# HELP pyscard_operation_duration_seconds "
+        "Duration of the card connection operations.",
+    ]
+    for (reader, phase, cla, ins), histogram in sorted(
+        snapshot.latencies.items(), key=lambda item: repr(item[0])
+    ):
+        name = "pyscard_operation_duration_seconds"
+        counts = histogram.cumulative(nsbounds)
+        for bound, count in zip(bounds, counts):
+            labels = _labels(
+                reader=reader, phase=phase, cla=_byte(cla), ins=_byte(ins), le=bound
+            )
+            lines.append(f"{name}_bucket{labels} {count}")
+        labels = _labels(
+            reader=reader, phase=phase, cla=_byte(cla), ins=_byte(ins), le="+Inf"
+        )
+        lines.append(f"{name}_bucket{labels} {histogram.count}")
+        labels = _labels(reader=reader, phase=phase, cla=_byte(cla), ins=_byte(ins))
+        lines.append(f"{name}_count{labels} {histogram.count}")
+        lines.append(f"{name}_sum{labels} {histogram.total / 1e9}")
+    lines += [
+        "# TYPE pyscard_status_words counter",
+        "# HELP pyscard_status_words Status words of the responses.",
+    ]
+    for (reader, cla, ins, sw), count in sorted(
+        snapshot.sws.items(), key=lambda item: repr(item[0])
+    ):
+        labels = _labels(reader=reader, cla=_byte(cla), ins=_byte(ins), sw=f"{sw:04X}")
+        lines.append(f"pyscard_status_words_total{labels} {count}")
+    lines += [
+        "# TYPE pyscard_errors counter",
+        "# HELP pyscard_errors Exceptions raised by the card connection operations.",
+    ]
+    for (reader, phase), count in sorted(snapshot.errors.items()):
+        labels = _labels(reader=reader, phase=phase)
+        lines.append(f"pyscard_errors_total{labels} {count}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the OpenMetrics text of the process-wide metrics."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve /metrics."""
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = toOpenMetrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Do not log the requests."""
+
+
+def startHTTPServer(port, address=""):
+    """Serve the metrics at http://address:port/metrics, from a daemon
+    thread, e.g. to be scraped by Prometheus.
+
+    @param port: the TCP port, 0 for any free port
+    @param address: the address to listen on; default is all addresses
+
+    @return: the server; server.server_address is the address and port
+        it listens on, server.shutdown() stops it
+    """
+    server = http.server.ThreadingHTTPServer((address, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,328 @@
+"""CardConnectionRecorder: record the APDU traffic of card connections to a
+compact binary log, and read the log back
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import array
+import mmap
+import os
+import struct
+import threading
+import time
+import typing
+
+from smartcard.CardConnectionObserver import CardConnectionObserver
+
+MAGIC = b"PYSCAPDU"
+""" the first bytes of a log """
+
+VERSION = 1
+""" the version of the log format """
+
+HEADER = struct.Struct("<8sHHI")
+""" log header: magic, version, record header size, reserved """
+
+RECORD = struct.Struct("<IBBBBIq")
+""" record header: payload length, record type, sw1, sw2, reserved,
+value, timestamp; followed by the payload """
+
+# record types
+SESSION = 0
+""" a recorder started: value 0, the timestamp is the wall-clock time of
+the start, in nanoseconds since the epoch, and the timestamps of the
+following records are relative to the start """
+CONNECT = 1
+""" connect event: payload the reader name, in UTF-8 """
+RECONNECT = 2
+""" reconnect event """
+DISCONNECT = 3
+""" disconnect event """
+RELEASE = 4
+""" release event """
+ATR = 5
+""" the ATR of the connected card: payload the ATR """
+COMMAND = 6
+""" command APDU: value the protocol, 0 for the default, payload the APDU """
+RESPONSE = 7
+""" response APDU: sw1 and sw2, payload the response data """
+CONTROL = 8
+""" control command: value the control code, payload the command """
+CONTROL_RESPONSE = 9
+""" control response: payload the response """
+ATTRIB = 10
+""" getAttrib(): value the attribute id """
+ERROR = 11
+""" the previous command or control command got no response, e.g. the
+transmit raised an exception """
+
+_EVENT_RECORDS = {
+    "connect": CONNECT,
+    "reconnect": RECONNECT,
+    "disconnect": DISCONNECT,
+    "release": RELEASE,
+}
+
+
+class Record(typing.NamedTuple):
+    """A record of a log."""
+
+    type: int
+    sw1: int
+    sw2: int
+    value: int
+    timestamp: int
+    """ nanoseconds since the start of the session, or since the epoch for
+    a SESSION record """
+    payload: bytes
+    """ the payload, copied from the mapped log """
+
+
+class CardConnectionRecorder(CardConnectionObserver):
+    """Observer writing the events of card connections to an append-only
+    binary log:
+
+        >>> recorder = CardConnectionRecorder("session.apdu")
+        >>> connection.addObserver(recorder)
+        >>> ...
+        >>> recorder.close()
+
+    Each event is a record of a fixed size header, packed with
+    L{RECORD}, followed by the payload: the command or response bytes,
+    with no formatting. The writes are buffered; use L{flush()} to write
+    the buffered records.
+
+    The log keeps no connection id: record one connection per log to
+    replay it with L{smartcard.ReplayCardConnection.ReplayCardConnection}.
+    A command followed by no response, e.g. a transmit that raised, is
+    recorded as an L{ERROR} record on the next event.
+    The events of L{CardConnection.transmit_many()} are notified, so
+    recorded, after the whole sequence was transmitted."""
+
+    def __init__(self, path, buffering=1 << 20):
+        """Open a log for appending, and write the start of a session.
+
+        @param path: the path of the log, created if it does not exist
+        @param buffering: the size of the write buffer, in bytes
+        """
+        # pylint: disable-next=consider-using-with
+        self.file = open(path, "ab", buffering=buffering)
+        self.lock = threading.Lock()
+        self.start = time.perf_counter_ns()
+        self.control = False
+        self.atrpending = False
+        self.responsepending = False
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+        self.file.write(RECORD.pack(0, SESSION, 0, 0, 0, 0, time.time_ns()))
+
+    def write(self, recordtype, payload=b"", value=0, sw1=0, sw2=0):
+        """Write a record.
+
+        @param recordtype: the record type, e.g. L{COMMAND}
+        @param payload: the payload, a bytes-like object or list of bytes
+        @param value: the value of the record, e.g. the protocol
+        @param sw1: the SW1 of a response
+        @param sw2: the SW2 of a response
+        """
+        timestamp = time.perf_counter_ns() - self.start
+        if not isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = bytes(payload)
+        header = RECORD.pack(len(payload), recordtype, sw1, sw2, 0, value, timestamp)
+        with self.lock:
+            self.file.write(header)
+            self.file.write(payload)
+
+    def update(self, observable, handlers):
+        """Record a L{CardConnectionEvent}."""
+        eventtype, args = handlers.type, handlers.args
+        if self.responsepending and eventtype != "response":
+            # the previous command raised an exception
+            self.write(ERROR)
+        self.responsepending = eventtype == "command"
+        if eventtype == "command":
+            if self.atrpending:
+                self.atrpending = False
+                self.write(ATR, observable.getATR())
+            if isinstance(args[0], int):
+                self.control = True
+                self.write(CONTROL, args[1], args[0])
+            else:
+                self.control = False
+                self.write(COMMAND, args[0], args[1] or 0)
+        elif eventtype == "response":
+            if self.control:
+                self.write(CONTROL_RESPONSE, args)
+            else:
+                self.write(RESPONSE, args[0], 0, args[1], args[2])
+        elif eventtype == "attrib":
+            self.write(ATTRIB, b"", args[0])
+        elif eventtype == "connect":
+            # the card is connected after the event: record its ATR
+            # before the first command
+            self.atrpending = True
+            self.write(CONNECT, str(observable.getReader()).encode("utf-8"))
+        else:
+            if eventtype == "reconnect":
+                self.atrpending = True
+            self.write(_EVENT_RECORDS[eventtype])
+
+    def flush(self):
+        """Write the buffered records."""
+        with self.lock:
+            self.file.flush()
+
+    def close(self):
+        """Write the buffered records and close the log."""
+        if self.responsepending:
+            self.responsepending = False
+            self.write(ERROR)
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """Exit the runtime context and close the log."""
+        self.close()
+        return False
+
+
+class APDULog:
+    """Read-only, memory-mapped view of a log written by
+    L{CardConnectionRecorder}.
+
+    The records are indexed by their offset in the log, and read from the
+    mapping on access, so that multi-gigabyte logs are searched without
+    being loaded:
+
+        >>> with APDULog("session.apdu") as log:
+        ...     for _index, record in log.find(COMMAND, prefix=b"\\x00\\xA4"):
+        ...         print(record.payload.hex())
+
+    Building the index reads the record headers only. The index can be
+    saved with L{saveIndex()} and loaded again with the indexpath
+    parameter; the records appended to the log after the index was saved
+    are indexed on load."""
+
+    def __init__(self, path, indexpath=None):
+        """Map a log.
+
+        @param path: the path of the log
+        @param indexpath: the path of an index saved with L{saveIndex()},
+            used if the file exists
+
+        @raise ValueError: if the file is not a log
+        """
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"not an APDU log: {path}")
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, recordsize, _ = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION or recordsize != RECORD.size:
+            self.mmap.close()
+            raise ValueError(f"not an APDU log, or unsupported version: {path}")
+        self.offsets = array.array("Q")
+        """ the offset of each record """
+        if indexpath is not None and os.path.exists(indexpath):
+            with open(indexpath, "rb") as index:
+                self.offsets.frombytes(index.read())
+        self._index()
+
+    def _index(self):
+        """Index the records following the last indexed record."""
+        if self.offsets:
+            offset = self.offsets[-1]
+            offset += RECORD.size + RECORD.unpack_from(self.mmap, offset)[0]
+        else:
+            offset = HEADER.size
+        unpack_from, size, end = RECORD.unpack_from, RECORD.size, len(self.mmap)
+        append = self.offsets.append
+        # a truncated last record, e.g. of a crashed recorder, is ignored
+        while offset + size <= end:
+            length = unpack_from(self.mmap, offset)[0]
+            if offset + size + length > end:
+                break
+            append(offset)
+            offset += size + length
+
+    def saveIndex(self, indexpath):
+        """Save the index of the records.
+
+        @param indexpath: the path of the index file
+        """
+        with open(indexpath, "wb") as index:
+            self.offsets.tofile(index)
+
+    def __len__(self):
+        """Return the number of records."""
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        """Return a L{Record} by index."""
+        offset = self.offsets[index]
+        length, recordtype, sw1, sw2, _, value, timestamp = RECORD.unpack_from(
+            self.mmap, offset
+        )
+        start = offset + RECORD.size
+        payload = self.mmap[start : start + length]
+        return Record(recordtype, sw1, sw2, value, timestamp, payload)
+
+    def __iter__(self):
+        """Iterate over the records."""
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+    def find(self, recordtype=None, prefix=None, start=0):
+        """Iterate over the indexes and records matching a type and a
+        payload prefix.
+
+        @param recordtype: the record type, None for any
+        @param prefix: the bytes the payload starts with, None for any
+        @param start: the index of the first record to search
+
+        @return: an iterator of (index, L{Record})
+        """
+        unpack_from, size, mm = RECORD.unpack_from, RECORD.size, self.mmap
+        for index in range(start, len(self.offsets)):
+            offset = self.offsets[index]
+            length, rtype = unpack_from(mm, offset)[:2]
+            if recordtype is not None and rtype != recordtype:
+                continue
+            if prefix is not None:
+                if length < len(prefix):
+                    continue
+                begin = offset + size
+                if mm[begin : begin + len(prefix)] != prefix:
+                    continue
+            yield index, self[index]
+
+    def close(self):
+        """Unmap the log."""
+        self.mmap.close()
+
+    def __enter__(self):
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        """Exit the runtime context and unmap the log."""
+        self.close()
+        return False
@@ -133,6 +133,24 @@ class CardMonitor:
         return getattr(self.instance, name)
 
 
+def diffCards(previouscards, currentcards):
+    """Return the cards added and removed between two card lists.
+
+    The diff is hashed, linear in the number of cards.
+
+    @param previouscards: the previous list of L{Card}
+    @param currentcards: the current list of L{Card}
+
+    @return: the (addedcards, removedcards) lists, in the order of the
+        card lists
+    """
+    previous = set(previouscards)
+    current = set(currentcards)
+    addedcards = [card for card in currentcards if card not in previous]
+    removedcards = [card for card in previouscards if card not in current]
+    return addedcards, removedcards
+
+
 class CardMonitoringThread:
     """Card insertion thread.
     This thread waits for card insertion.
@@ -164,15 +182,7 @@ class CardMonitoringThread:
                 try:
                     currentcards = self.cardrequest.waitforcardevent()
 
-                    addedcards = []
-                    for card in currentcards:
-                        if card not in self.cards:
-                            addedcards.append(card)
-
-                    removedcards = []
-                    for card in self.cards:
-                        if card not in currentcards:
-                            removedcards.append(card)
+                    addedcards, removedcards = diffCards(self.cards, currentcards)
 
                     if addedcards or removedcards:
                         self.cards = currentcards
@@ -192,8 +202,11 @@ class CardMonitoringThread:
                         self.stopEvent.set()
 
         def stop(self):
-            """stop the thread by signaling stopEvent"""
+            """stop the thread by signaling stopEvent, and cancel the
+            wait in progress"""
             self.stopEvent.set()
+            if self.cardrequest is not None:
+                self.cardrequest.cancel()
 
     # the singleton
     instance = None
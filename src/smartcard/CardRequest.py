@@ -79,6 +79,11 @@ class CardRequest:
         """Wait for card insertion or removal."""
         return self.pcsccardrequest.waitforcardevent()
 
+    def cancel(self):
+        """Cancel a wait in progress in another thread, which raises
+        L{smartcard.Exceptions.CardRequestTimeoutException}."""
+        self.pcsccardrequest.cancel()
+
     def __enter__(self):
         """Enter the runtime context."""
         return self
@@ -0,0 +1,151 @@
+#! /usr/bin/env python3
+
+# pylint: disable=invalid-name
+
+"""
+Sample script that measures how the card and reader monitors scale with
+the number of readers, on a simulated backend of up to 1000 readers
+power cycled all at once, e.g. a card test rack.
+
+The time reported is the median time between the backend reporting the new
+cards or readers and the observers being notified, i.e. mostly the
+computation of the added and removed cards or readers. The legacy
+column is the time of the former list scans on the same data.
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import queue
+import statistics
+import time
+
+import smartcard.CardMonitoring
+from smartcard.Card import Card
+from smartcard.CardMonitoring import CardMonitor, CardObserver
+from smartcard.ReaderMonitoring import ReaderMonitor, ReaderObserver
+
+SIZES = [125, 250, 500, 1000]
+ROUNDS = 5
+ATRS = [[0x3B, 0x16, 0x94, 0x20, 0x02, 0x01, 0x00, 0x00, 0x0D], [0x3B, 0x00]]
+
+
+class SimulatedCardRequest:
+    """CardRequest on a simulated backend: waitforcardevent() returns the
+    cards pushed by the benchmark."""
+
+    events = queue.Queue()
+    returned = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def waitforcardevent(self):
+        cards = SimulatedCardRequest.events.get()
+        SimulatedCardRequest.returned = time.perf_counter()
+        return cards
+
+    def cancel(self):
+        pass
+
+
+class TimingObserver(CardObserver, ReaderObserver):
+    """Observer queueing the notification times."""
+
+    def __init__(self):
+        self.times = queue.Queue()
+
+    def update(self, observable, handlers):
+        self.times.put(time.perf_counter())
+
+
+def legacy_diff(current, previous):
+    """the former list scans"""
+    added = [item for item in current if item not in previous]
+    removed = [item for item in previous if item not in current]
+    return added, removed
+
+
+def median(times):
+    """median time, in milliseconds"""
+    return statistics.median(times) * 1000
+
+
+def benchmark_cards(observer):
+    """Power cycle all the simulated readers, the cards alternating
+    between two ATRs."""
+    print(f"{'readers':>8} {'card monitor':>14} {'legacy':>10}")
+    previous = []
+    for size in SIZES:
+        times, legacy = [], []
+        for i in range(2 * ROUNDS):
+            atr = ATRS[i % 2]
+            current = [Card(f"Simulated Reader {n:04d}", atr) for n in range(size)]
+            SimulatedCardRequest.events.put(current)
+            times.append(observer.times.get() - SimulatedCardRequest.returned)
+            start = time.perf_counter()
+            legacy_diff(current, previous)
+            legacy.append(time.perf_counter() - start)
+            previous = current
+        print(f"{size:8} {median(times):11.3f} ms {median(legacy):7.3f} ms")
+
+
+def benchmark_readers():
+    """Replace every other simulated reader, e.g. a rack half unplugged
+    and plugged again in other USB ports."""
+    print(f"{'readers':>8} {'reader monitor':>14} {'legacy':>10}")
+    # the readers, and the first time they were returned
+    backend = {"readers": [], "returned": None, "changed": 0.0}
+
+    def readerProc():
+        readers = backend["readers"]
+        if readers is not backend["returned"]:
+            backend["returned"] = readers
+            backend["changed"] = time.perf_counter()
+        return readers
+
+    observer = TimingObserver()
+    monitor = ReaderMonitor(readerProc=readerProc, period=0.001, eventDriven=False)
+    monitor.addObserver(observer)
+    previous = []
+    for size in SIZES:
+        times, legacy = [], []
+        for i in range(2 * ROUNDS):
+            current = [
+                f"Simulated Reader {n:04d}" + (" (2)" if n % 2 and i % 2 else "")
+                for n in range(size)
+            ]
+            backend["readers"] = current
+            times.append(observer.times.get() - backend["changed"])
+            start = time.perf_counter()
+            legacy_diff(current, previous)
+            legacy.append(time.perf_counter() - start)
+            previous = current
+        print(f"{size:8} {median(times):11.3f} ms {median(legacy):7.3f} ms")
+    monitor.deleteObserver(observer)
+
+
+if __name__ == "__main__":
+    smartcard.CardMonitoring.CardRequest = SimulatedCardRequest
+    cardmonitor = CardMonitor()
+    cardobserver = TimingObserver()
+    cardmonitor.addObserver(cardobserver)
+    # the initial notification of the current cards
+    cardobserver.times.get()
+    benchmark_cards(cardobserver)
+    cardmonitor.deleteObserver(cardobserver)
+    print()
+    benchmark_readers()
@@ -0,0 +1,72 @@
+#! /usr/bin/env python3
+
+# pylint: disable=invalid-name
+
+"""
+Sample script that measures the overhead of CardConnection.transmit()
+compared to the raw smartcard.scard.SCardTransmit(), without and with an
+observer
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import sys
+import timeit
+
+from smartcard.CardConnectionObserver import CardConnectionObserver
+from smartcard.scard import SCARD_PCI_T0, SCARD_PCI_T1, SCardTransmit
+from smartcard.System import readers
+
+# replace by your favourite apdu
+SELECT_MF = [0x00, 0xA4, 0x00, 0x00]
+
+NUMBER = 2000
+
+if __name__ == "__main__":
+    r = readers()
+    if not r:
+        sys.exit("No reader found")
+    connection = r[0].createConnection()
+    connection.connect()
+    pcscconnection = connection.component
+    pci = SCARD_PCI_T0 if pcscconnection.getProtocol() == 1 else SCARD_PCI_T1
+
+    def raw():
+        SCardTransmit(pcscconnection.hcard, pci, SELECT_MF)
+
+    def framework():
+        connection.transmit(SELECT_MF)
+
+    def best(function):
+        """best time of one call, in microseconds"""
+        return min(timeit.repeat(function, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+    t_raw = best(raw)
+    t_framework = best(framework)
+    connection.addObserver(CardConnectionObserver())
+    t_observed = best(framework)
+
+    print(f"SCardTransmit():                 {t_raw:8.2f} us")
+    print(
+        f"transmit(), no observer:         {t_framework:8.2f} us "
+        f"(+{t_framework - t_raw:.2f} us)"
+    )
+    print(
+        f"transmit(), one observer:        {t_observed:8.2f} us "
+        f"(+{t_observed - t_raw:.2f} us)"
+    )
+    connection.disconnect()
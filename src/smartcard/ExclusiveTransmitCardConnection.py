@@ -86,8 +86,10 @@ class ExclusiveTransmitCardConnection(CardConnectionDecorator):
             else:
                 break
 
-    def transmit(self, command, protocol=None):
+    def transmit(self, command, protocol=None, as_bytes=False):
         """Gain exclusive access to card during APDU transmission for if this
         decorator decorates a PCSCCardConnection."""
-        data, sw1, sw2 = CardConnectionDecorator.transmit(self, command, protocol)
+        data, sw1, sw2 = CardConnectionDecorator.transmit(
+            self, command, protocol, as_bytes=as_bytes
+        )
         return data, sw1, sw2
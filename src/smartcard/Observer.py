@@ -16,6 +16,9 @@ import typing
 
 from smartcard.Synchronization import Synchronization, synchronize
 
+if typing.TYPE_CHECKING:
+    from smartcard.ObserverDispatcher import AsyncDispatcher
+
 # pylint: disable=too-few-public-methods
 
 
@@ -30,43 +33,76 @@ class Observer:
 
 
 class Observable(Synchronization):
-    """Observable"""
+    """Observable
+
+    Besides the obs list, the observers are published as an immutable
+    tuple, replaced on each change of the observers (copy-on-write), so
+    that notifyObservers() does not copy the list. The observers are to
+    be changed with the methods, not by modifying obs. Whether there are
+    observers can be checked without lock, e.g. to skip building an event
+    nobody observes:
+
+        >>> if observable.obs:
+        ...     observable.setChanged()
+        ...     observable.notifyObservers(Event())
+    """
 
     def __init__(self) -> None:
         super().__init__()
         self.obs: list[Observer] = []
+        self._observers: tuple[Observer, ...] = ()
         self.changed = 0
+        self.dispatcher: AsyncDispatcher | None = None
 
     def addObserver(self, observer: Observer) -> None:
         """Add an observer"""
         if observer not in self.obs:
             self.obs.append(observer)
+            self._observers = tuple(self.obs)
 
     def deleteObserver(self, observer: Observer) -> None:
         """Remove an observer"""
         self.obs.remove(observer)
+        self._observers = tuple(self.obs)
 
-    def notifyObservers(self, handlers: typing.Any = None) -> None:
+    def notifyObservers(
+        self,
+        handlers: typing.Any = None,
+        observers: tuple[Observer, ...] | None = None,
+    ) -> None:
         """If 'changed' indicates that this object
         has changed, notify all its observers, then
         call clearChanged(). Each observer has its
         update() called with two arguments: this
-        observable object and the generic 'handlers'."""
+        observable object and the generic 'handlers'.
+        If 'observers' is given, only these observers
+        are notified."""
 
         with self.mutex:
             if not self.changed:
                 return
-            # Make a copy of the observer list.
-            observers = self.obs.copy()
+            # The observer tuple is immutable, no copy is needed.
+            if observers is None:
+                observers = self._observers
             self.changed = 0
 
-        # Update observers
+        # Update observers, from the dispatcher worker thread if any
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch(self, observers, handlers)
+            return
         for observer in observers:
             observer.update(self, handlers)
 
     def deleteObservers(self) -> None:
         """Remove all observers"""
         self.obs = []
+        self._observers = ()
+
+    def setDispatcher(self, dispatcher: AsyncDispatcher | None) -> None:
+        """Set the dispatcher delivering the notifications to the
+        observers asynchronously, or None to notify the observers
+        synchronously from notifyObservers()"""
+        self.dispatcher = dispatcher
 
     def setChanged(self) -> None:
         """Set the change flag"""
@@ -87,7 +123,7 @@ class Observable(Synchronization):
 
 synchronize(
     Observable,
-    "addObserver deleteObserver deleteObservers "
+    "addObserver deleteObserver deleteObservers setDispatcher "
     + "setChanged clearChanged hasChanged "
     + "countObservers",
 )
@@ -0,0 +1,232 @@
+"""Asynchronous dispatch of the notifications of Observable objects
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from __future__ import annotations
+
+import collections
+import threading
+import traceback
+import typing
+
+if typing.TYPE_CHECKING:
+    from smartcard.Observer import Observable, Observer
+
+DROP = "drop"
+""" discard the new notification when the queue is full """
+
+BLOCK = "block"
+""" wait for room in the queue when it is full; a notification from the
+worker thread, i.e. from an observer, is discarded instead """
+
+COALESCE = "coalesce"
+""" when the queue is full, the new notification replaces the most recent
+queued notification with the same key, or the oldest queued
+notification """
+
+
+def defaultKey(observable: Observable, handlers: typing.Any) -> typing.Any:
+    """Return the default L{COALESCE} key of a notification: the
+    observable and the event type, e.g. "response" for a
+    L{CardConnectionEvent}."""
+    return observable, getattr(handlers, "type", None)
+
+
+class AsyncDispatcher:
+    """Dispatcher calling the observers of an L{Observable} from a worker
+    thread, so that slow observers do not delay the notifying thread,
+    e.g. a L{CardConnection} transmitting APDUs.
+
+    The dispatcher is opt-in, per observable:
+
+        >>> dispatcher = AsyncDispatcher(maxsize=1000, policy=DROP)
+        >>> connection.setDispatcher(dispatcher)
+        >>> connection.addObserver(ConsoleCardConnectionObserver())
+
+    A dispatcher can be shared by several observables; the notifications
+    are delivered in order by a single daemon worker thread, started on
+    the first notification.
+
+    The notifications are queued in a bounded queue. When the queue is
+    full, the policy decides: L{DROP} discards the new notification,
+    L{BLOCK} makes the notifying thread wait, and L{COALESCE} keeps the
+    new notification and discards the most recent queued one it
+    supersedes, i.e. with the same key(observable, handlers), by default
+    from the same observable and of the same event type, or the oldest
+    one.
+
+    The counters are attributes: L{depth} is the current number of queued
+    notifications, maxdepth its high-water mark, dispatched, dropped and
+    coalesced the number of notifications delivered, dropped because the
+    queue was full, and superseded with the L{COALESCE} policy."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        policy: str = DROP,
+        key: typing.Callable[[Observable, typing.Any], typing.Any] | None = None,
+    ) -> None:
+        """Construct an asynchronous dispatcher.
+
+        @param maxsize: maximum number of queued notifications
+        @param policy:  L{DROP}, L{BLOCK} or L{COALESCE}
+        @param key:     for L{COALESCE}, function of (observable, handlers)
+            returning the hashable key of a notification; notifications
+            with the same key supersede each other. Default is
+            L{defaultKey()}. The key is called on the notifying thread,
+            outside of the dispatcher lock.
+        """
+        if policy not in (DROP, BLOCK, COALESCE):
+            raise ValueError(f"unknown overflow policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key if key is not None else defaultKey
+        # queued [observable, observers, handlers, key] entries; the
+        # observers of an entry superseded with COALESCE are None
+        self.queue: collections.deque = collections.deque()
+        self.size = 0
+        # the most recent queued entry of each COALESCE key
+        self.latest: dict = {}
+        self.condition = threading.Condition()
+        self.worker: threading.Thread | None = None
+        self.stopped = False
+        self.busy = False
+        self.maxdepth = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of queued notifications"""
+        return self.size
+
+    def dispatch(
+        self,
+        observable: Observable,
+        observers: tuple[Observer, ...],
+        handlers: typing.Any,
+    ) -> None:
+        """Queue a notification of observers, called by
+        L{Observable.notifyObservers()}."""
+        key = self.key(observable, handlers) if self.policy == COALESCE else None
+        with self.condition:
+            if self.stopped:
+                return
+            if self.size >= self.maxsize:
+                if self.policy == DROP or (
+                    # the worker would wait for itself
+                    self.policy == BLOCK
+                    and threading.current_thread() is self.worker
+                ):
+                    self.dropped += 1
+                    return
+                if self.policy == BLOCK:
+                    self.condition.wait_for(
+                        lambda: self.size < self.maxsize or self.stopped
+                    )
+                    if self.stopped:
+                        return
+                else:
+                    self._coalesce(key)
+            entry = [observable, observers, handlers, key]
+            self.queue.append(entry)
+            self.size += 1
+            if self.policy == COALESCE:
+                self.latest[key] = entry
+            self.maxdepth = max(self.maxdepth, self.size)
+            if self.worker is None:
+                self.worker = threading.Thread(
+                    target=self._run, name="AsyncDispatcher", daemon=True
+                )
+                self.worker.start()
+            self.condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until all the queued notifications are delivered.
+
+        @param timeout: time to wait in seconds, None to wait forever
+
+        @return: True if the queue was flushed, False on timeout
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: not self.queue and not self.busy, timeout
+            )
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Deliver the queued notifications and stop the worker thread.
+        Notifications dispatched afterwards are discarded.
+
+        @param timeout: time to wait in seconds, None to wait forever
+        """
+        self.flush(timeout)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+            worker = self.worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def _coalesce(self, key: typing.Any) -> None:
+        superseded = self.latest.pop(key, None)
+        if superseded is not None:
+            superseded[1] = None
+            self.coalesced += 1
+        else:
+            oldest = self.queue.popleft()
+            while oldest[1] is None:
+                oldest = self.queue.popleft()
+            if self.latest.get(oldest[3]) is oldest:
+                del self.latest[oldest[3]]
+            self.dropped += 1
+        self.size -= 1
+        if len(self.queue) > 2 * self.maxsize:
+            # compact the superseded entries
+            self.queue = collections.deque(
+                entry for entry in self.queue if entry[1] is not None
+            )
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+                self.condition.wait_for(lambda: self.queue or self.stopped)
+                if not self.queue:
+                    return
+                entry = self.queue.popleft()
+                observable, observers, handlers, key = entry
+                if observers is None:
+                    continue
+                self.size -= 1
+                if self.policy == COALESCE and self.latest.get(key) is entry:
+                    del self.latest[key]
+                self.busy = True
+                self.condition.notify_all()
+            for observer in observers:
+                try:
+                    observer.update(observable, handlers)
+                except Exception:  # pylint: disable=broad-exception-caught
+                    traceback.print_exc()
+            with self.condition:
+                self.dispatched += 1
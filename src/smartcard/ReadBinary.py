@@ -0,0 +1,181 @@
+"""Streaming READ BINARY of transparent elementary files
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from smartcard.ATR import ATR
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import CardConnectionException
+from smartcard.pcsc.PCSCPart10 import getMaxAPDUDataSize
+from smartcard.SegmentingCardConnection import buildAPDU
+from smartcard.sw.SWExceptions import SWException
+
+# largest offset of a READ BINARY with even INS (15 bits of P1 P2)
+MAX_OFFSET = 0x7FFF
+
+
+def getMaxReadLength(cardConnection):
+    """Return the largest Le usable for a READ BINARY on the connection.
+
+    Extended Le is used when the card announces extended Lc and Le fields
+    in its ATR, the reader reports a dwMaxAPDUDataSize, and the protocol
+    is not T=0.
+
+    @param cardConnection: L{CardConnection} object
+
+    @return: the maximum Le, 256 for short APDUs
+    """
+    if cardConnection.getProtocol() == CardConnection.T0_protocol:
+        return 256
+    if not ATR(cardConnection.getATR()).isExtendedLengthSupported():
+        return 256
+    # keep the response and status words within a 64 KB receive buffer
+    return max(256, min(getMaxAPDUDataSize(cardConnection), 65535 - 2))
+
+
+def _select(cardConnection, fid, cla):
+    """SELECT the EF fid, without response data."""
+    command = buildAPDU(bytes([cla, 0xA4, 0x02, 0x0C]), bytes(fid))
+    data, sw1, sw2 = cardConnection.transmit(command)
+    if (sw1, sw2) != (0x90, 0x00):
+        raise SWException(data, sw1, sw2, "SELECT failed")
+
+
+def _readbinary(cardConnection, fid, sfi, chunk, offset, cla, size, into):
+    """Generator of the (length, view) READ BINARY responses, received
+    with transmit_into() into the views returned by into(length)."""
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    # pylint: disable=too-many-locals
+    # pylint: disable=too-many-branches
+    if fid is not None and sfi is not None:
+        raise ValueError("give either fid or sfi, not both")
+    if chunk is None:
+        chunk = getMaxReadLength(cardConnection)
+    extended = chunk > 256
+
+    if sfi is not None:
+        if not 0 < sfi < 31 or offset > 0xFF:
+            raise ValueError("invalid SFI or offset for short EF addressing")
+        p1p2 = bytes([0x80 | sfi, offset])
+    else:
+        if fid is not None:
+            _select(cardConnection, fid, cla)
+        p1p2 = None
+
+    while size is None or size > 0:
+        if offset > MAX_OFFSET:
+            raise CardConnectionException(
+                f"READ BINARY offset {offset} beyond {MAX_OFFSET}"
+            )
+        le = chunk if size is None else min(chunk, size)
+        if p1p2 is None:
+            p1p2 = offset.to_bytes(2, "big")
+        header = bytes([cla, 0xB0]) + p1p2
+        view = into(le)
+        length, sw1, sw2 = cardConnection.transmit_into(
+            buildAPDU(header, le=le, extended=extended), view
+        )
+        if sw1 == 0x6C:
+            # T=0 wrong Le: read again with the length given by the card
+            le = sw2 or 256
+            view = into(le)
+            length, sw1, sw2 = cardConnection.transmit_into(
+                buildAPDU(header, le=le), view
+            )
+        if (sw1, sw2) == (0x6B, 0x00):
+            # offset outside of the EF
+            return
+        if (sw1, sw2) not in ((0x90, 0x00), (0x62, 0x82)):
+            raise SWException(bytes(view[:length]), sw1, sw2, "READ BINARY failed")
+        if length:
+            yield length, view
+        offset += length
+        if size is not None:
+            size -= length
+        # end of file reached, or no progress
+        if (sw1, sw2) == (0x62, 0x82) or length == 0:
+            return
+        # the EF is now the current EF, following reads use the offset
+        p1p2 = None
+
+
+def iter_read_binary(
+    cardConnection, fid=None, sfi=None, chunk=None, offset=0, size=None, cla=0x00
+):
+    """Read a transparent EF in chunks.
+
+    Reading stops at the end of the file, when the card returns 6282 (end
+    of file reached before reading Le bytes) or 6B00 (offset outside the
+    EF), or after size bytes.
+
+    @param cardConnection: L{CardConnection} object
+    @param fid:    file identifier, as 2 bytes, of the EF to SELECT before
+        reading; None to read the current EF or with sfi
+    @param sfi:    short EF identifier (1 to 30), to read without SELECT
+    @param chunk:  number of bytes to read per READ BINARY, None for the
+        largest length supported by the card and the reader
+    @param offset: offset of the first byte to read
+    @param size:   number of bytes to read, None to read up to the end of
+        the file
+    @param cla:    class byte of the commands
+
+    @return: a generator of memoryview objects on the read chunks
+    """
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    for length, view in _readbinary(
+        cardConnection, fid, sfi, chunk, offset, cla, size, bytearray
+    ):
+        yield memoryview(view)[:length]
+
+
+def read_binary_into(
+    cardConnection, buffer, fid=None, sfi=None, chunk=None, offset=0, cla=0x00
+):
+    """Read a transparent EF into a buffer.
+
+    The READ BINARY responses are received directly into the buffer,
+    without intermediate copy. Reading stops at the end of the file or
+    when the buffer is full.
+
+    @param cardConnection: L{CardConnection} object
+    @param buffer: writable bytes-like object, e.g. a bytearray, a
+        memoryview or a mmap
+    @param fid:    file identifier, as 2 bytes, of the EF to SELECT before
+        reading; None to read the current EF or with sfi
+    @param sfi:    short EF identifier (1 to 30), to read without SELECT
+    @param chunk:  number of bytes to read per READ BINARY, None for the
+        largest length supported by the card and the reader
+    @param offset: offset in the file of the first byte to read
+    @param cla:    class byte of the commands
+
+    @return: the number of bytes read
+    """
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    view = memoryview(buffer).cast("B")
+    position = 0
+
+    def into(length):
+        return view[position : position + length]
+
+    for length, _ in _readbinary(
+        cardConnection, fid, sfi, chunk, offset, cla, len(view), into
+    ):
+        position += length
+    return position
@@ -36,6 +36,7 @@ from time import sleep
 import smartcard.System
 from smartcard.Exceptions import SmartcardException
 from smartcard.Observer import Observable, Observer
+from smartcard.pcsc.PCSCPnPNotification import PCSCPnPNotification
 from smartcard.Synchronization import synchronize
 
 # pylint: disable=too-few-public-methods
@@ -78,17 +79,36 @@ class ReaderMonitor(Observable):
     __shared_state = {}
 
     def __init__(
-        self, startOnDemand=True, readerProc=smartcard.System.readers, period=1
+        self,
+        startOnDemand=True,
+        readerProc=smartcard.System.readers,
+        period=1,
+        eventDriven=None,
     ):
+        """Construct a reader monitor.
+
+        @param startOnDemand: if True, the monitoring thread runs only
+            while there are observers
+        @param readerProc: function returning the list of readers
+        @param period: polling period in seconds
+        @param eventDriven: if True, wait for the PC/SC PnP notifications
+            of reader insertion and removal, and poll only if they are not
+            supported; None for True with the default readerProc
+        """
         self.__dict__ = self.__shared_state
         Observable.__init__(self)
         self.startOnDemand = startOnDemand
         self.readerProc = readerProc
         self.period = period
+        if eventDriven is None:
+            eventDriven = readerProc is smartcard.System.readers
+        self.eventDriven = eventDriven
         if self.startOnDemand:
             self.rmthread = None
         else:
-            self.rmthread = ReaderMonitoringThread(self, self.readerProc, self.period)
+            self.rmthread = ReaderMonitoringThread(
+                self, self.readerProc, self.period, self.eventDriven
+            )
             self.rmthread.start()
 
     def addObserver(self, observer):
@@ -101,7 +121,7 @@ class ReaderMonitor(Observable):
             if 0 < self.countObservers():
                 if not self.rmthread:
                     self.rmthread = ReaderMonitoringThread(
-                        self, self.readerProc, self.period
+                        self, self.readerProc, self.period, self.eventDriven
                     )
 
                     # start reader monitoring thread in another thread to
@@ -138,15 +158,16 @@ synchronize(
 
 class ReaderMonitoringThread(Thread):
     """Reader insertion thread.
-    This thread polls for pcsc reader insertion, since no
-    reader insertion event is available in pcsc.
+    This thread waits for the PC/SC PnP notifications of reader
+    insertion and removal, or polls for reader insertion if they are
+    not available.
     """
 
     # pylint: disable=too-many-instance-attributes
 
     __shared_state = {}
 
-    def __init__(self, observable, readerProc, period):
+    def __init__(self, observable, readerProc, period, eventDriven=False):
         self.__dict__ = self.__shared_state
         Thread.__init__(self)
         self.observable = observable
@@ -157,6 +178,8 @@ class ReaderMonitoringThread(Thread):
         self.name = "smartcard.ReaderMonitoringThread"
         self.readerProc = readerProc
         self.period = period
+        self.eventDriven = eventDriven
+        self.notification = None
 
     def run(self):
         """Runs until stopEvent is notified, and notify
@@ -164,6 +187,13 @@ class ReaderMonitoringThread(Thread):
         """
 
         # pylint: disable=too-many-nested-blocks
+        # pylint: disable=too-many-branches
+
+        if self.eventDriven:
+            try:
+                self.notification = PCSCPnPNotification()
+            except SmartcardException:
+                self.notification = None
 
         while not self.stopEvent.is_set():
             try:
@@ -174,11 +204,14 @@ class ReaderMonitoringThread(Thread):
                     removedReaders = []
 
                     if currentReaders != self.readers:
+                        # hashed diff, linear in the number of readers
+                        previous = set(self.readers)
+                        current = set(currentReaders)
                         for reader in currentReaders:
-                            if reader not in self.readers:
+                            if reader not in previous:
                                 addedReaders.append(reader)
                         for reader in self.readers:
-                            if reader not in currentReaders:
+                            if reader not in current:
                                 removedReaders.append(reader)
 
                         if addedReaders or removedReaders:
@@ -191,6 +224,16 @@ class ReaderMonitoringThread(Thread):
                                 (addedReaders, removedReaders)
                             )
 
+                # wait for a reader insertion or removal
+                if self.notification is not None:
+                    try:
+                        self.notification.wait()
+                        continue
+                    except SmartcardException:
+                        # not supported by the resource manager, poll
+                        self.notification.release()
+                        self.notification = None
+
                 # wait every second on stopEvent
                 self.stopEvent.wait(self.period)
 
@@ -205,7 +248,15 @@ class ReaderMonitoringThread(Thread):
     def stop(self):
         """stop the thread by signaling stopEvent"""
         self.stopEvent.set()
-        self.join()
+        while self.is_alive():
+            # the notification wait may not have started yet
+            notification = self.notification
+            if notification is not None:
+                notification.cancel()
+            self.join(0.1)
+        if self.notification is not None:
+            self.notification.release()
+            self.notification = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+"""ReplayCardConnection: serve a session recorded by a
+CardConnectionRecorder back, with no card
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import time
+
+from smartcard.CardConnection import CardConnection
+from smartcard.CardConnectionRecorder import (
+    ATR,
+    COMMAND,
+    CONNECT,
+    CONTROL,
+    CONTROL_RESPONSE,
+    ERROR,
+    RESPONSE,
+    APDULog,
+)
+from smartcard.Exceptions import CardConnectionException
+
+
+class ReplayCardConnection(CardConnection):
+    """Card connection replaying a log of
+    L{smartcard.CardConnectionRecorder.CardConnectionRecorder}.
+
+    The commands are served the recorded responses, in the order of the
+    recording, so that production traffic is replayed offline, e.g. to
+    profile an application or as a regression test:
+
+        >>> connection = ReplayCardConnection("session.apdu")
+        >>> connection.connect()
+        >>> connection.transmit(SELECT + AID)
+
+    In strict mode, each command must be the recorded one, or
+    L{CardConnectionException} is raised: the application diverged from
+    the recording. A recorded command that got no response, e.g. that
+    raised an exception, raises L{CardConnectionException}. With
+    realtime, each response is delayed by the recorded response time of
+    the card."""
+
+    def __init__(self, log, reader=None, strict=True, realtime=False):
+        """Construct a replay card connection.
+
+        @param log: the L{APDULog}, or the path of the log
+        @param reader: the reader name; default is the reader of the first
+            recorded connection
+        @param strict: if True, raise if a command is not the recorded one
+        @param realtime: if True, delay the responses by the recorded
+            response times
+        """
+        self.ownlog = not isinstance(log, APDULog)
+        self.log = APDULog(log) if self.ownlog else log
+        if reader is None:
+            reader = "Replay"
+            for _index, record in self.log.find(CONNECT):
+                reader = record.payload.decode("utf-8")
+                break
+        CardConnection.__init__(self, reader)
+        self.strict = strict
+        self.realtime = realtime
+        self.position = 0
+        """ the index of the next record to replay """
+        self.atr = None
+        self.connected = False
+
+    def rewind(self, position=0):
+        """Replay the log again from a record.
+
+        @param position: the index of the record
+        """
+        self.position = position
+        self.atr = None
+
+    def _lookupATR(self):
+        """Return the ATR recorded after the current position."""
+        for _index, record in self.log.find(ATR, start=self.position):
+            return list(record.payload)
+        return self.atr
+
+    def connect(self, protocol=None, mode=None, disposition=None):
+        """Connect to the replayed card."""
+        CardConnection.connect(self, protocol)
+        self.connected = True
+        self.atr = self._lookupATR()
+
+    def reconnect(self, protocol=None, mode=None, disposition=None):
+        """Reconnect to the replayed card."""
+        CardConnection.reconnect(self, protocol)
+        if not self.connected:
+            raise CardConnectionException("Card not connected")
+        self.atr = self._lookupATR()
+
+    def disconnect(self):
+        """Disconnect from the replayed card."""
+        if self.connected:
+            CardConnection.disconnect(self)
+            self.connected = False
+
+    def release(self):
+        """Release the log, if opened by the connection."""
+        CardConnection.release(self)
+        if self.ownlog and self.log is not None:
+            self.log.close()
+        self.log = None
+
+    def getATR(self):
+        """Return the recorded ATR"""
+        CardConnection.getATR(self)
+        if not self.connected:
+            raise CardConnectionException("Card not connected")
+        return self.atr
+
+    def _replay(self, commandtype, command, value):
+        """Return the recorded response to the next command.
+
+        @param commandtype: L{COMMAND} or L{CONTROL}
+        @param command: the command, as bytes
+        @param value: the control code of a control command
+
+        @return: the response record
+        """
+        if not self.connected:
+            raise CardConnectionException("Card not connected")
+        log, index = self.log, self.position
+        while index < len(log) and log[index].type not in (COMMAND, CONTROL):
+            if log[index].type == ATR:
+                self.atr = list(log[index].payload)
+            index += 1
+        if index >= len(log):
+            raise CardConnectionException("End of the recorded session")
+        recorded = log[index]
+        if self.strict and (
+            recorded.type != commandtype
+            or recorded.payload != command
+            or (commandtype == CONTROL and recorded.value != value)
+        ):
+            raise CardConnectionException(
+                f"Command of record {index} differs from the recorded command"
+            )
+        responsetype = RESPONSE if recorded.type == COMMAND else CONTROL_RESPONSE
+        commandindex = index
+        index += 1
+        # the response, if any, precedes the next command
+        while index < len(log) and log[index].type not in (
+            responsetype,
+            ERROR,
+            COMMAND,
+            CONTROL,
+        ):
+            index += 1
+        if index >= len(log) or log[index].type != responsetype:
+            if index < len(log) and log[index].type == ERROR:
+                index += 1
+            self.position = index
+            raise CardConnectionException(
+                f"Command of record {commandindex} got no recorded response"
+            )
+        response = log[index]
+        self.position = index + 1
+        if self.realtime:
+            time.sleep(max(response.timestamp - recorded.timestamp, 0) / 1e9)
+        return response
+
+    def doTransmit(self, command, protocol=None):
+        """Return the recorded response to a command.
+
+        @return: a tuple (response, sw1, sw2), response being a list of
+        bytes"""
+        data, sw1, sw2 = self.doTransmitBytes(command, protocol)
+        return list(data), sw1, sw2
+
+    def doTransmitBytes(self, command, protocol=None):
+        """Return the recorded response to a command.
+
+        @return: a tuple (response, sw1, sw2), response being a bytes
+        object"""
+        response = self._replay(COMMAND, bytes(command), 0)
+        return response.payload, response.sw1, response.sw2
+
+    def doControl(self, controlCode, command=None):
+        """Return the recorded response to a control command."""
+        if command is None:
+            command = []
+        return list(self._replay(CONTROL, bytes(command), controlCode).payload)
@@ -0,0 +1,207 @@
+"""CardConnectionDecorator that segments commands with large data fields
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from smartcard.ATR import ATR
+from smartcard.CardConnectionDecorator import CardConnectionDecorator
+from smartcard.Exceptions import CardConnectionException
+from smartcard.pcsc.PCSCPart10 import getMaxAPDUDataSize
+
+# maximum length of the data field of a short APDU
+SHORT_MAX_DATA = 255
+
+# class byte bit for ISO 7816-4 command chaining
+CLA_CHAINING = 0x10
+
+
+def splitAPDU(command):
+    """Split a short or extended command APDU in its fields.
+
+    @param command: command APDU, list of bytes or bytes-like object
+
+    @return: a tuple (header, data, le) where header is the 4 bytes
+        CLA INS P1 P2, data the bytes of the data field, and le the
+        expected response length or None if the command has no Le field
+    """
+    # pylint: disable=too-many-return-statements
+    command = bytes(command)
+    header, body = command[:4], command[4:]
+    if len(header) != 4:
+        raise CardConnectionException("Invalid APDU: " + command.hex())
+    if not body:
+        return header, b"", None
+    if len(body) == 1:
+        return header, b"", body[0] or 256
+    if body[0] != 0:
+        # short APDU
+        lc = body[0]
+        if len(body) == 1 + lc:
+            return header, body[1:], None
+        if len(body) == 2 + lc:
+            return header, body[1:-1], body[-1] or 256
+    elif len(body) == 3:
+        # extended APDU, case 2E
+        return header, b"", int.from_bytes(body[1:3], "big") or 65536
+    else:
+        lc = int.from_bytes(body[1:3], "big")
+        if len(body) == 3 + lc:
+            return header, body[3:], None
+        if len(body) == 5 + lc:
+            return header, body[3:-2], int.from_bytes(body[-2:], "big") or 65536
+    raise CardConnectionException("Invalid APDU: " + command.hex())
+
+
+def buildAPDU(header, data=b"", le=None, extended=False):
+    """Build a command APDU from its fields.
+
+    @param header:   the 4 bytes CLA INS P1 P2
+    @param data:     the bytes of the data field
+    @param le:       the expected response length, or None for no Le field
+    @param extended: True to use extended Lc and Le fields
+
+    @return: the command APDU as bytes
+    """
+    apdu = bytearray(header)
+    if extended:
+        if data:
+            apdu.append(0)
+            apdu += len(data).to_bytes(2, "big")
+            apdu += data
+        if le is not None:
+            if not data:
+                apdu.append(0)
+            apdu += (le % 65536).to_bytes(2, "big")
+    else:
+        if len(data) > SHORT_MAX_DATA:
+            raise CardConnectionException(
+                f"Data field of {len(data)} bytes too long for a short APDU"
+            )
+        if data:
+            apdu.append(len(data))
+            apdu += data
+        if le is not None:
+            apdu.append(min(le, 256) % 256)
+    return bytes(apdu)
+
+
+class SegmentingCardConnection(CardConnectionDecorator):
+    """This decorator transmits commands whose data field does not fit in a
+    short APDU either as a single extended length APDU, or as a sequence of
+    ISO 7816-4 command chaining segments (class byte bit 0x10).
+
+    Extended length is used when both the card, from the card capabilities
+    of the ATR historical bytes, and the reader, from the
+    dwMaxAPDUDataSize property read by L{PCSCPart10.getMaxAPDUDataSize()},
+    support it for the data length. Otherwise command chaining is used if
+    the card supports it. The segments of a chain are transmitted with
+    L{CardConnection.transmit_many()}, i.e. in one call to the
+    smartcard.scard extension for a PC/SC connection.
+
+    The commands are given to L{transmit()} as extended APDUs, e.g. built
+    with L{buildAPDU()}. Commands fitting in a short APDU are transmitted
+    unchanged."""
+
+    def __init__(self, cardconnection, chaining=None, extended=None, maxdatasize=None):
+        """Construct a new segmenting card connection decorator.
+
+        @param cardconnection: the decorated card connection
+        @param chaining:    True or False to force the command chaining
+            support of the card, None to read it from the ATR
+        @param extended:    True or False to force the extended length
+            support of the card, None to read it from the ATR
+        @param maxdatasize: maximum data size of an extended APDU supported
+            by the reader, None to read it with L{getMaxAPDUDataSize()}
+        """
+        CardConnectionDecorator.__init__(self, cardconnection)
+        self.chaining = chaining
+        self.extended = extended
+        self.maxdatasize = maxdatasize
+
+    def getMaxDataSize(self):
+        """Return the maximum data size of an extended APDU supported by
+        the reader, 0 if the reader only supports short APDUs or does not
+        report it."""
+        if self.maxdatasize is None:
+            self.maxdatasize = getMaxAPDUDataSize(self)
+        return self.maxdatasize
+
+    def isExtendedLengthSupported(self):
+        """Return True if the card supports extended Lc and Le fields."""
+        if self.extended is None:
+            self.extended = ATR(self.getATR()).isExtendedLengthSupported()
+        return self.extended
+
+    def isCommandChainingSupported(self):
+        """Return True if the card supports command chaining."""
+        if self.chaining is None:
+            self.chaining = ATR(self.getATR()).isCommandChainingSupported()
+        return self.chaining
+
+    def transmit(self, command, protocol=None, as_bytes=False):
+        """Transmit a command, segmented if its data field does not fit in
+        a short APDU.
+
+        @return: the response of the single APDU or of the last segment
+        """
+        header, data, le = splitAPDU(command)
+        if len(data) <= SHORT_MAX_DATA and (le is None or le <= 256):
+            return CardConnectionDecorator.transmit(
+                self, command, protocol, as_bytes=as_bytes
+            )
+
+        # a maximum data size of 0: the reader does not support extended APDUs
+        if self.isExtendedLengthSupported() and (
+            0 < self.getMaxDataSize() and len(data) <= self.getMaxDataSize()
+        ):
+            apdu = buildAPDU(header, data, le, extended=True)
+            return CardConnectionDecorator.transmit(
+                self, apdu, protocol, as_bytes=as_bytes
+            )
+
+        if len(data) <= SHORT_MAX_DATA:
+            # short data and Le larger than 256, without extended length
+            apdu = buildAPDU(header, data, le)
+            return CardConnectionDecorator.transmit(
+                self, apdu, protocol, as_bytes=as_bytes
+            )
+
+        if not self.isCommandChainingSupported():
+            raise CardConnectionException(
+                f"Data field of {len(data)} bytes not supported by the card "
+                "and the reader"
+            )
+        return self.transmit_many(
+            self.chain(header, data, le), protocol, [0x9000], as_bytes
+        )[-1]
+
+    @staticmethod
+    def chain(header, data, le=None):
+        """Split a command into command chaining segments.
+
+        @return: the list of short APDUs, all with the chaining bit of the
+            class byte set but the last one, which has the Le field
+        """
+        chained = bytes([header[0] | CLA_CHAINING]) + bytes(header[1:])
+        segments = []
+        for offset in range(0, len(data), SHORT_MAX_DATA):
+            segment = data[offset : offset + SHORT_MAX_DATA]
+            if offset + SHORT_MAX_DATA < len(data):
+                segments.append(buildAPDU(chained, segment))
+            else:
+                segments.append(buildAPDU(header, segment, le))
+        return segments
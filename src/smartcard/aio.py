@@ -0,0 +1,561 @@
+"""asyncio card and reader event streams
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from smartcard.Card import Card
+from smartcard.CardType import AnyCardType
+from smartcard.Exceptions import CardRequestTimeoutException, SmartcardException
+from smartcard.pcsc.PCSCContext import RENEW_ERRORS, getContextManager
+from smartcard.pcsc.PCSCExceptions import BaseSCardException
+from smartcard.pcsc.PCSCPnPNotification import PNP_NOTIFICATION
+from smartcard.pcsc.PCSCReader import PCSCReader
+from smartcard.scard import (
+    INFINITE,
+    SCARD_E_CANCELLED,
+    SCARD_E_NO_READERS_AVAILABLE,
+    SCARD_E_SYSTEM_CANCELLED,
+    SCARD_E_TIMEOUT,
+    SCARD_E_UNKNOWN_READER,
+    SCARD_S_SUCCESS,
+    SCARD_STATE_CHANGED,
+    SCARD_STATE_PRESENT,
+    SCARD_STATE_UNKNOWN,
+    ReaderStateSet,
+    SCardCancel,
+    SCardGetErrorMessage,
+    SCardListReaders,
+)
+
+if typing.TYPE_CHECKING:
+    from smartcard.CardConnection import CardConnection
+    from smartcard.CardType import CardType
+    from smartcard.reader.Reader import Reader
+
+POLL_PERIOD = 1000
+""" status change timeout in milliseconds, when the resource manager does
+not notify reader insertion and removal """
+
+
+class _Change(typing.NamedTuple):
+    """Cards and readers added and removed by a status change; the first
+    change of a subscription is the initial state."""
+
+    initial: bool
+    addedcards: list[Card]
+    removedcards: list[Card]
+    addedreaders: list[str]
+    removedreaders: list[str]
+
+
+class _Subscription:
+    """The queue of changes of a coroutine, in its event loop."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        readers: typing.Iterable[str | Reader] | None = None,
+    ) -> None:
+        self.loop = loop
+        self.readers = None if readers is None else {str(r) for r in readers}
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, change: _Change | BaseException) -> None:
+        """Queue a change, in the event loop thread."""
+        if self.readers is not None and isinstance(change, _Change):
+            change = change._replace(
+                addedcards=[c for c in change.addedcards if c.reader in self.readers],
+                removedcards=[
+                    c for c in change.removedcards if c.reader in self.readers
+                ],
+            )
+        self.queue.put_nowait(change)
+
+    async def get(self) -> _Change:
+        """Next change, raise the error of the status change waiter."""
+        change = await self.queue.get()
+        if isinstance(change, BaseException):
+            raise change
+        return change
+
+
+def _deliver(
+    subscriptions: tuple[_Subscription, ...], change: _Change | BaseException
+) -> None:
+    for subscription in subscriptions:
+        subscription.put(change)
+
+
+class _StatusChangeHub:
+    """A single thread waiting for status changes on all readers, for all
+    the subscriptions of all event loops.
+
+    The thread runs while there are subscriptions. It tracks the present
+    cards and the readers, and sends each change to each event loop with
+    a single call_soon_threadsafe(), which queues the change for the
+    subscriptions of that loop. The waiter cost is thus independent of
+    the number of waiting coroutines.
+
+    An error of the thread is sent to all the subscriptions, which are
+    then dropped, so that a persistent error, e.g. no resource manager,
+    does not restart the thread in a loop."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.subscriptions: dict[asyncio.AbstractEventLoop, set[_Subscription]] = {}
+        self.thread: threading.Thread | None = None
+        self.hcontext = None
+        self.cards: dict[str, list[int]] = {}
+        self.readers: list[str] = []
+        self.initialized = False
+
+    def subscribe(self, subscription: _Subscription) -> None:
+        """Add a subscription; its first change is the current state."""
+        with self.lock:
+            self.subscriptions.setdefault(subscription.loop, set()).add(subscription)
+            if self.initialized:
+                subscription.put(
+                    _Change(
+                        True,
+                        [Card(reader, atr) for reader, atr in self.cards.items()],
+                        [],
+                        list(self.readers),
+                        [],
+                    )
+                )
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name="smartcard.aio", daemon=True
+                )
+                self.thread.start()
+
+    def unsubscribe(self, subscription: _Subscription) -> None:
+        """Remove a subscription; the thread stops with the last one."""
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.loop, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.loop, None)
+            if not self.subscriptions and self.hcontext is not None:
+                SCardCancel(self.hcontext)
+
+    def _publish(self, change: _Change | BaseException) -> None:
+        """Send a change to all the event loops, with the lock held."""
+        for loop, subscriptions in list(self.subscriptions.items()):
+            try:
+                loop.call_soon_threadsafe(_deliver, tuple(subscriptions), change)
+            except RuntimeError:
+                # the event loop is closed
+                del self.subscriptions[loop]
+
+    def _update(self, cards: dict[str, list[int]], readers: list[str]) -> None:
+        """Publish the difference with the previous cards and readers."""
+        with self.lock:
+            addedcards = [
+                Card(reader, atr)
+                for reader, atr in cards.items()
+                if self.cards.get(reader) != atr
+            ]
+            removedcards = [
+                Card(reader, atr)
+                for reader, atr in self.cards.items()
+                if cards.get(reader) != atr
+            ]
+            previous = set(self.readers)
+            current = set(readers)
+            addedreaders = [reader for reader in readers if reader not in previous]
+            removedreaders = [r for r in self.readers if r not in current]
+            initial = not self.initialized
+            self.cards = dict(cards)
+            self.readers = list(readers)
+            self.initialized = True
+            if initial or addedcards or removedcards or addedreaders or removedreaders:
+                self._publish(
+                    _Change(
+                        initial, addedcards, removedcards, addedreaders, removedreaders
+                    )
+                )
+
+    def _listReaders(self) -> list[str]:
+        hresult, readers = SCardListReaders(self.hcontext, [])
+        if hresult == SCARD_E_NO_READERS_AVAILABLE:
+            return []
+        if hresult != SCARD_S_SUCCESS:
+            raise SmartcardException(
+                "Failed to list readers " + SCardGetErrorMessage(hresult),
+                hresult=hresult,
+            )
+        return readers
+
+    def _wait(self) -> None:
+        """Wait for status changes while there are subscriptions."""
+        # pylint: disable=too-many-locals
+        # pylint: disable=too-many-branches
+        readerstates = ReaderStateSet()
+        readerschanged = True
+        timeout = INFINITE
+        cards: dict[str, list[int]] = {}
+        readers: list[str] = []
+        while True:
+            with self.lock:
+                if not self.subscriptions:
+                    return
+
+            if readerschanged:
+                readerschanged = False
+                readers = self._listReaders()
+                _added, removed = readerstates.update(readers + [PNP_NOTIFICATION])
+                for reader, _state, _atr in removed:
+                    cards.pop(reader, None)
+                # the initial state is known after the first status change
+                if self.initialized:
+                    self._update(cards, readers)
+
+            hresult, changes = readerstates.getStatusChange(self.hcontext, timeout)
+            if hresult in RENEW_ERRORS or hresult == SCARD_E_SYSTEM_CANCELLED:
+                # e.g. the resource manager restarted, start afresh
+                hcontext, self.hcontext = self.hcontext, None
+                self.hcontext = getContextManager().renew(hcontext)
+                readerstates = ReaderStateSet()
+                readerschanged = True
+                continue
+            if hresult == SCARD_E_TIMEOUT:
+                readerschanged = timeout != INFINITE
+                continue
+            if hresult in (SCARD_E_CANCELLED, SCARD_E_UNKNOWN_READER):
+                readerschanged = hresult == SCARD_E_UNKNOWN_READER
+                continue
+            if hresult != SCARD_S_SUCCESS:
+                raise SmartcardException(
+                    "Failed to get status change " + SCardGetErrorMessage(hresult),
+                    hresult=hresult,
+                )
+
+            for reader, eventstate, atr in changes:
+                if reader == PNP_NOTIFICATION:
+                    if eventstate & SCARD_STATE_UNKNOWN:
+                        # no PnP notification, poll the readers
+                        timeout = POLL_PERIOD
+                    if eventstate & (SCARD_STATE_CHANGED | SCARD_STATE_UNKNOWN):
+                        readerschanged = True
+                elif eventstate & SCARD_STATE_PRESENT:
+                    cards[reader] = atr
+                else:
+                    cards.pop(reader, None)
+            self._update(cards, readers)
+
+    def _run(self) -> None:
+        try:
+            self.hcontext = getContextManager().acquire(shared=False)
+            self._wait()
+        except (SmartcardException, BaseSCardException) as exc:
+            with self.lock:
+                self._publish(exc)
+                # the subscriptions end with the error, the thread is
+                # started again only for new subscriptions
+                self.subscriptions = {}
+        finally:
+            with self.lock:
+                hcontext, self.hcontext = self.hcontext, None
+                if hcontext is not None:
+                    try:
+                        getContextManager().release(hcontext)
+                    except BaseSCardException:
+                        pass
+                self.cards = {}
+                self.readers = []
+                self.initialized = False
+                self.thread = None
+                # subscribed while the thread was stopping
+                if self.subscriptions:
+                    self.thread = threading.Thread(
+                        target=self._run, name="smartcard.aio", daemon=True
+                    )
+                    self.thread.start()
+
+
+_hub = _StatusChangeHub()
+
+
+async def card_events(
+    readers: typing.Iterable[str | Reader] | None = None,
+) -> typing.AsyncIterator[tuple[list[Card], list[Card]]]:
+    """Asynchronous iterator of card insertions and removals.
+
+        >>> async for addedcards, removedcards in card_events():
+        ...     print(addedcards, removedcards)
+
+    The first event lists the cards already inserted, if any. All the
+    iterators of all the event loops share a single thread waiting for
+    status changes.
+
+    @param readers: the readers or reader names to monitor, default is
+        all readers
+
+    @return: the (addedcards, removedcards) of each event, as lists of
+        L{Card}
+    """
+    subscription = _Subscription(asyncio.get_running_loop(), readers)
+    _hub.subscribe(subscription)
+    try:
+        while True:
+            change = await subscription.get()
+            if change.addedcards or change.removedcards:
+                yield change.addedcards, change.removedcards
+    finally:
+        _hub.unsubscribe(subscription)
+
+
+async def reader_events() -> typing.AsyncIterator[tuple[list[Reader], list[Reader]]]:
+    """Asynchronous iterator of reader insertions and removals.
+
+        >>> async for addedreaders, removedreaders in reader_events():
+        ...     print(addedreaders, removedreaders)
+
+    The first event lists the readers already connected, if any.
+
+    @return: the (addedreaders, removedreaders) of each event, as lists
+        of L{PCSCReader}
+    """
+    subscription = _Subscription(asyncio.get_running_loop())
+    _hub.subscribe(subscription)
+    try:
+        while True:
+            change = await subscription.get()
+            if change.addedreaders or change.removedreaders:
+                yield (
+                    [PCSCReader(reader) for reader in change.addedreaders],
+                    [PCSCReader(reader) for reader in change.removedreaders],
+                )
+    finally:
+        _hub.unsubscribe(subscription)
+
+
+async def wait_for_card(
+    card_type: CardType | None = None,
+    timeout: float | None = None,
+    readers: typing.Iterable[str | Reader] | None = None,
+    newcardonly: bool = False,
+) -> Card:
+    """Wait for a card, the asynchronous equivalent of
+    L{smartcard.CardRequest.CardRequest.waitforcard()}.
+
+        >>> card = await wait_for_card(ATRCardType(atr), timeout=10)
+        >>> connection = card.createConnection()
+
+    @param card_type: the L{CardType} to wait for, default is
+        L{AnyCardType}. The matching runs in the default executor, since
+        some card types connect to the card.
+    @param timeout: the time in seconds to wait, None to wait forever
+    @param readers: the readers or reader names to consider, default is
+        all readers
+    @param newcardonly: if True, ignore the cards already inserted
+
+    @return: the L{Card}
+
+    @raise CardRequestTimeoutException: on time-out
+    """
+    if card_type is None:
+        card_type = AnyCardType()
+    loop = asyncio.get_running_loop()
+
+    async def wait() -> Card:
+        subscription = _Subscription(loop, readers)
+        _hub.subscribe(subscription)
+        try:
+            while True:
+                change = await subscription.get()
+                if change.initial and newcardonly:
+                    continue
+                for card in change.addedcards:
+                    reader = PCSCReader(card.reader)
+                    if await loop.run_in_executor(
+                        None, card_type.matches, card.atr, reader
+                    ):
+                        return card
+        finally:
+            _hub.unsubscribe(subscription)
+
+    try:
+        return await asyncio.wait_for(wait(), timeout)
+    except asyncio.TimeoutError as exc:
+        raise CardRequestTimeoutException() from exc
+
+
+class _ReaderExecutors:
+    """One single-thread executor per reader, shared by the connections
+    to the reader, and shut down with the last one."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.executors: dict[str, tuple[ThreadPoolExecutor, int]] = {}
+
+    def acquire(self, reader: str) -> ThreadPoolExecutor:
+        """Return the executor of a reader, started on first use, to
+        release with L{release()}.
+
+        @param reader: the reader name
+
+        @return: the single-thread executor of the reader
+        """
+        with self.lock:
+            executor, count = self.executors.get(reader, (None, 0))
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"smartcard.aio {reader}"
+                )
+            self.executors[reader] = (executor, count + 1)
+            return executor
+
+    def release(self, reader: str) -> None:
+        """Release the executor of a reader returned by L{acquire()}; the
+        executor is shut down with its last user.
+
+        @param reader: the reader name
+        """
+        with self.lock:
+            executor, count = self.executors[reader]
+            if count > 1:
+                self.executors[reader] = (executor, count - 1)
+                return
+            del self.executors[reader]
+        executor.shutdown(wait=False)
+
+
+_executors = _ReaderExecutors()
+
+
+class AsyncCardConnection:
+    """asyncio wrapper of a L{CardConnection}, e.g. a L{PCSCCardConnection}.
+
+        >>> async with AsyncCardConnection(reader.createConnection()) as conn:
+        ...     await conn.connect()
+        ...     response, sw1, sw2 = await conn.transmit(SELECT + DF_TELECOM)
+
+    The blocking calls run on a single thread per reader, shared by all
+    the connections to the reader, so that the calls to a card stay
+    ordered while the event loop and the other readers go on; the PC/SC
+    calls release the GIL.
+
+    When an awaiting task is cancelled, the calls not started yet are
+    dropped, and SCardCancel() is called on the context of the
+    connection. PC/SC cannot abort an APDU exchange in progress, so a
+    transmit in progress still completes in the reader thread, before
+    the next call."""
+
+    def __init__(self, connection: CardConnection) -> None:
+        """Wrap a card connection.
+
+        @param connection: the L{CardConnection}
+        """
+        self.connection = connection
+        self.reader = str(connection.getReader())
+        self.executor: ThreadPoolExecutor | None = _executors.acquire(self.reader)
+
+    async def _call(self, function: typing.Callable, *args: typing.Any) -> typing.Any:
+        if self.executor is None:
+            raise SmartcardException("AsyncCardConnection released")
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, function, *args)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self) -> None:
+        """Call SCardCancel() on the PC/SC context of the connection, to
+        interrupt a blocking call in progress."""
+        connection = self.connection
+        while connection is not None and not hasattr(connection, "hcontext"):
+            # CardConnectionDecorator
+            connection = getattr(connection, "component", None)
+        hcontext = getattr(connection, "hcontext", None)
+        if hcontext is not None:
+            SCardCancel(hcontext)
+
+    async def connect(self, protocol=None, mode=None, disposition=None) -> None:
+        """L{CardConnection.connect()}"""
+        await self._call(self.connection.connect, protocol, mode, disposition)
+
+    async def reconnect(self, protocol=None, mode=None, disposition=None) -> None:
+        """L{CardConnection.reconnect()}"""
+        await self._call(self.connection.reconnect, protocol, mode, disposition)
+
+    async def disconnect(self) -> None:
+        """L{CardConnection.disconnect()}"""
+        await self._call(self.connection.disconnect)
+
+    async def release(self) -> None:
+        """Release the connection, and the reader thread of the last
+        connection to the reader."""
+        if self.executor is not None:
+            try:
+                await self._call(self.connection.release)
+            finally:
+                self.executor = None
+                _executors.release(self.reader)
+
+    async def transmit(self, command, protocol=None, as_bytes=False):
+        """L{CardConnection.transmit()}
+
+        @return: [response list], sw1, sw2
+        """
+        if as_bytes:
+            return await self._call(
+                functools.partial(self.connection.transmit, as_bytes=True),
+                command,
+                protocol,
+            )
+        return await self._call(self.connection.transmit, command, protocol)
+
+    async def control(self, controlCode, command=None):
+        """L{CardConnection.control()}
+
+        @return: response list
+        """
+        return await self._call(self.connection.control, controlCode, command)
+
+    async def getAttrib(self, attribId):
+        """L{CardConnection.getAttrib()}
+
+        @return: response list
+        """
+        return await self._call(self.connection.getAttrib, attribId)
+
+    def getATR(self):
+        """L{CardConnection.getATR()}"""
+        return self.connection.getATR()
+
+    def getReader(self):
+        """L{CardConnection.getReader()}"""
+        return self.connection.getReader()
+
+    async def __aenter__(self) -> AsyncCardConnection:
+        """Enter the runtime context."""
+        return self
+
+    async def __aexit__(self, e_type, value, traceback) -> None:
+        """Exit the runtime context, releasing the connection."""
+        await self.release()
@@ -0,0 +1,421 @@
+"""bench: framework overhead benchmarks, measured layer by layer
+
+Run with:
+
+    python -m smartcard.bench [--reader NAME] [--history FILE]
+
+The per-APDU benchmarks run against a zero latency
+L{smartcard.virtual.VirtualCard.VirtualCard}, so that they measure the
+Python overhead of each layer of the framework only, with no reader and
+no pcscd. With --reader, the PC/SC layers (SCardTransmit(),
+PCSCCardConnection.doTransmit() and transmit()) are measured too, on the
+card in the reader, e.g. a simulated card of a virtual PC/SC reader.
+
+With --history, the results are appended to a JSON file of the results
+of the previous runs, and compared to the previous run: the exit status
+is 1 if a benchmark is slower by more than the threshold.
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import argparse
+import datetime
+import importlib.metadata
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+
+from smartcard.ATR import ATR
+from smartcard.Card import Card
+from smartcard.CardConnectionDecorator import CardConnectionDecorator
+from smartcard.CardConnectionMetrics import Metrics, MetricsCardConnection
+from smartcard.CardConnectionObserver import CardConnectionObserver
+from smartcard.CardMonitoring import diffCards
+from smartcard.pcsc.PCSCReader import PCSCReader
+from smartcard.reader.ReaderFactory import ReaderFactory
+from smartcard.scard import SCARD_PCI_T0, SCARD_PCI_T1, SCardTransmit
+from smartcard.Session import Session
+from smartcard.sw.ErrorCheckingChain import ErrorCheckingChain
+from smartcard.sw.ISO7816_4ErrorChecker import ISO7816_4ErrorChecker
+from smartcard.util import toBytes, toHexString
+from smartcard.virtual.VirtualCard import VirtualCard
+from smartcard.virtual.VirtualReader import VirtualReader, register
+
+SELECT_MF = [0x00, 0xA4, 0x00, 0x00, 0x02, 0x3F, 0x00]
+""" the command APDU of the per-APDU benchmarks """
+
+BENCH_ATR = toBytes(
+    "3B 9F 95 81 31 FE 9F 00 66 46 53 05 01 00 11 71 DF 00 00 03 90 00 80"
+)
+""" an ATR with interface bytes and historical bytes """
+
+BENCH_READER = "pyscard bench reader"
+
+MONITORED_CARDS = 1000
+""" the number of cards of the monitor diff benchmark """
+
+THRESHOLD = 20.0
+""" the default regression threshold, in percent """
+
+
+class Fixtures:
+    """The connections the benchmarks run on."""
+
+    def __init__(self, readername=None):
+        """Connect to the virtual card, and to the card in the PC/SC
+        reader if readername is not None."""
+        card = VirtualCard(BENCH_ATR, responses={bytes(SELECT_MF): b"\x90\x00"})
+        self.virtualreader = VirtualReader.add(BENCH_READER, card)
+        self.factorymethods = list(ReaderFactory.factorymethods)
+        self.connections = []
+        self.virtual = self.connect(self.virtualreader).component
+        self.pcsc = None
+        if readername is not None:
+            self.pcsc = self.connect(PCSCReader(readername)).component
+
+    def connect(self, reader):
+        """Return a new connected connection to the card in a reader."""
+        connection = reader.createConnection()
+        connection.connect()
+        self.connections.append(connection)
+        return connection
+
+    def session(self):
+        """Return a Session on the virtual card."""
+        register(exclusive=True)
+        try:
+            session = Session(BENCH_READER)
+        finally:
+            ReaderFactory.factorymethods[:] = self.factorymethods
+        self.connections.append(session.cs.connection)
+        return session
+
+    def close(self):
+        """Disconnect and delete the virtual reader."""
+        for connection in self.connections:
+            connection.disconnect()
+        VirtualReader.delete(BENCH_READER)
+
+
+BENCHMARKS = []
+""" the (name, setup) of the benchmarks, setup returning the function to
+time from the L{Fixtures}, or None if the benchmark cannot run """
+
+
+def benchmark(name):
+    """Decorator registering the setup function of a benchmark."""
+
+    def decorator(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+
+    return decorator
+
+
+@benchmark("scard.SCardTransmit")
+def _scardTransmit(fixtures):
+    if fixtures.pcsc is None:
+        return None
+    hcard = fixtures.pcsc.hcard
+    pci = SCARD_PCI_T0 if fixtures.pcsc.getProtocol() == 1 else SCARD_PCI_T1
+    return lambda: SCardTransmit(hcard, pci, SELECT_MF)
+
+
+@benchmark("PCSCCardConnection.doTransmit")
+def _pcscDoTransmit(fixtures):
+    if fixtures.pcsc is None:
+        return None
+    return lambda: fixtures.pcsc.doTransmit(SELECT_MF)
+
+
+@benchmark("PCSCCardConnection.transmit")
+def _pcscTransmit(fixtures):
+    if fixtures.pcsc is None:
+        return None
+    return lambda: fixtures.pcsc.transmit(SELECT_MF)
+
+
+@benchmark("VirtualCardConnection.doTransmit")
+def _virtualDoTransmit(fixtures):
+    return lambda: fixtures.virtual.doTransmit(SELECT_MF)
+
+
+@benchmark("CardConnection.transmit")
+def _transmit(fixtures):
+    return lambda: fixtures.virtual.transmit(SELECT_MF)
+
+
+@benchmark("CardConnection.transmit, one observer")
+def _transmitObserved(fixtures):
+    connection = fixtures.connect(fixtures.virtualreader).component
+    connection.addObserver(CardConnectionObserver())
+    return lambda: connection.transmit(SELECT_MF)
+
+
+@benchmark("CardConnectionDecorator x1")
+def _decorator(fixtures):
+    connection = CardConnectionDecorator(fixtures.virtual)
+    return lambda: connection.transmit(SELECT_MF)
+
+
+@benchmark("CardConnectionDecorator x4")
+def _decoratorStack(fixtures):
+    connection = fixtures.virtual
+    for _ in range(4):
+        connection = CardConnectionDecorator(connection)
+    return lambda: connection.transmit(SELECT_MF)
+
+
+@benchmark("MetricsCardConnection")
+def _metrics(fixtures):
+    connection = MetricsCardConnection(fixtures.virtual, Metrics())
+    return lambda: connection.transmit(SELECT_MF)
+
+
+@benchmark("ErrorCheckingChain")
+def _errorCheckingChain(fixtures):
+    # pylint: disable=unused-argument
+    errorchain = []
+    errorchain = [ErrorCheckingChain(errorchain, ISO7816_4ErrorChecker())]
+    return lambda: errorchain[0]([], 0x90, 0x00)
+
+
+@benchmark("ErrorCheckingChain, compiled")
+def _compiledErrorCheckingChain(fixtures):
+    # pylint: disable=unused-argument
+    errorchain = []
+    errorchain = [ErrorCheckingChain(errorchain, ISO7816_4ErrorChecker())]
+    compiled = errorchain[0].compile()
+    return lambda: compiled([], 0x90, 0x00)
+
+
+@benchmark("CardConnection.transmit, ErrorCheckingChain")
+def _transmitErrorChecking(fixtures):
+    connection = fixtures.connect(fixtures.virtualreader).component
+    errorchain = []
+    errorchain = [ErrorCheckingChain(errorchain, ISO7816_4ErrorChecker())]
+    connection.setErrorCheckingChain(errorchain)
+    return lambda: connection.transmit(SELECT_MF)
+
+
+@benchmark("Session.sendCommandAPDU")
+def _session(fixtures):
+    session = fixtures.session()
+    return lambda: session.sendCommandAPDU(SELECT_MF)
+
+
+@benchmark("ATR parsing")
+def _atr(fixtures):
+    # pylint: disable=unused-argument
+    return lambda: ATR(BENCH_ATR)
+
+
+@benchmark("toHexString, 256 bytes")
+def _toHexString(fixtures):
+    # pylint: disable=unused-argument
+    data = list(range(256))
+    return lambda: toHexString(data)
+
+
+@benchmark("toBytes, 256 bytes")
+def _toBytes(fixtures):
+    # pylint: disable=unused-argument
+    data = toHexString(list(range(256)))
+    return lambda: toBytes(data)
+
+
+@benchmark(f"monitor diff, {MONITORED_CARDS} cards")
+def _monitorDiff(fixtures):
+    # pylint: disable=unused-argument
+    def cards(atr):
+        return [Card(f"Reader {n:04d}", atr) for n in range(MONITORED_CARDS)]
+
+    # every card replaced
+    previouscards, currentcards = cards([0x3B, 0x00]), cards([0x3B, 0x01])
+    return lambda: diffCards(previouscards, currentcards)
+
+
+def measure(function, repeat=5, mintime=0.05):
+    """Time a function.
+
+    @param function: the function to time
+    @param repeat: the number of timings
+    @param mintime: the minimum duration of a timing, in seconds
+
+    @return: a dictionary of the median and minimum duration of a call,
+        in microseconds
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        duration = timer.timeit(number)
+        if duration >= mintime:
+            break
+        number = max(number * 2, int(number * mintime / max(duration, 1e-9)))
+    times = [duration] + timer.repeat(repeat - 1, number)
+    times = [t / number * 1e6 for t in times]
+    return {"median_us": statistics.median(times), "min_us": min(times)}
+
+
+def run(fixtures, names=None, repeat=5, mintime=0.05):
+    """Run the benchmarks.
+
+    @param fixtures: the L{Fixtures}
+    @param names: the substrings of the names of the benchmarks to run,
+        None for all
+    @param repeat: the number of timings of each benchmark
+    @param mintime: the minimum duration of a timing, in seconds
+
+    @return: a dictionary of the results of each benchmark that ran, see
+        L{measure()}
+    """
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and not any(n in name for n in names):
+            continue
+        function = setup(fixtures)
+        if function is not None:
+            results[name] = measure(function, repeat, mintime)
+    return results
+
+
+def environment():
+    """Return the description of the environment of the run."""
+    try:
+        version = importlib.metadata.version("pyscard")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    return {
+        "pyscard": version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def compare(results, previous, threshold=THRESHOLD):
+    """Compare results to the results of a previous run.
+
+    @param results: the results of the run
+    @param previous: the results of the previous run
+    @param threshold: the regression threshold, in percent
+
+    The minimum durations are compared, the least sensitive to the load
+    of the machine.
+
+    @return: the list of (name, previous minimum, minimum, change in
+        percent) of the benchmarks slower by more than the threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in previous:
+            continue
+        before, after = previous[name]["min_us"], result["min_us"]
+        change = (after - before) / before * 100 if before else 0.0
+        if change > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def loadHistory(path):
+    """Return the list of the runs of a history file, empty if the file
+    does not exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as history:
+        return json.load(history)
+
+
+def saveHistory(path, runs):
+    """Write the list of the runs to a history file."""
+    with open(path, "w", encoding="utf-8") as history:
+        json.dump(runs, history, indent=1)
+        history.write("\n")
+
+
+def main(argv=None):
+    """Run the benchmarks, print the results and update the history.
+
+    @return: the exit status, 1 on regression
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m smartcard.bench", description=__doc__.split("\n", maxsplit=1)[0]
+    )
+    parser.add_argument("--reader", help="PC/SC reader of the PC/SC benchmarks")
+    parser.add_argument("--history", help="JSON file of the results of the runs")
+    parser.add_argument(
+        "--no-save", action="store_true", help="compare to the history only"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="regression threshold in percent (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timings per benchmark")
+    parser.add_argument(
+        "--mintime", type=float, default=0.05, help="minimum duration of a timing"
+    )
+    parser.add_argument(
+        "benchmarks", nargs="*", help="run the benchmarks whose name contains these"
+    )
+    args = parser.parse_args(argv)
+
+    fixtures = Fixtures(args.reader)
+    try:
+        results = run(fixtures, args.benchmarks, args.repeat, args.mintime)
+    finally:
+        fixtures.close()
+
+    runs = loadHistory(args.history) if args.history else []
+    previous = runs[-1]["results"] if runs else {}
+    width = max(len(name) for name, _setup in BENCHMARKS)
+    print(f"{'benchmark':{width}} {'median':>12} {'min':>12} {'change':>8}")
+    for name, result in results.items():
+        line = (
+            f"{name:{width}} {result['median_us']:9.3f} us {result['min_us']:9.3f} us"
+        )
+        if name in previous and previous[name]["min_us"]:
+            before = previous[name]["min_us"]
+            line += f" {(result['min_us'] - before) / before * 100:+7.1f}%"
+        print(line)
+
+    regressions = compare(results, previous, args.threshold)
+    for name, before, after, change in regressions:
+        print(
+            f"regression: {name}: {before:.3f} us -> {after:.3f} us ({change:+.1f}%)",
+            file=sys.stderr,
+        )
+
+    if args.history and not args.no_save:
+        runs.append(
+            {
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "environment": environment(),
+                "results": results,
+            }
+        )
+        saveHistory(args.history, runs)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
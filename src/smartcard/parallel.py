@@ -0,0 +1,278 @@
+"""parallel: run a job on many cards at once, e.g. on a personalization or
+test rack
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import multiprocessing
+import pickle
+import queue
+import time
+import typing
+
+import smartcard.System
+from smartcard.CardRequest import CardRequest
+from smartcard.CardType import AnyCardType
+from smartcard.Exceptions import CardRequestTimeoutException, SmartcardException
+from smartcard.pcsc.PCSCReader import PCSCReader
+
+if typing.TYPE_CHECKING:
+    from smartcard.Card import Card
+    from smartcard.CardConnection import CardConnection
+    from smartcard.CardType import CardType
+    from smartcard.reader.Reader import Reader
+
+
+class JobResult(typing.NamedTuple):
+    """The outcome of a job on one card."""
+
+    reader: str
+    """ the name of the reader """
+    atr: list[int]
+    """ the ATR of the card """
+    result: typing.Any = None
+    """ the value returned by the job, None if it raised """
+    exception: BaseException | None = None
+    """ the exception raised by the connection or the job, None on success """
+    started: float = 0.0
+    """ the time the job started, as returned by time.time() """
+    elapsed: float = 0.0
+    """ the duration of the job in seconds, connection included """
+
+    @property
+    def ok(self) -> bool:
+        """True if the job succeeded."""
+        return self.exception is None
+
+
+def run_job(
+    job: typing.Callable[[CardConnection], typing.Any],
+    reader: str,
+    atr: list[int],
+    protocol: int | None = None,
+    mode: int | None = None,
+) -> JobResult:
+    """Connect to the card in a reader, run a job on the connection and
+    disconnect.
+
+    @param job: the callable run on the card connection
+    @param reader: the name of the reader
+    @param atr: the ATR of the card, reported in the result
+    @param protocol: the protocol mask of the connection, see
+        L{CardConnection.connect()}
+    @param mode: the share mode of the connection
+
+    @return: the L{JobResult}; the exceptions raised by the connection or
+        the job are captured in the result
+    """
+    started = time.time()
+    start = time.perf_counter()
+    result, exception = None, None
+    connection = None
+    try:
+        connection = PCSCReader(reader).createConnection()
+        connection.connect(protocol, mode)
+        result = job(connection)
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        exception = exc
+    finally:
+        if connection is not None:
+            try:
+                connection.disconnect()
+                connection.release()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                if exception is None:
+                    exception = exc
+    return JobResult(
+        reader, atr, result, exception, started, time.perf_counter() - start
+    )
+
+
+class JobRunner:
+    """Run a job on every matching card concurrently, with one thread per
+    reader, and stream the results back as the jobs complete:
+
+        >>> def personalize(connection):
+        ...     return connection.transmit(SELECT + AID)
+        >>> runner = JobRunner(groups=["Rack$1"], cardType=ATRCardType(atr))
+        >>> for result in runner.run(personalize):
+        ...     print(result.reader, result.elapsed, result.exception)
+
+    The cards are those present when L{run()} is called, in the selected
+    readers, that match the card type. A job gets a new connection,
+    connected before the job and disconnected after, and its result or
+    exception is captured in a L{JobResult}.
+
+    With processes, the readers are sharded round-robin across as many
+    worker processes, each running one thread per reader of its shard,
+    so that the Python overhead of the jobs is spread across cores for
+    very large racks. The job, its results and its exceptions must then
+    be picklable, e.g. the job is a module level function."""
+
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    def __init__(
+        self,
+        readers: list[str | Reader] | None = None,
+        groups: list[str] | None = None,
+        cardType: CardType | None = None,
+        protocol: int | None = None,
+        mode: int | None = None,
+        processes: int = 0,
+    ):
+        """Construct a job runner.
+
+        @param readers: the readers, or reader names, to run the job on;
+            default is all the readers
+        @param groups: the reader groups to run the job on; with readers,
+            only the readers of these groups are used
+        @param cardType: the L{smartcard.CardType.CardType} of the cards
+            to run the job on; default is any card
+        @param protocol: the protocol mask of the connections, see
+            L{CardConnection.connect()}
+        @param mode: the share mode of the connections
+        @param processes: the number of worker processes; default is to
+            run all the jobs in threads of the calling process
+        """
+        self.readers = readers
+        self.groups = groups
+        self.cardType = cardType if cardType is not None else AnyCardType()
+        self.protocol = protocol
+        self.mode = mode
+        self.processes = processes
+
+    def getReaderNames(self) -> list[str] | None:
+        """Return the names of the selected readers, or None for all
+        the readers."""
+        names = None
+        if self.readers is not None:
+            names = [str(reader) for reader in self.readers]
+        if self.groups:
+            ingroups = [str(reader) for reader in smartcard.System.readers(self.groups)]
+            names = ingroups if names is None else [n for n in names if n in ingroups]
+        return names
+
+    def cards(self) -> list[Card]:
+        """Return the cards present in the selected readers that match
+        the card type."""
+        names = self.getReaderNames()
+        if names == []:
+            return []
+        with CardRequest(readers=names, timeout=1) as cardrequest:
+            try:
+                cards = cardrequest.waitforcardevent()
+            except CardRequestTimeoutException:
+                return []
+        return [
+            card
+            for card in cards
+            if self.cardType.matches(card.atr, PCSCReader(card.reader))
+        ]
+
+    def run(
+        self, job: typing.Callable[[CardConnection], typing.Any]
+    ) -> typing.Iterator[JobResult]:
+        """Run a job on every matching card.
+
+        @param job: the callable run on the connection to each card
+
+        @return: an iterator of the L{JobResult} of each card, in order of
+            completion
+        """
+        jobs = [(card.reader, card.atr) for card in self.cards()]
+        if not jobs:
+            return iter([])
+        if self.processes > 0:
+            return self._runProcesses(job, jobs)
+        return _runThreads(job, jobs, self.protocol, self.mode)
+
+    def _runProcesses(self, job, jobs):
+        """Run the jobs sharded across the worker processes, the results
+        streamed back through a queue."""
+        count = min(self.processes, len(jobs))
+        shards = [jobs[i::count] for i in range(count)]
+        results = multiprocessing.Queue()
+        with concurrent.futures.ProcessPoolExecutor(
+            count, initializer=_initShard, initargs=(results,)
+        ) as executor:
+            futures = [
+                executor.submit(_runShard, job, shard, self.protocol, self.mode)
+                for shard in shards
+            ]
+            for _ in jobs:
+                while True:
+                    try:
+                        yield results.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        # e.g. the job could not be pickled
+                        for future in futures:
+                            if future.done() and future.exception() is not None:
+                                raise future.exception() from None
+
+
+def _runThreads(job, jobs, protocol, mode):
+    """Run the jobs in one thread per reader."""
+    with concurrent.futures.ThreadPoolExecutor(len(jobs)) as executor:
+        futures = [
+            executor.submit(run_job, job, reader, atr, protocol, mode)
+            for reader, atr in jobs
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+_shardResults = None
+""" the queue of the results in a worker process """
+
+
+def _initShard(results):
+    """Initialize a worker process with the queue of the results."""
+    global _shardResults  # pylint: disable=global-statement
+    _shardResults = results
+
+
+def _runShard(job, jobs, protocol, mode):
+    """Run a shard of the jobs in a worker process, and queue the results
+    as they complete."""
+    for result in _runThreads(job, jobs, protocol, mode):
+        try:
+            pickle.dumps(result)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            result = result._replace(
+                result=None,
+                exception=SmartcardException(f"Failed to pickle the result: {exc}"),
+            )
+        _shardResults.put(result)
+
+
+def run(
+    job: typing.Callable[[CardConnection], typing.Any], **kwargs
+) -> typing.Iterator[JobResult]:
+    """Run a job on every matching card, see L{JobRunner}.
+
+    @param job: the callable run on the connection to each card
+    @param kwargs: the reader selection and connection parameters of
+        L{JobRunner}
+
+    @return: an iterator of the L{JobResult} of each card, in order of
+        completion
+    """
+    return JobRunner(**kwargs).run(job)
@@ -28,8 +28,9 @@ from smartcard.Exceptions import (
     NoCardException,
     SmartcardException,
 )
+from smartcard.pcsc.PCSCContext import RENEW_ERRORS, getContextManager
+from smartcard.pcsc.PCSCExceptions import BaseSCardException
 from smartcard.scard import (
-    SCARD_E_INVALID_VALUE,
     SCARD_E_NO_SMARTCARD,
     SCARD_PCI_RAW,
     SCARD_PCI_T0,
@@ -40,20 +41,21 @@ from smartcard.scard import (
     SCARD_PROTOCOL_T15,
     SCARD_RESET_CARD,
     SCARD_S_SUCCESS,
-    SCARD_SCOPE_USER,
     SCARD_SHARE_SHARED,
     SCARD_UNPOWER_CARD,
     SCARD_W_REMOVED_CARD,
     SCardConnect,
     SCardControl,
     SCardDisconnect,
-    SCardEstablishContext,
     SCardGetAttrib,
     SCardGetErrorMessage,
     SCardReconnect,
-    SCardReleaseContext,
     SCardStatus,
     SCardTransmit,
+    SCardTransmitBatch,
+    SCardTransmitBytes,
+    SCardTransmitBytesAutoGetResponse,
+    SCardTransmitInto,
 )
 
 
@@ -107,12 +109,17 @@ class PCSCCardConnection(CardConnection):
         CardConnection.__init__(self, reader)
         self.hcard = None
         self.disposition = None
-        hresult, self.hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
-        if hresult != SCARD_S_SUCCESS:
+        self.autogetresponse = False
+        self.hcontext = None
+        try:
+            # a context of its own, not to serialize the transmits of the
+            # connections of other threads
+            self.hcontext = getContextManager().acquire(shared=False)
+        except BaseSCardException as exc:
             raise CardConnectionException(
-                "Failed to establish context : " + SCardGetErrorMessage(hresult),
-                hresult=hresult,
-            )
+                "Failed to establish context : " + SCardGetErrorMessage(exc.hresult),
+                hresult=exc.hresult,
+            ) from exc
 
     def __del__(self):
         """Destructor. Clean PCSC connection resources."""
@@ -125,13 +132,14 @@ class PCSCCardConnection(CardConnection):
         if self.hcontext is not None:
             CardConnection.release(self)
             self.disconnect()
-            hresult = SCardReleaseContext(self.hcontext)
-            if hresult not in (SCARD_S_SUCCESS, SCARD_E_INVALID_VALUE):
+            hcontext, self.hcontext = self.hcontext, None
+            try:
+                getContextManager().release(hcontext)
+            except BaseSCardException as exc:
                 raise CardConnectionException(
-                    "Failed to release context: " + SCardGetErrorMessage(hresult),
-                    hresult=hresult,
-                )
-            self.hcontext = None
+                    "Failed to release context: " + SCardGetErrorMessage(exc.hresult),
+                    hresult=exc.hresult,
+                ) from exc
         CardConnection.__del__(self)
 
     def connect(self, protocol=None, mode=None, disposition=None):
@@ -161,6 +169,12 @@ class PCSCCardConnection(CardConnection):
         hresult, self.hcard, dwActiveProtocol = SCardConnect(
             self.hcontext, str(self.reader), mode, pcscprotocol
         )
+        if hresult in RENEW_ERRORS:
+            # the context is no longer valid, e.g. pcscd restarted
+            getContextManager().renewcontext(self, CardConnectionException)
+            hresult, self.hcard, dwActiveProtocol = SCardConnect(
+                self.hcontext, str(self.reader), mode, pcscprotocol
+            )
         if hresult != SCARD_S_SUCCESS:
             self.hcard = None
             if hresult in (SCARD_W_REMOVED_CARD, SCARD_E_NO_SMARTCARD):
@@ -275,6 +289,20 @@ class PCSCCardConnection(CardConnection):
             )
         return atr
 
+    def setAutoGetResponse(self, enable=True):
+        """Enable or disable the automatic handling of the T=0 response
+        status words by the transmit methods.
+
+        When enabled, 61xx status words are followed by GET RESPONSE
+        commands and the response data are concatenated, and a command
+        answered with 6Cxx is sent again with the Le given by the card.
+        This is done in the smartcard.scard extension, only the final
+        response is returned to Python and seen by the observers.
+
+        @param enable: True to enable, False to disable
+        """
+        self.autogetresponse = enable
+
     def doTransmit(self, command, protocol=None):
         """Transmit an apdu to the card and return response apdu.
 
@@ -292,16 +320,10 @@ class PCSCCardConnection(CardConnection):
         if protocol is None:
             protocol = self.getProtocol()
         CardConnection.doTransmit(self, command, protocol)
-        pcscprotocolheader = translateprotocolheader(protocol)
-        if 0 == pcscprotocolheader:
-            raise CardConnectionException(
-                "Invalid protocol in transmit: must be "
-                + "CardConnection.T0_protocol, "
-                + "CardConnection.T1_protocol, or "
-                + "CardConnection.RAW_protocol"
-            )
-        if self.hcard is None:
-            raise CardConnectionException("Card not connected")
+        if self.autogetresponse:
+            data, sw1, sw2 = self.doTransmitBytes(command, protocol)
+            return list(data), sw1, sw2
+        pcscprotocolheader = self._pcscprotocolheader(protocol)
         hresult, response = SCardTransmit(self.hcard, pcscprotocolheader, command)
         if hresult != SCARD_S_SUCCESS:
             raise CardConnectionException(
@@ -323,6 +345,157 @@ class PCSCCardConnection(CardConnection):
         data = [(x + 256) % 256 for x in response[:-2]]
         return list(data), sw1, sw2
 
+    def doTransmitBytes(self, command, protocol=None):
+        """Transmit an apdu to the card and return the response apdu as bytes.
+
+        The response is built directly by SCardTransmitBytes(), or
+        SCardTransmitBytesAutoGetResponse() if enabled with
+        L{setAutoGetResponse()}, without per-byte conversion.
+
+        @param command:  command apdu to transmit (list of bytes or
+            bytes-like object)
+
+        @param protocol: the transmission protocol, from
+            L{CardConnection.T0_protocol}, L{CardConnection.T1_protocol}, or
+            L{CardConnection.RAW_protocol}
+
+        @return:     a tuple (response, sw1, sw2) where
+                    - response is a bytes object with the response data
+                    - sw1 is status word 1, e.g. 0x90
+                    - sw2 is status word 2, e.g. 0x1A
+        """
+        if protocol is None:
+            protocol = self.getProtocol()
+        pcscprotocolheader = self._pcscprotocolheader(protocol)
+        if self.autogetresponse:
+            transmitbytes = SCardTransmitBytesAutoGetResponse
+        else:
+            transmitbytes = SCardTransmitBytes
+        hresult, response, sw1, sw2 = transmitbytes(
+            self.hcard, pcscprotocolheader, command
+        )
+        if hresult != SCARD_S_SUCCESS:
+            raise CardConnectionException(
+                "Failed to transmit with protocol "
+                + dictProtocolHeader[pcscprotocolheader]
+                + ". "
+                + SCardGetErrorMessage(hresult),
+                hresult=hresult,
+            )
+
+        if sw1 is None:
+            raise CardConnectionException(
+                "Card returned no valid response", hresult=hresult
+            )
+
+        return response, sw1, sw2
+
+    def doTransmitMany(self, commands, protocol=None, stop_on=None):
+        """Transmit a sequence of apdus to the card in one
+        SCardTransmitBatch() call.
+
+        @param commands: list of command apdus to transmit
+
+        @param protocol: the transmission protocol, from
+            L{CardConnection.T0_protocol}, L{CardConnection.T1_protocol}, or
+            L{CardConnection.RAW_protocol}
+
+        @param stop_on:  None, or list of accepted status words
+
+        @return:     the list of (response, sw1, sw2) tuples of the
+                    transmitted apdus, response being a bytes object
+
+        @raise CardConnectionException: with a responses attribute, the
+            responses received before the failure
+        """
+        if self.autogetresponse:
+            return CardConnection.doTransmitMany(self, commands, protocol, stop_on)
+        if protocol is None:
+            protocol = self.getProtocol()
+        pcscprotocolheader = self._pcscprotocolheader(protocol)
+        hresult, responses = SCardTransmitBatch(
+            self.hcard, pcscprotocolheader, commands, stop_on
+        )
+        exc = None
+        if hresult != SCARD_S_SUCCESS:
+            exc = CardConnectionException(
+                "Failed to transmit with protocol "
+                + dictProtocolHeader[pcscprotocolheader]
+                + ". "
+                + SCardGetErrorMessage(hresult),
+                hresult=hresult,
+            )
+        for index, (_, sw1, _) in enumerate(responses):
+            if sw1 is None:
+                responses = responses[:index]
+                exc = CardConnectionException(
+                    "Card returned no valid response", hresult=hresult
+                )
+                break
+        if exc is not None:
+            exc.responses = responses
+            raise exc
+
+        return responses
+
+    def doTransmitInto(self, command, outbuf, protocol=None):
+        """Transmit an apdu to the card and write the response data into
+        outbuf with SCardTransmitInto().
+
+        @param command:  command apdu to transmit (list of bytes or
+            bytes-like object)
+
+        @param outbuf:   writable bytes-like object receiving the response
+            data
+
+        @param protocol: the transmission protocol, from
+            L{CardConnection.T0_protocol}, L{CardConnection.T1_protocol}, or
+            L{CardConnection.RAW_protocol}
+
+        @return:     a tuple (length, sw1, sw2) where
+                    - length is the number of response bytes written
+                    - sw1 is status word 1, e.g. 0x90
+                    - sw2 is status word 2, e.g. 0x1A
+        """
+        if self.autogetresponse:
+            return CardConnection.doTransmitInto(self, command, outbuf, protocol)
+        if protocol is None:
+            protocol = self.getProtocol()
+        pcscprotocolheader = self._pcscprotocolheader(protocol)
+        hresult, length, sw1, sw2 = SCardTransmitInto(
+            self.hcard, pcscprotocolheader, command, outbuf
+        )
+        if hresult != SCARD_S_SUCCESS:
+            raise CardConnectionException(
+                "Failed to transmit with protocol "
+                + dictProtocolHeader[pcscprotocolheader]
+                + ". "
+                + SCardGetErrorMessage(hresult),
+                hresult=hresult,
+            )
+
+        if sw1 is None:
+            raise CardConnectionException(
+                "Card returned no valid response", hresult=hresult
+            )
+
+        return length, sw1, sw2
+
+    def _pcscprotocolheader(self, protocol):
+        """Return the PCSC protocol header for a transmit with protocol,
+        checking that the protocol is valid and the card connected."""
+        pcscprotocolheader = translateprotocolheader(protocol)
+        if 0 == pcscprotocolheader:
+            raise CardConnectionException(
+                "Invalid protocol in transmit: must be "
+                + "CardConnection.T0_protocol, "
+                + "CardConnection.T1_protocol, or "
+                + "CardConnection.RAW_protocol"
+            )
+        if self.hcard is None:
+            raise CardConnectionException("Card not connected")
+        return pcscprotocolheader
+
     def doControl(self, controlCode, command=None):
         """Transmit a control command to the reader and return response.
 
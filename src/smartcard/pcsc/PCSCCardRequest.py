@@ -22,6 +22,7 @@ along with pyscard; if not, write to the Free Software
 Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 """
 
+import queue
 import threading
 from datetime import datetime
 
@@ -33,32 +34,81 @@ from smartcard.Exceptions import (
     CardRequestTimeoutException,
     ListReadersException,
 )
+from smartcard.pcsc.PCSCContext import RENEW_ERRORS, getContextManager
+from smartcard.pcsc.PCSCExceptions import BaseSCardException
+from smartcard.pcsc.PCSCPnPNotification import PNP_NOTIFICATION
 from smartcard.pcsc.PCSCReader import PCSCReader
 from smartcard.scard import (
     INFINITE,
     SCARD_E_CANCELLED,
     SCARD_E_NO_READERS_AVAILABLE,
     SCARD_E_NO_SERVICE,
-    SCARD_E_SERVICE_STOPPED,
     SCARD_E_SYSTEM_CANCELLED,
     SCARD_E_TIMEOUT,
     SCARD_E_UNKNOWN_READER,
     SCARD_S_SUCCESS,
-    SCARD_SCOPE_USER,
     SCARD_STATE_CHANGED,
     SCARD_STATE_PRESENT,
-    SCARD_STATE_UNAWARE,
+    SCARD_STATE_UNKNOWN,
+    ReaderStateSet,
     SCardCancel,
-    SCardEstablishContext,
     SCardGetErrorMessage,
-    SCardGetStatusChange,
     SCardListReaders,
-    SCardReleaseContext,
 )
 
 
+class _StatusChangeWaiter:
+    """Long-lived thread waiting for status changes for a card request, so
+    that the requesting thread can handle a KeyboardInterrupt.
+
+    The thread only holds the request and result queues, not the card
+    request, which can thus be garbage collected."""
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(
+            target=self._run, name="PCSCCardRequest", daemon=True
+        )
+        self.thread.start()
+
+    def getStatusChange(self, hcontext, timeout, readerstates):
+        """L{ReaderStateSet.getStatusChange()} in the waiter thread.
+
+        @return: hresult, changes"""
+        self.requests.put((readerstates, hcontext, timeout))
+        try:
+            return self.results.get()
+        except KeyboardInterrupt as exc:
+            hresult = SCardCancel(hcontext)
+            if hresult != SCARD_S_SUCCESS:
+                raise CardRequestException(
+                    "Failed to SCardCancel " + SCardGetErrorMessage(hresult),
+                    hresult=hresult,
+                ) from exc
+            # wait for the cancelled call to return
+            return self.results.get()
+
+    def stop(self):
+        """Stop the thread after the call in progress, if any."""
+        self.requests.put(None)
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            readerstates, hcontext, timeout = request
+            self.results.put(readerstates.getStatusChange(hcontext, timeout))
+
+
 class PCSCCardRequest(AbstractCardRequest):
-    """PCSC CardRequest class."""
+    """PCSC CardRequest class.
+
+    The waits run in a single waiter thread per request object, started
+    on the first wait. The list of readers is only read again when the
+    PnP notification pseudo-reader reports a reader insertion or removal.
+    A wait in progress can be interrupted with L{cancel()}."""
 
     # pylint: disable=too-many-arguments
     # pylint: disable=too-many-positional-arguments
@@ -101,26 +151,38 @@ class PCSCCardRequest(AbstractCardRequest):
         else:
             self.timeout = int(self.timeout * 1000)
 
-        hresult, self.hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
-        if hresult != SCARD_S_SUCCESS:
-            self.hcontext = None
-            raise CardConnectionException(hresult=hresult)
-        self.evt = threading.Event()
-        self.hresult = SCARD_S_SUCCESS
-        self.readerstates = {}
-        self.newstates = []
+        # a dedicated context, since SCardCancel() cancels all the
+        # blocking calls of a context
+        self.hcontext = None
+        self.waiter = None
+        try:
+            self.hcontext = getContextManager().acquire(shared=False)
+        except BaseSCardException as exc:
+            raise CardConnectionException(hresult=exc.hresult) from exc
+        self.readerstates = ReaderStateSet()
+        self.readerschanged = True
         self.timeout_init = self.timeout
 
     def __del__(self):
         self.release()
 
     def release(self):
-        """Release the PCSC context"""
+        """Stop the waiter thread and release the PCSC context"""
+        if getattr(self, "waiter", None) is not None:
+            waiter, self.waiter = self.waiter, None
+            waiter.stop()
+        if getattr(self, "hcontext", None) is not None:
+            hcontext, self.hcontext = self.hcontext, None
+            try:
+                getContextManager().release(hcontext)
+            except BaseSCardException as exc:
+                raise CardConnectionException(hresult=exc.hresult) from exc
+
+    def cancel(self):
+        """Cancel a L{waitforcard()} or L{waitforcardevent()} in progress
+        in another thread, which raises L{CardRequestTimeoutException}."""
         if self.hcontext is not None:
-            hresult = SCardReleaseContext(self.hcontext)
-            if hresult != SCARD_S_SUCCESS:
-                raise CardConnectionException(hresult=hresult)
-            self.hcontext = None
+            SCardCancel(self.hcontext)
 
     def getReaderNames(self):
         """Returns the list of PCSC readers on which to wait for cards."""
@@ -130,13 +192,8 @@ class PCSCCardRequest(AbstractCardRequest):
 
         # renew the context in case PC/SC was stopped
         # this happens on Windows when the last reader is disconnected
-        if hresult in (SCARD_E_SERVICE_STOPPED, SCARD_E_NO_SERVICE):
-            hresult = SCardReleaseContext(self.hcontext)
-            if hresult != SCARD_S_SUCCESS:
-                raise CardConnectionException(hresult=hresult)
-            hresult, self.hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
-            if hresult != SCARD_S_SUCCESS:
-                raise CardConnectionException(hresult=hresult)
+        if hresult in RENEW_ERRORS:
+            getContextManager().renewcontext(self, CardConnectionException)
             hresult, pcscreaders = SCardListReaders(self.hcontext, [])
         if SCARD_E_NO_READERS_AVAILABLE == hresult:
             return []
@@ -159,42 +216,99 @@ class PCSCCardRequest(AbstractCardRequest):
 
         return readers
 
-    # thread waiting for a change
-    # the main thread will handle a possible KeyboardInterrupt
-    def __getStatusChange(self):
-        self.hresult, self.newstates = SCardGetStatusChange(
-            self.hcontext, self.timeout, list(self.readerstates.values())
-        )
-        self.evt.set()
+    def __updateReaderNames(self, readerstates):
+        """Add the new readers to the reader state set, with the PnP
+        notification pseudo-reader, and remove the vanished readers.
+
+        @return: the list of added reader names, and the list of the
+        states of the removed readers"""
+        readernames = self.getReaderNames()
+        readernames.append(PNP_NOTIFICATION)
+        self.readerschanged = False
+        return readerstates.update(readernames)
+
+    def __getStatusChange(self, readerstates, timeout):
+        """Get the changes of the reader states, and flag the list of
+        readers to be read again if the PnP pseudo-reader reports a change
+        or a reader vanished.
+
+        A wait runs in the waiter thread, the calling thread handles a
+        possible KeyboardInterrupt."""
+        if timeout == 0:
+            hresult, changes = readerstates.getStatusChange(self.hcontext, 0)
+        else:
+            if self.waiter is None:
+                self.waiter = _StatusChangeWaiter()
+            hresult, changes = self.waiter.getStatusChange(
+                self.hcontext, timeout, readerstates
+            )
+
+        if hresult in (
+            SCARD_E_UNKNOWN_READER,
+            SCARD_E_SYSTEM_CANCELLED,
+            SCARD_E_NO_SERVICE,
+        ):
+            self.readerschanged = True
+        for readername, eventstate, _atr in changes:
+            # without PnP support, read the list of readers at each wait
+            if readername == PNP_NOTIFICATION and eventstate & (
+                SCARD_STATE_CHANGED | SCARD_STATE_UNKNOWN
+            ):
+                self.readerschanged = True
+        return hresult, changes
+
+    def __updateTimeout(self, startDate):
+        """Compute the remaining timeout."""
+        if self.timeout != INFINITE:
+            delta = datetime.now() - startDate
+            self.timeout = self.timeout_init - int(delta.total_seconds() * 1000)
+            # timeout cant be < 0
+            self.timeout = max(self.timeout, 0)
+
+    def __checkStatusChangeError(self, hresult):
+        """Raise on time-out and unexpected errors.
+
+        @return: True if the status change succeeded"""
+
+        # time-out
+        if hresult in (SCARD_E_TIMEOUT, SCARD_E_CANCELLED):
+            raise CardRequestTimeoutException(hresult=hresult)
+
+        # the reader was unplugged during the loop
+        if SCARD_E_UNKNOWN_READER == hresult:
+            return False
+
+        # this happens on Windows when the last reader is disconnected
+        if hresult in (SCARD_E_SYSTEM_CANCELLED, SCARD_E_NO_SERVICE):
+            return False
+
+        # some error happened
+        if SCARD_S_SUCCESS != hresult:
+            raise CardRequestException(
+                "Failed to get status change " + SCardGetErrorMessage(hresult),
+                hresult=hresult,
+            )
+        return True
+
+    def __matchingCardService(self, readername, atr):
+        """Return a card service for the card, or None if the card does
+        not match the request."""
+        reader = PCSCReader(readername)
+        if self.cardType.matches(atr, reader):
+            if self.cardServiceClass.supports("dummy"):
+                return self.cardServiceClass(reader.createConnection())
+        return None
 
     def waitforcard(self):
         """Wait for card insertion and returns a card service."""
-
-        # pylint: disable=too-many-statements
-        # pylint: disable=too-many-locals
         # pylint: disable=too-many-branches
 
         AbstractCardRequest.waitforcard(self)
-        cardfound = False
-
-        # create a dictionary entry for new readers
-        readerstates = {}
-        readernames = self.getReaderNames()
-        # add PnP special reader
-        readernames.append("\\\\?PnP?\\Notification")
 
-        for reader in readernames:
-            if reader not in readerstates:
-                readerstates[reader] = (reader, SCARD_STATE_UNAWARE)
-
-        # call SCardGetStatusChange only if we have some readers
-        if readerstates:
-            hresult, newstates = SCardGetStatusChange(
-                self.hcontext, 0, list(readerstates.values())
-            )
-        else:
-            hresult = SCARD_S_SUCCESS
-            newstates = []
+        # the readers with a card
+        readerstates = ReaderStateSet()
+        self.__updateReaderNames(readerstates)
+        hresult, changes = self.__getStatusChange(readerstates, 0)
 
         # we can expect normally time-outs or reader
         # disappearing just before the call
@@ -205,276 +319,107 @@ class PCSCCardRequest(AbstractCardRequest):
                 hresult=hresult,
             )
 
-        # update readerstate
-        for state in newstates:
-            readername, eventstate, atr = state
-            readerstates[readername] = (readername, eventstate)
-
         # if a new card is not requested, just return the first available
-        if not self.newcardonly:
-            for state in newstates:
-                readername, eventstate, atr = state
-                if eventstate & SCARD_STATE_PRESENT:
-                    reader = PCSCReader(readername)
-                    if self.cardType.matches(atr, reader):
-                        if self.cardServiceClass.supports("dummy"):
-                            cardfound = True
-                            return self.cardServiceClass(reader.createConnection())
+        present = set()
+        for readername, eventstate, atr in changes:
+            if readername == PNP_NOTIFICATION:
+                continue
+            if eventstate & SCARD_STATE_PRESENT:
+                present.add(readername)
+                if not self.newcardonly:
+                    cardservice = self.__matchingCardService(readername, atr)
+                    if cardservice is not None:
+                        return cardservice
 
         startDate = datetime.now()
         self.timeout = self.timeout_init
-        while not cardfound:
-
-            # create a dictionary entry for new readers
-            readernames = self.getReaderNames()
-
-            if self.readersAsked is None:
-                # add PnP special reader
-                readernames.append("\\\\?PnP?\\Notification")
-
-            for reader in readernames:
-                if reader not in readerstates:
-                    readerstates[reader] = (reader, SCARD_STATE_UNAWARE)
+        while True:
 
-            # remove dictionary entry for readers that disappeared
-            for oldreader in list(readerstates.keys()):
-                if oldreader not in readernames:
-                    del readerstates[oldreader]
+            # read the list of readers only if it changed
+            if self.readerschanged:
+                _added, removed = self.__updateReaderNames(readerstates)
+                for readername, _state, _atr in removed:
+                    present.discard(readername)
 
             # wait for card insertion
-            self.readerstates = readerstates
-            waitThread = threading.Thread(target=self.__getStatusChange)
-            waitThread.start()
-
-            # the main thread handles a possible KeyboardInterrupt
-            try:
-                waitThread.join()
-            except KeyboardInterrupt as exc:
-                hresult = SCardCancel(self.hcontext)
-                if hresult != SCARD_S_SUCCESS:
-                    raise CardRequestException(
-                        "Failed to SCardCancel " + SCardGetErrorMessage(hresult),
-                        hresult=hresult,
-                    ) from exc
-
-            # wait for the thread to finish in case of KeyboardInterrupt
-            self.evt.wait(timeout=None)
-
-            # get values set in the __getStatusChange thread
-            hresult = self.hresult
-            newstates = self.newstates
-
-            # compute remaining timeout
-            if self.timeout != INFINITE:
-                delta = datetime.now() - startDate
-                self.timeout -= int(delta.total_seconds() * 1000)
-                # timeout cant be < 0
-                self.timeout = max(self.timeout, 0)
-
-            # time-out
-            if hresult in (SCARD_E_TIMEOUT, SCARD_E_CANCELLED):
-                raise CardRequestTimeoutException(hresult=hresult)
-
-            # reader vanished before or during the call
-            if SCARD_E_UNKNOWN_READER == hresult:
-                pass
-
-            # this happens on Windows when the last reader is disconnected
-            elif hresult in (SCARD_E_SYSTEM_CANCELLED, SCARD_E_NO_SERVICE):
-                pass
-
-            # some error happened
-            elif SCARD_S_SUCCESS != hresult:
-                raise CardRequestException(
-                    "Failed to get status change " + SCardGetErrorMessage(hresult),
-                    hresult=hresult,
-                )
+            hresult, changes = self.__getStatusChange(readerstates, self.timeout)
+            self.__updateTimeout(startDate)
+            if not self.__checkStatusChangeError(hresult):
+                continue
 
             # something changed!
-            else:
-
-                # check if we have to return a match, i.e.
-                # if no new card in inserted and there is a card found
-                # or if a new card is requested, and there is a change+present
-                for state in newstates:
-                    readername, eventstate, atr = state
-                    _, oldstate = readerstates[readername]
-
-                    # the status can change on a card already inserted, e.g.
-                    # unpowered, in use, ...
-                    # if a new card is requested, clear the state changed bit
-                    # if the card was already inserted and is still inserted
-                    if self.newcardonly:
-                        if oldstate & SCARD_STATE_PRESENT and eventstate & (
-                            SCARD_STATE_CHANGED | SCARD_STATE_PRESENT
-                        ):
-                            eventstate = eventstate & (0xFFFFFFFF ^ SCARD_STATE_CHANGED)
-
-                    if (
-                        self.newcardonly
-                        and eventstate & SCARD_STATE_PRESENT
-                        and eventstate & SCARD_STATE_CHANGED
-                    ) or (not self.newcardonly and eventstate & SCARD_STATE_PRESENT):
-                        reader = PCSCReader(readername)
-                        if self.cardType.matches(atr, reader):
-                            if self.cardServiceClass.supports("dummy"):
-                                cardfound = True
-                                return self.cardServiceClass(reader.createConnection())
-
-                    # update state dictionary
-                    readerstates[readername] = (readername, eventstate)
-
-        # should not happen
-        return None
+            # the status can change on a card already inserted, e.g.
+            # unpowered, in use, ...; if a new card is requested, only
+            # consider the cards that were not present
+            for readername, eventstate, atr in changes:
+                if readername == PNP_NOTIFICATION:
+                    continue
+                if not eventstate & SCARD_STATE_PRESENT:
+                    present.discard(readername)
+                    continue
+                newcard = readername not in present
+                present.add(readername)
+                if newcard or not self.newcardonly:
+                    cardservice = self.__matchingCardService(readername, atr)
+                    if cardservice is not None:
+                        return cardservice
 
     def waitforcardevent(self):
         """Wait for card insertion or removal."""
-
-        # pylint: disable=too-many-statements
-        # pylint: disable=too-many-locals
         # pylint: disable=too-many-branches
 
         AbstractCardRequest.waitforcardevent(self)
-        presentcards = []
 
         startDate = datetime.now()
         eventfound = False
         self.timeout = self.timeout_init
+
+        # states from previous run
+        readerstates = self.readerstates
         while not eventfound:
 
-            # get states from previous run
-            readerstates = self.readerstates
-
-            # reinitialize at each iteration just in case a new reader appeared
-            _readernames = self.getReaderNames()
-            readernames = _readernames
-
-            if self.readersAsked is None:
-                # add PnP special reader
-                readernames.append("\\\\?PnP?\\Notification")
-
-            # first call?
-            if len(readerstates) == 0:
-                # init
-                for reader in readernames:
-                    # create a dictionary entry for new readers
-                    readerstates[reader] = (reader, SCARD_STATE_UNAWARE)
-
-            # check if a new reader with a card has just been connected
-            for reader in _readernames:
-                # is the reader a new one?
-                if reader not in readerstates:
-                    # create a dictionary entry for new reader
-                    readerstates[reader] = (reader, SCARD_STATE_UNAWARE)
-
-                    hresult, newstates = SCardGetStatusChange(
-                        self.hcontext, 0, list(readerstates.values())
-                    )
-
-                    # added reader is the last one (index is -1)
-                    _, state, _ = newstates[-1]
-                    if state & SCARD_STATE_PRESENT:
-                        eventfound = True
+            # read the list of readers only if it changed
+            if self.readerschanged or not readerstates:
+                firstcall = not readerstates
+                added, removed = self.__updateReaderNames(readerstates)
 
-            # check if a reader has been removed
-            to_remove = []
-            for reader in readerstates:
-                if reader not in readernames:
-                    _, state = readerstates[reader]
-                    # was the card present?
+                # was a card present in a removed reader?
+                for _reader, state, _atr in removed:
                     if state & SCARD_STATE_PRESENT:
                         eventfound = True
 
-                    to_remove.append(reader)
-
-            if to_remove:
-                for reader in to_remove:
-                    # remove reader
-                    del readerstates[reader]
-
-                # get newstates with new reader list
-                hresult, newstates = SCardGetStatusChange(
-                    self.hcontext, 0, list(readerstates.values())
-                )
+                # check if a new reader with a card has just been connected
+                if added and not firstcall:
+                    hresult, changes = self.__getStatusChange(readerstates, 0)
+                    for readername, eventstate, _atr in changes:
+                        if readername == PNP_NOTIFICATION:
+                            pass
+                        elif readername not in added:
+                            eventfound = True
+                        elif eventstate & SCARD_STATE_PRESENT:
+                            eventfound = True
 
             if eventfound:
                 break
 
-            # wait for card insertion
-            self.readerstates = readerstates
-            waitThread = threading.Thread(target=self.__getStatusChange)
-            waitThread.start()
-
-            # the main thread handles a possible KeyboardInterrupt
-            try:
-                waitThread.join()
-            except KeyboardInterrupt as exc:
-                hresult = SCardCancel(self.hcontext)
-                if hresult != SCARD_S_SUCCESS:
-                    raise CardRequestException(
-                        "Failed to SCardCancel " + SCardGetErrorMessage(hresult),
-                        hresult=hresult,
-                    ) from exc
-
-            # wait for the thread to finish in case of KeyboardInterrupt
-            self.evt.wait(timeout=None)
-
-            # get values set in the __getStatusChange thread
-            hresult = self.hresult
-            newstates = self.newstates
-
-            # compute remaining timeout
-            if self.timeout != INFINITE:
-                delta = datetime.now() - startDate
-                self.timeout -= int(delta.total_seconds() * 1000)
-                # timeout cant be < 0
-                self.timeout = max(self.timeout, 0)
-
-            # time-out
-            if hresult in (SCARD_E_TIMEOUT, SCARD_E_CANCELLED):
-                raise CardRequestTimeoutException(hresult=hresult)
-
-            # the reader was unplugged during the loop
-            if SCARD_E_UNKNOWN_READER == hresult:
-                pass
-
-            # this happens on Windows when the last reader is disconnected
-            elif hresult in (SCARD_E_SYSTEM_CANCELLED, SCARD_E_NO_SERVICE):
-                pass
-
-            # some error happened
-            elif SCARD_S_SUCCESS != hresult:
-                raise CardRequestException(
-                    "Failed to get status change " + SCardGetErrorMessage(hresult),
-                    hresult=hresult,
-                )
+            # wait for card insertion or removal
+            hresult, changes = self.__getStatusChange(readerstates, self.timeout)
+            self.__updateTimeout(startDate)
+            if not self.__checkStatusChangeError(hresult):
+                continue
 
             # something changed!
-            else:
-                for state in newstates:
-                    readername, eventstate, atr = state
-
-                    # ignore PnP reader
-                    if readername == "\\\\?PnP?\\Notification":
-                        continue
-
-                    if eventstate & SCARD_STATE_CHANGED:
-                        eventfound = True
-
-            # update readerstates for next SCardGetStatusChange() call
-            self.readerstates = {}
-            for reader, state, atr in newstates:
-                self.readerstates[reader] = (reader, state)
+            for readername, _eventstate, _atr in changes:
+                # ignore PnP reader
+                if readername != PNP_NOTIFICATION:
+                    eventfound = True
 
         # return all the cards present
-        for state in newstates:
-            readername, eventstate, atr = state
-            if readername == "\\\\?PnP?\\Notification":
-                continue
-            if eventstate & SCARD_STATE_PRESENT:
-                presentcards.append(Card.Card(readername, atr))
-
-        return presentcards
+        return [
+            Card.Card(readername, atr)
+            for readername, _state, atr in readerstates.states(SCARD_STATE_PRESENT)
+            if readername != PNP_NOTIFICATION
+        ]
 
 
 if __name__ == "__main__":
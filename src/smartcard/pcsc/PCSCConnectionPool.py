@@ -0,0 +1,212 @@
+"""ConnectionPool: keeps PC/SC card connections open between jobs
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import threading
+from contextlib import contextmanager
+
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import CardConnectionException
+from smartcard.pcsc.PCSCCardConnection import PCSCCardConnection
+from smartcard.scard import (
+    SCARD_LEAVE_CARD,
+    SCARD_S_SUCCESS,
+    SCARD_W_RESET_CARD,
+    SCardStatus,
+)
+
+
+class ConnectionPool:
+    """Pool of connected L{PCSCCardConnection} objects, keyed by reader.
+
+    Connecting to a card powers it up and negotiates the protocol. The
+    pool keeps the connections connected between jobs, with the
+    C{smartcard.scard.SCARD_LEAVE_CARD} disposition by default so that
+    the card stays powered, and hands them out under a lease:
+
+        >>> pool = ConnectionPool()
+        >>> with pool.lease(reader) as connection:
+        ...     connection.transmit(SELECT + AID)
+
+    On checkout, the connection is validated with SCardStatus(). It is
+    reconnected if the card was reset by another application, and
+    connected again if the card was removed or replaced, i.e. when its
+    ATR changed.
+
+    The pool can be used from several threads. At most maxconnections
+    connections are leased per reader at a time; a checkout waits for
+    a connection to be returned to the pool."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(
+        self, protocol=None, mode=None, disposition=SCARD_LEAVE_CARD, maxconnections=1
+    ):
+        """Construct a connection pool.
+
+        @param protocol: the protocol mask of the connections, see
+            L{CardConnection.connect()}
+        @param mode: the share mode of the connections, see
+            L{CardConnection.connect()}
+        @param disposition: what to do with the card when a connection is
+            disconnected, C{smartcard.scard.SCARD_LEAVE_CARD} by default
+        @param maxconnections: maximum number of connections per reader
+        """
+        self.protocol = protocol
+        self.mode = mode
+        self.disposition = disposition
+        self.maxconnections = maxconnections
+        self.condition = threading.Condition()
+        self.idle = {}
+        self.leased = {}
+        self.leases = set()
+        self.atrs = {}
+        self.closed = False
+
+    def checkout(self, reader, timeout=None):
+        """Check out a connected connection to the card in reader.
+
+        @param reader: the reader, or reader name
+        @param timeout: the time in seconds to wait for a connection of
+            the reader to be checked in, None to wait forever
+
+        @return: a connected L{PCSCCardConnection}, to check in with
+            L{checkin()}
+        """
+        readername = str(reader)
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.closed
+                or self.idle.get(readername)
+                or self.leased.get(readername, 0) < self.maxconnections,
+                timeout,
+            ):
+                raise CardConnectionException(
+                    "No connection available for reader " + readername
+                )
+            if self.closed:
+                raise CardConnectionException("Connection pool closed")
+            idle = self.idle.get(readername)
+            connection = idle.pop() if idle else None
+            self.leased[readername] = self.leased.get(readername, 0) + 1
+
+        try:
+            if connection is None:
+                connection = PCSCCardConnection(readername)
+                self._connect(connection)
+            else:
+                self._validate(connection)
+        except BaseException:
+            if connection is not None:
+                self._discard(connection)
+            with self.condition:
+                self.leased[readername] -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.leases.add(connection)
+        return connection
+
+    def checkin(self, connection):
+        """Return a connection obtained with L{checkout()} to the pool.
+
+        The state set on the connection during the lease is reset: the
+        observers, the dispatcher and the error checking chain are removed,
+        and the automatic GET RESPONSE, the default protocol and the
+        disposition are restored.
+
+        @param connection: the L{PCSCCardConnection}
+        """
+        with self.condition:
+            if connection not in self.leases:
+                raise CardConnectionException("Connection not checked out")
+            self.leases.discard(connection)
+        self._reset(connection)
+        readername = connection.getReader()
+        with self.condition:
+            self.leased[readername] -= 1
+            self.condition.notify()
+            if not self.closed:
+                self.idle.setdefault(readername, []).append(connection)
+                return
+        self._discard(connection)
+
+    @contextmanager
+    def lease(self, reader, timeout=None):
+        """Context manager checking out and checking in a connection.
+
+        @param reader: the reader, or reader name
+        @param timeout: see L{checkout()}
+
+        @return: a connected L{PCSCCardConnection}
+        """
+        connection = self.checkout(reader, timeout)
+        try:
+            yield connection
+        finally:
+            self.checkin(connection)
+
+    def close(self):
+        """Disconnect and release the idle connections. The leased
+        connections are disconnected and released when checked in."""
+        with self.condition:
+            self.closed = True
+            connections = [c for idle in self.idle.values() for c in idle]
+            self.idle.clear()
+            self.condition.notify_all()
+        for connection in connections:
+            self._discard(connection)
+
+    def _connect(self, connection):
+        connection.connect(self.protocol, self.mode, self.disposition)
+        self.atrs[connection] = connection.getATR()
+
+    def _reset(self, connection):
+        connection.deleteObservers()
+        connection.setDispatcher(None)
+        connection.setErrorCheckingChain(None)
+        connection.setAutoGetResponse(False)
+        connection.setProtocol(CardConnection.T0_protocol | CardConnection.T1_protocol)
+        connection.disposition = self.disposition
+
+    def _validate(self, connection):
+        """Check that the connection is still connected to the same card,
+        reconnecting it otherwise."""
+        if connection.hcard is not None:
+            hresult, _reader, _state, _protocol, atr = SCardStatus(connection.hcard)
+            if hresult == SCARD_S_SUCCESS and atr == self.atrs.get(connection):
+                return
+            if hresult == SCARD_W_RESET_CARD:
+                # reset by another application, the same card is present
+                connection.reconnect(self.protocol, self.mode, SCARD_LEAVE_CARD)
+                connection.disposition = self.disposition
+                self.atrs[connection] = connection.getATR()
+                return
+            try:
+                connection.disconnect()
+            except CardConnectionException:
+                pass
+        # card removed or replaced, or connection disconnected by a job
+        self._connect(connection)
+
+    def _discard(self, connection):
+        self.atrs.pop(connection, None)
+        try:
+            connection.release()
+        except CardConnectionException:
+            pass
@@ -0,0 +1,245 @@
+"""PCSCContext: process-wide manager of PC/SC resource manager contexts
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+from smartcard.pcsc.PCSCExceptions import (
+    BaseSCardException,
+    EstablishContextException,
+    ReleaseContextException,
+)
+from smartcard.scard import (
+    SCARD_E_INVALID_HANDLE,
+    SCARD_E_INVALID_VALUE,
+    SCARD_E_NO_SERVICE,
+    SCARD_E_SERVICE_STOPPED,
+    SCARD_S_SUCCESS,
+    SCARD_SCOPE_USER,
+    SCardEstablishContext,
+    SCardReleaseContext,
+)
+
+# errors after which a context is no longer usable and must be renewed,
+# e.g. when pcscd was restarted or on Windows when the last reader is
+# removed
+RENEW_ERRORS = (SCARD_E_NO_SERVICE, SCARD_E_INVALID_HANDLE, SCARD_E_SERVICE_STOPPED)
+
+
+class PCSCContextManager:
+    """Hand out PC/SC contexts shared by the whole process.
+
+    Establishing a context is a round trip to the resource manager. The
+    shared context is established on the first L{acquire()} and then kept
+    open; L{acquire()} and L{release()} only maintain a reference count,
+    so that a context invalidated by L{renew()} is released when its last
+    user, e.g. a card connection whose card handle depends on it, releases
+    it. The next L{acquire()} lazily establishes a new shared context.
+
+    Dedicated contexts, acquired with shared=False, are for card
+    connections, as the resource manager serializes the calls on a
+    context, for blocking calls such as SCardGetStatusChange(), and for
+    SCardCancel(), which cancels all the blocking calls of a context. A
+    released dedicated context is kept idle, up to maxidle contexts, and
+    handed out again by the next L{acquire()}, so that connecting to a
+    card does not cost establishing and releasing a context.
+
+    The contexts can be used from several threads."""
+
+    def __init__(self, scope=SCARD_SCOPE_USER, maxidle=8):
+        """Construct a context manager.
+
+        @param scope: the scope of the established contexts
+        @param maxidle: the maximum number of idle dedicated contexts kept
+        """
+        self.scope = scope
+        self.maxidle = maxidle
+        self.mutex = threading.Lock()
+        self.hcontext = None
+        self.refcounts = {}
+        self.dedicated = set()
+        self.idle = []
+
+    def acquire(self, shared=True):
+        """Return a context, to release with L{release()}.
+
+        @param shared: True for the shared context, False to establish a
+            dedicated context
+
+        @return: the context handle
+        """
+        with self.mutex:
+            if shared and self.hcontext is not None:
+                self.refcounts[self.hcontext] += 1
+                return self.hcontext
+            if not shared and self.idle:
+                hcontext = self.idle.pop()
+                self.dedicated.add(hcontext)
+                self.refcounts[hcontext] = 1
+                return hcontext
+            hresult, hcontext = SCardEstablishContext(self.scope)
+            if hresult != SCARD_S_SUCCESS:
+                raise EstablishContextException(hresult)
+            if shared:
+                # the manager keeps a reference on the shared context
+                self.hcontext = hcontext
+                self.refcounts[hcontext] = 2
+            else:
+                self.dedicated.add(hcontext)
+                self.refcounts[hcontext] = 1
+            return hcontext
+
+    def release(self, hcontext, idle=True):
+        """Release a context returned by L{acquire()} or L{renew()}.
+
+        @param hcontext: the context handle
+        @param idle: False not to keep a dedicated context idle
+        """
+        with self.mutex:
+            if hcontext not in self.refcounts:
+                return
+            self.refcounts[hcontext] -= 1
+            if self.refcounts[hcontext] > 0:
+                return
+            del self.refcounts[hcontext]
+            if hcontext in self.dedicated:
+                self.dedicated.discard(hcontext)
+                if idle and len(self.idle) < self.maxidle:
+                    self.idle.append(hcontext)
+                    return
+        self._releasecontext(hcontext)
+
+    def renew(self, hcontext):
+        """Replace a context that failed with one of the L{RENEW_ERRORS}.
+
+        The context is released, and if it is the shared context, it is no
+        longer handed out by L{acquire()}. The idle dedicated contexts,
+        likely invalid for the same reason, are released.
+
+        @param hcontext: the failed context handle, released
+
+        @return: a new context handle, to release with L{release()}
+        """
+        with self.mutex:
+            shared = hcontext not in self.dedicated
+            invalidated = hcontext == self.hcontext
+            if invalidated:
+                self.hcontext = None
+        if invalidated:
+            # the reference of the manager
+            self.release(hcontext)
+        self.release(hcontext, idle=False)
+        self._releaseidle()
+        return self.acquire(shared)
+
+    def renewcontext(self, owner, exceptionclass):
+        """Renew owner.hcontext after it failed with one of the
+        L{RENEW_ERRORS}, see L{renew()}.
+
+        @param owner: the object holding the context in its hcontext
+            attribute, None while the context is renewed
+        @param exceptionclass: the L{SmartcardException} class to raise if
+            no new context can be established
+        """
+        hcontext, owner.hcontext = owner.hcontext, None
+        try:
+            owner.hcontext = self.renew(hcontext)
+        except BaseSCardException as exc:
+            raise exceptionclass(
+                "Failed to establish context", hresult=exc.hresult
+            ) from exc
+
+    def close(self):
+        """Drop the reference of the manager on the shared context, and
+        release the idle contexts. The shared context is released when its
+        last user releases it."""
+        with self.mutex:
+            hcontext, self.hcontext = self.hcontext, None
+        if hcontext is not None:
+            self.release(hcontext)
+        self._releaseidle()
+
+    @contextmanager
+    def context(self):
+        """Context manager acquiring and releasing the shared context.
+
+        @return: the context handle
+        """
+        hcontext = self.acquire()
+        try:
+            yield hcontext
+        finally:
+            self.release(hcontext)
+
+    def call(self, function, *args):
+        """Call function(hcontext, *args) with the shared context.
+
+        If the call fails with one of the L{RENEW_ERRORS}, the context is
+        renewed and the call is made again.
+
+        @param function: a smartcard.scard function taking a context as
+            first argument, and returning a hresult or a tuple starting
+            with a hresult
+
+        @return: the result of the function
+        """
+        hcontext = self.acquire()
+        try:
+            result = function(hcontext, *args)
+            hresult = result[0] if isinstance(result, (list, tuple)) else result
+            if hresult in RENEW_ERRORS:
+                hcontext = self.renew(hcontext)
+                result = function(hcontext, *args)
+            return result
+        finally:
+            self.release(hcontext)
+
+    def reset(self):
+        """Forget the contexts without releasing them, e.g. in a forked
+        child process, where the contexts of the parent are not valid."""
+        self.mutex = threading.Lock()
+        self.hcontext = None
+        self.refcounts = {}
+        self.dedicated = set()
+        self.idle = []
+
+    def _releaseidle(self):
+        with self.mutex:
+            idle, self.idle = self.idle, []
+        for hcontext in idle:
+            self._releasecontext(hcontext)
+
+    @staticmethod
+    def _releasecontext(hcontext):
+        hresult = SCardReleaseContext(hcontext)
+        if hresult not in (SCARD_S_SUCCESS, SCARD_E_INVALID_VALUE) + RENEW_ERRORS:
+            raise ReleaseContextException(hresult)
+
+
+_manager = PCSCContextManager()
+atexit.register(_manager.close)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_manager.reset)
+
+
+def getContextManager():
+    """Return the process-wide L{PCSCContextManager}."""
+    return _manager
@@ -22,6 +22,7 @@ along with pyscard; if not, write to the Free Software
 Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 """
 
+from smartcard.Exceptions import SmartcardException
 from smartcard.scard import SCARD_CTL_CODE, SCARD_SHARE_DIRECT
 
 # constants defined in PC/SC v2 Part 10
@@ -206,6 +207,24 @@ def getTlvProperties(cardConnection, featureList=None, controlCode=None):
     return parseTlvProperties(response)
 
 
+def getMaxAPDUDataSize(cardConnection, featureList=None, controlCode=None):
+    """return the maximum data size of an extended APDU supported by the
+    reader, from the dwMaxAPDUDataSize TLV property
+
+    @param cardConnection: L{CardConnection} object
+    @param featureList: feature list as returned by L{getFeatureRequest()}
+    @param controlCode: control code for L{FEATURE_GET_TLV_PROPERTIES}
+
+    @rtype: int
+    @return: the maximum data size, 0 if the reader only supports short
+        APDUs or does not report it"""
+    try:
+        tlv = getTlvProperties(cardConnection, featureList, controlCode)
+    except SmartcardException:
+        return 0
+    return tlv.get("PCSCv2_PART10_PROPERTY_dwMaxAPDUDataSize", 0)
+
+
 def parseTlvProperties(response):
     """return the GET_TLV_PROPERTIES structure
 
@@ -0,0 +1,113 @@
+"""PCSCPnPNotification: wait for PC/SC reader insertion and removal
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from smartcard.Exceptions import SmartcardException
+from smartcard.pcsc.PCSCContext import RENEW_ERRORS, getContextManager
+from smartcard.pcsc.PCSCExceptions import BaseSCardException
+from smartcard.scard import (
+    INFINITE,
+    SCARD_E_CANCELLED,
+    SCARD_E_TIMEOUT,
+    SCARD_S_SUCCESS,
+    SCARD_STATE_CHANGED,
+    SCARD_STATE_UNAWARE,
+    SCARD_STATE_UNKNOWN,
+    SCardCancel,
+    SCardGetErrorMessage,
+    SCardGetStatusChange,
+)
+
+PNP_NOTIFICATION = "\\\\?PnP?\\Notification"
+""" the PC/SC pseudo-reader notifying reader insertion and removal """
+
+
+class PCSCPnPNotification:
+    """Blocking wait for reader insertion and removal, with
+    SCardGetStatusChange() on the PnP notification pseudo-reader.
+
+    The resource manager keeps the number of readers in the high word of
+    the state of the pseudo-reader, and reports a change when it differs
+    from the number passed in the current state. The first L{wait()}
+    returns at once if there are readers.
+
+    The wait uses a dedicated context of the L{PCSCContextManager}, so
+    that L{cancel()} only cancels this wait."""
+
+    def __init__(self):
+        """Construct a PnP notification waiter.
+
+        @raise SmartcardException: if no context can be established
+        """
+        try:
+            self.hcontext = getContextManager().acquire(shared=False)
+        except BaseSCardException as exc:
+            raise SmartcardException(
+                "Failed to establish context", hresult=exc.hresult
+            ) from exc
+        self.state = SCARD_STATE_UNAWARE
+
+    def __del__(self):
+        self.release()
+
+    def wait(self, timeout=INFINITE):
+        """Wait for a reader insertion or removal.
+
+        @param timeout: timeout in milliseconds, smartcard.scard.INFINITE
+            to wait forever
+
+        @return: True if the readers changed, False on timeout or if the
+            wait was cancelled with L{cancel()}
+
+        @raise SmartcardException: if the resource manager does not
+            support PnP notifications, or on error
+        """
+        if self.hcontext is None:
+            raise SmartcardException("PnP notification released")
+        hresult, newstates = SCardGetStatusChange(
+            self.hcontext, timeout, [(PNP_NOTIFICATION, self.state)]
+        )
+        if hresult in RENEW_ERRORS:
+            # e.g. pcscd restarted: wait on a new context, and report a
+            # change since readers may have changed in the meantime
+            getContextManager().renewcontext(self, SmartcardException)
+            self.state = SCARD_STATE_UNAWARE
+            return True
+        if hresult in (SCARD_E_TIMEOUT, SCARD_E_CANCELLED):
+            return False
+        if hresult != SCARD_S_SUCCESS:
+            raise SmartcardException(
+                "Failed to get status change " + SCardGetErrorMessage(hresult),
+                hresult=hresult,
+            )
+        _reader, eventstate, _atr = newstates[0]
+        if eventstate & SCARD_STATE_UNKNOWN:
+            raise SmartcardException("PnP notification not supported")
+        self.state = eventstate & ~SCARD_STATE_CHANGED
+        return bool(eventstate & SCARD_STATE_CHANGED)
+
+    def cancel(self):
+        """Cancel a L{wait()} in progress in another thread."""
+        if self.hcontext is not None:
+            SCardCancel(self.hcontext)
+
+    def release(self):
+        """Release the context."""
+        if getattr(self, "hcontext", None) is not None:
+            hcontext, self.hcontext = self.hcontext, None
+            getContextManager().release(hcontext)
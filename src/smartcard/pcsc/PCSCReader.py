@@ -29,12 +29,11 @@ from smartcard.Exceptions import (
     NoCardException,
 )
 from smartcard.pcsc.PCSCCardConnection import PCSCCardConnection
+from smartcard.pcsc.PCSCContext import getContextManager
 from smartcard.pcsc.PCSCExceptions import (
     AddReaderToGroupException,
-    EstablishContextException,
     IntroduceReaderException,
     ListReadersException,
-    ReleaseContextException,
     RemoveReaderFromGroupException,
 )
 from smartcard.reader.Reader import Reader
@@ -44,27 +43,30 @@ from smartcard.scard import (
     SCARD_E_NO_SERVICE,
     SCARD_E_SERVICE_STOPPED,
     SCARD_S_SUCCESS,
-    SCARD_SCOPE_USER,
     SCardAddReaderToGroup,
-    SCardEstablishContext,
     SCardIntroduceReader,
     SCardListReaders,
-    SCardReleaseContext,
     SCardRemoveReaderFromGroup,
 )
 
 
-def __PCSCreaders__(hcontext, groups=None):
+def __PCSCreaders__(hcontext=None, groups=None):
     """Returns the list of PCSC smartcard readers in PCSC group.
 
     If group is not specified, returns the list of all PCSC smartcard readers.
+
+    If hcontext is not specified, the shared context of the
+    L{PCSCContextManager} is used.
     """
 
     if groups is None:
         groups = []
     elif isinstance(groups, str):
         groups = [groups]
-    hresult, readers = SCardListReaders(hcontext, groups)
+    if hcontext is None:
+        hresult, readers = getContextManager().call(SCardListReaders, groups)
+    else:
+        hresult, readers = SCardListReaders(hcontext, groups)
     if hresult != SCARD_S_SUCCESS:
         if hresult == SCARD_E_NO_READERS_AVAILABLE:
             readers = []
@@ -88,35 +90,22 @@ class PCSCReader(Reader):
     def addtoreadergroup(self, groupname):
         """Add reader to a reader group."""
 
-        hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+        contexts = getContextManager()
+        hresult = contexts.call(SCardIntroduceReader, self.name, self.name)
+        if hresult not in (SCARD_S_SUCCESS, SCARD_E_DUPLICATE_READER):
+            raise IntroduceReaderException(hresult, self.name)
+        hresult = contexts.call(SCardAddReaderToGroup, self.name, groupname)
         if SCARD_S_SUCCESS != hresult:
-            raise EstablishContextException(hresult)
-        try:
-            hresult = SCardIntroduceReader(hcontext, self.name, self.name)
-            if hresult not in (SCARD_S_SUCCESS, SCARD_E_DUPLICATE_READER):
-                raise IntroduceReaderException(hresult, self.name)
-            hresult = SCardAddReaderToGroup(hcontext, self.name, groupname)
-            if SCARD_S_SUCCESS != hresult:
-                raise AddReaderToGroupException(hresult, self.name, groupname)
-        finally:
-            hresult = SCardReleaseContext(hcontext)
-            if SCARD_S_SUCCESS != hresult:
-                raise ReleaseContextException(hresult)
+            raise AddReaderToGroupException(hresult, self.name, groupname)
 
     def removefromreadergroup(self, groupname):
         """Remove a reader from a reader group"""
 
-        hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+        hresult = getContextManager().call(
+            SCardRemoveReaderFromGroup, self.name, groupname
+        )
         if SCARD_S_SUCCESS != hresult:
-            raise EstablishContextException(hresult)
-        try:
-            hresult = SCardRemoveReaderFromGroup(hcontext, self.name, groupname)
-            if SCARD_S_SUCCESS != hresult:
-                raise RemoveReaderFromGroupException(hresult, self.name, groupname)
-        finally:
-            hresult = SCardReleaseContext(hcontext)
-            if SCARD_S_SUCCESS != hresult:
-                raise ReleaseContextException(hresult)
+            raise RemoveReaderFromGroupException(hresult, self.name, groupname)
 
     def createConnection(self):
         """Return a card connection thru PCSC reader."""
@@ -138,15 +127,7 @@ class PCSCReader(Reader):
         if groups is None:
             groups = []
         creaders = []
-        hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
-        if SCARD_S_SUCCESS != hresult:
-            raise EstablishContextException(hresult)
-        try:
-            pcsc_readers = __PCSCreaders__(hcontext, groups)
-        finally:
-            hresult = SCardReleaseContext(hcontext)
-            if SCARD_S_SUCCESS != hresult:
-                raise ReleaseContextException(hresult)
+        pcsc_readers = __PCSCreaders__(groups=groups)
 
         for reader in pcsc_readers:
             creaders.append(PCSCReader.Factory.create(reader))
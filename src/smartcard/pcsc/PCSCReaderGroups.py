@@ -22,21 +22,15 @@ along with pyscard; if not, write to the Free Software
 Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 """
 
-from smartcard.pcsc.PCSCExceptions import (
-    EstablishContextException,
-    ListReadersException,
-    ReleaseContextException,
-)
+from smartcard.pcsc.PCSCContext import getContextManager
+from smartcard.pcsc.PCSCExceptions import ListReadersException
 from smartcard.reader.ReaderGroups import innerreadergroups, readergroups
 from smartcard.scard import (
     SCARD_S_SUCCESS,
-    SCARD_SCOPE_USER,
-    SCardEstablishContext,
     SCardForgetReaderGroup,
     SCardGetErrorMessage,
     SCardIntroduceReaderGroup,
     SCardListReaderGroups,
-    SCardReleaseContext,
     error,
 )
 
@@ -59,60 +53,32 @@ class pcscinnerreadergroups(innerreadergroups):
         """Returns the list of smartcard reader groups."""
         innerreadergroups.getreadergroups(self)
 
-        hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
-        if hresult != SCARD_S_SUCCESS:
-            raise EstablishContextException(hresult)
-        hresult, readers = SCardListReaderGroups(hcontext)
+        hresult, readers = getContextManager().call(SCardListReaderGroups)
         if hresult != SCARD_S_SUCCESS:
             raise ListReadersException(hresult)
-        hresult = SCardReleaseContext(hcontext)
-        if hresult != SCARD_S_SUCCESS:
-            raise ReleaseContextException(hresult)
         return readers
 
     def addreadergroup(self, newgroup):
         """Add a reader group"""
 
-        hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+        hresult = getContextManager().call(SCardIntroduceReaderGroup, newgroup)
         if SCARD_S_SUCCESS != hresult:
-            raise error("Failed to establish context: " + SCardGetErrorMessage(hresult))
-        try:
-            hresult = SCardIntroduceReaderGroup(hcontext, newgroup)
-            if SCARD_S_SUCCESS != hresult:
-                raise error(
-                    "Unable to introduce reader group: " + SCardGetErrorMessage(hresult)
-                )
-
-            innerreadergroups.addreadergroup(self, newgroup)
-
-        finally:
-            hresult = SCardReleaseContext(hcontext)
-            if SCARD_S_SUCCESS != hresult:
-                raise error(
-                    "Failed to release context: " + SCardGetErrorMessage(hresult)
-                )
+            raise error(
+                "Unable to introduce reader group: " + SCardGetErrorMessage(hresult)
+            )
+
+        innerreadergroups.addreadergroup(self, newgroup)
 
     def removereadergroup(self, group):
         """Remove a reader group"""
 
-        hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
-        if SCARD_S_SUCCESS != hresult:
-            raise error("Failed to establish context: " + SCardGetErrorMessage(hresult))
-        try:
-            hresult = SCardForgetReaderGroup(hcontext, group)
-            if hresult != SCARD_S_SUCCESS:
-                raise error(
-                    "Unable to forget reader group: " + SCardGetErrorMessage(hresult)
-                )
-
-            innerreadergroups.removereadergroup(self, group)
-
-        finally:
-            hresult = SCardReleaseContext(hcontext)
-            if SCARD_S_SUCCESS != hresult:
-                raise error(
-                    "Failed to release context: " + SCardGetErrorMessage(hresult)
-                )
+        hresult = getContextManager().call(SCardForgetReaderGroup, group)
+        if hresult != SCARD_S_SUCCESS:
+            raise error(
+                "Unable to forget reader group: " + SCardGetErrorMessage(hresult)
+            )
+
+        innerreadergroups.removereadergroup(self, group)
 
 
 class PCSCReaderGroups(readergroups):
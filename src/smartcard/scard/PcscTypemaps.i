@@ -41,10 +41,13 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
     $1 = &temp;
     $1->ab = NULL;
     $1->bAllocated=FALSE;
+    $1->bBuffer=FALSE;
+    $1->bPooled=FALSE;
 }
 
 
-// builds a byte list from a Python list
+// builds a byte list from a Python list, or borrows the memory of
+// any object supporting the buffer protocol (bytes, bytearray, ...)
 %typemap(in) BYTELIST* INPUT(BYTELIST*)
 {
     $1 =  SCardHelper_PyByteListToBYTELIST( $input );
@@ -55,17 +58,7 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 // release bytelist arg
 %typemap(freearg) BYTELIST*
 {
-    if(NULL!=$1)
-    {
-        if(NULL!=$1->ab)
-        {
-            mem_Free( $1->ab );
-        }
-        if($1->bAllocated==TRUE)
-        {
-            mem_Free( $1 );
-        }
-    }
+    SCardHelper_FreeBYTELIST( $1 );
 }
 
 // builds a Python list from a byte list
@@ -87,6 +80,103 @@ Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 %apply BYTELIST* OUTPUT { BYTELIST* APDURESPONSE };
 %apply BYTELIST* OUTPUT { BYTELIST* OUTBUFFER };
 
+// APDU response as bytes, sw1 and sw2
+%apply BYTELIST* OUTPUT { BYTELIST* APDURESPONSEBYTES };
+%typemap(argout) BYTELIST* APDURESPONSEBYTES
+{
+    SCardHelper_AppendResponseBytesToPyObject( $1, &$result );
+}
+
+// APDU response received into a caller buffer: length, sw1 and sw2
+%apply BYTELIST* OUTPUT { BYTELIST* APDURESPONSEINTO };
+%typemap(argout) BYTELIST* APDURESPONSEINTO
+{
+    SCardHelper_AppendResponseLengthToPyObject( $1, &$result );
+}
+
+// writable caller buffer, e.g. bytearray, memoryview or mmap
+%typemap(in) BYTELIST* INTOBUFFER(BYTELIST*)
+{
+    $1 = SCardHelper_PyWritableBufferToBYTELIST( $input );
+    if (NULL == $1)
+        goto fail;
+}
+
+// APDU responses and control outputs use a receive buffer from the pool
+%typemap(in,numinputs=0)
+    BYTELIST* APDURESPONSE(BYTELIST temp),
+    BYTELIST* APDURESPONSEBYTES(BYTELIST temp),
+    BYTELIST* APDURESPONSEINTO(BYTELIST temp),
+    BYTELIST* OUTBUFFER(BYTELIST temp)
+{
+    $1 = &temp;
+    $1->ab = NULL;
+    $1->bAllocated=FALSE;
+    $1->bBuffer=FALSE;
+    $1->bPooled=FALSE;
+    if (!SCardHelper_AcquireRecvBuffer($1, MAX_BUFFER_SIZE_EXTENDED))
+        goto fail;
+}
+
+/*==============================================================================
+//
+// support for list of BYTELISTs, aka BYTELISTLIST, and list of status words
+//
+==============================================================================*/
+
+// builds a list of byte lists from a Python list of APDUs
+%typemap(in) BYTELISTLIST* APDUCOMMANDS(BYTELISTLIST*)
+{
+    $1 = SCardHelper_PyByteListListToBYTELISTLIST( $input );
+    if (NULL == $1)
+        goto fail;
+}
+
+// list of responses, received with a buffer from the pool
+%typemap(in,numinputs=0) BYTELISTLIST* APDURESPONSES
+{
+    $1 = mem_Malloc(sizeof(BYTELISTLIST));
+    if (NULL == $1)
+    {
+        PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+        goto fail;
+    }
+    $1->abl = NULL;
+    $1->cbl = 0;
+    $1->blRecv.ab = NULL;
+    $1->blRecv.bAllocated = FALSE;
+    $1->blRecv.bBuffer = FALSE;
+    $1->blRecv.bPooled = FALSE;
+    if (!SCardHelper_AcquireRecvBuffer(&$1->blRecv, MAX_BUFFER_SIZE_EXTENDED))
+        goto fail;
+}
+
+// builds a Python list of (bytes, sw1, sw2) responses
+%typemap(argout) BYTELISTLIST* APDURESPONSES
+{
+    SCardHelper_AppendResponseListToPyObject( $1, &$result );
+}
+
+// release list of bytelists
+%typemap(freearg) BYTELISTLIST*
+{
+    SCardHelper_FreeBYTELISTLIST( $1 );
+}
+
+// list of accepted status words, or None
+%typemap(in) SWLIST* STOPON(SWLIST*)
+{
+    $1 = SCardHelper_PySWListToSWLIST( $input );
+    if (NULL == $1)
+        goto fail;
+}
+
+// release list of status words
+%typemap(freearg) SWLIST*
+{
+    SCardHelper_FreeSWLIST( $1 );
+}
+
 /*==============================================================================
 //
 // support for ERRORSTRING
@@ -123,18 +123,18 @@ static int _ReaderStateFromTuple( PyObject* o, READERSTATELIST* prl, unsigned in
     // third tuple item is the ATR (optionally)
     if(PyTuple_Size(o)==3)
     {
-        BYTELIST* ATR = mem_Malloc(sizeof(BYTELIST));
+        BYTELIST* ATR;
+
+        o2 = PyTuple_GetItem(o, 2);
+
+        ATR = SCardHelper_PyByteListToBYTELIST(o2);
         if( !ATR )
         {
-            PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
             return 0;
         }
-        o2 = PyTuple_GetItem(o, 2);
-
-        ATR = SCardHelper_PyByteListToBYTELIST(o2);
         memcpy(prl->ars[x].rgbAtr, ATR->ab, ATR->cBytes);
         prl->ars[x].cbAtr = ATR->cBytes;
-        mem_Free(ATR);
+        SCardHelper_FreeBYTELIST(ATR);
     }
     return 1;
 }
@@ -197,20 +197,146 @@ builds a Python list from a byte list
 
 
 /**=======================================================================**/
-BYTELIST* SCardHelper_PyByteListToBYTELIST(PyObject* source)
+static void _AppendPyObject( PyObject* o, PyObject** ptarget )
+/*===========================================================================
+appends a Python object to the target, building a list if needed; steals
+the reference to the object
+===========================================================================*/
+{
+    if( !*ptarget )
+    {
+        *ptarget = o;
+    }
+    else if( *ptarget == Py_None )
+    {
+        Py_DECREF(Py_None);
+        *ptarget = o;
+    }
+    else
+    {
+        if( !PyList_Check(*ptarget) )
+        {
+            PyObject* o2 = *ptarget;
+            *ptarget = PyList_New(0);
+            PyList_Append(*ptarget,o2);
+            Py_XDECREF(o2);
+        }
+        PyList_Append(*ptarget,o);
+        Py_XDECREF(o);
+    }
+}
+
+
+/**=======================================================================**/
+void SCardHelper_AppendResponseBytesToPyObject(
+    BYTELIST* source, PyObject** ptarget )
+/*===========================================================================
+builds a Python bytes object with the response data and two integers
+sw1 and sw2 from an APDU response byte list; if less than two bytes
+were returned, the bytes object holds the raw response and sw1 and sw2
+are None
+===========================================================================*/
+{
+    PyObject* oData;
+    PyObject* oSW1;
+    PyObject* oSW2;
+
+    if( (NULL!=source) && (NULL!=source->ab) && (source->cBytes>=2) )
+    {
+        oData = PyBytes_FromStringAndSize(
+            (const char*)source->ab, source->cBytes-2 );
+        oSW1 = PyLong_FromLong( source->ab[source->cBytes-2] );
+        oSW2 = PyLong_FromLong( source->ab[source->cBytes-1] );
+    }
+    else
+    {
+        if( (NULL!=source) && (NULL!=source->ab) )
+        {
+            oData = PyBytes_FromStringAndSize(
+                (const char*)source->ab, source->cBytes );
+        }
+        else
+        {
+            oData = PyBytes_FromStringAndSize( NULL, 0 );
+        }
+        Py_INCREF(Py_None);
+        oSW1 = Py_None;
+        Py_INCREF(Py_None);
+        oSW2 = Py_None;
+    }
+
+    _AppendPyObject( oData, ptarget );
+    _AppendPyObject( oSW1, ptarget );
+    _AppendPyObject( oSW2, ptarget );
+}
+
+
+/**=======================================================================**/
+void SCardHelper_AppendResponseLengthToPyObject(
+    BYTELIST* source, PyObject** ptarget )
+/*===========================================================================
+builds the length of the response data and two integers sw1 and sw2 from
+an APDU response byte list; if less than two bytes were returned, the
+length is the raw response length and sw1 and sw2 are None
+===========================================================================*/
+{
+    PyObject* oLength;
+    PyObject* oSW1;
+    PyObject* oSW2;
+
+    if( (NULL!=source) && (NULL!=source->ab) && (source->cBytes>=2) )
+    {
+        oLength = PyLong_FromUnsignedLong( source->cBytes-2 );
+        oSW1 = PyLong_FromLong( source->ab[source->cBytes-2] );
+        oSW2 = PyLong_FromLong( source->ab[source->cBytes-1] );
+    }
+    else
+    {
+        oLength = PyLong_FromUnsignedLong( (NULL!=source) ? source->cBytes : 0 );
+        Py_INCREF(Py_None);
+        oSW1 = Py_None;
+        Py_INCREF(Py_None);
+        oSW2 = Py_None;
+    }
+
+    _AppendPyObject( oLength, ptarget );
+    _AppendPyObject( oSW1, ptarget );
+    _AppendPyObject( oSW2, ptarget );
+}
+
+
+/**=======================================================================**/
+static int _PyObjectToBYTELIST(PyObject* source, BYTELIST* pbl)
 /*===========================================================================
-build a Python byte list from a BYTELIST
+fills a BYTELIST from a Python byte list, or from any object supporting
+the buffer protocol (bytes, bytearray, memoryview, ...), in which case
+the object memory is used directly, without copy
 ===========================================================================*/
 {
     Py_ssize_t cBytes, x;
-    BYTELIST* pbl;
 
 
+    pbl->bBuffer=FALSE;
+    pbl->bPooled=FALSE;
+
+    // buffer protocol objects: borrow the memory, no copy
+    if (!PyList_Check(source) && PyObject_CheckBuffer(source))
+    {
+        if( PyObject_GetBuffer(source, &pbl->view, PyBUF_SIMPLE) < 0 )
+        {
+            return 0;
+        }
+        pbl->ab = pbl->view.buf;
+        pbl->cBytes = (SCARDDWORDARG)pbl->view.len;
+        pbl->bBuffer=TRUE;
+        return 1;
+    }
+
     // sanity check
     if (!PyList_Check(source))
     {
-        PyErr_SetString( PyExc_TypeError, "Expected a list object." );
-        return NULL;
+        PyErr_SetString( PyExc_TypeError, "Expected a list object or a bytes-like object." );
+        return 0;
     }
 
     cBytes = PyList_Size(source);
@@ -220,33 +346,23 @@ build a Python byte list from a BYTELIST
         if( !PyLong_Check(o) )
         {
             PyErr_SetString( PyExc_TypeError, "Expected a list of bytes." );
-            return NULL;
+            return 0;
         }
     }
 
-
-    pbl=mem_Malloc(sizeof(BYTELIST));
-    if( !pbl )
-    {
-        PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
-        return NULL;
-    }
-
     if (cBytes>0)
     {
         pbl->ab = mem_Malloc( cBytes*sizeof(unsigned char) );
         if( !pbl->ab )
         {
             PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
-            mem_Free( pbl );
-            return NULL;
+            return 0;
         }
     }
     else
     {
         pbl->ab=NULL;
     }
-    pbl->bAllocated=TRUE;
     pbl->cBytes=(SCARDDWORDARG)cBytes;
 
 
@@ -255,7 +371,387 @@ build a Python byte list from a BYTELIST
         PyObject* o = PyList_GetItem(source, x);
         pbl->ab[x] = (unsigned char)PyLong_AsLong(o);
     }
-    return (BYTELIST*)pbl;
+    return 1;
+}
+
+
+/**=======================================================================**/
+BYTELIST* SCardHelper_PyByteListToBYTELIST(PyObject* source)
+/*===========================================================================
+build a BYTELIST from a Python byte list, or from any object supporting
+the buffer protocol (bytes, bytearray, memoryview, ...), in which case
+the object memory is used directly, without copy
+===========================================================================*/
+{
+    BYTELIST* pbl;
+
+    pbl=mem_Malloc(sizeof(BYTELIST));
+    if( !pbl )
+    {
+        PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+        return NULL;
+    }
+
+    if( !_PyObjectToBYTELIST(source, pbl) )
+    {
+        mem_Free( pbl );
+        return NULL;
+    }
+    pbl->bAllocated=TRUE;
+    return pbl;
+}
+
+
+/**=======================================================================**/
+BYTELIST* SCardHelper_PyWritableBufferToBYTELIST(PyObject* source)
+/*===========================================================================
+build a BYTELIST on the memory of a writable object supporting the
+buffer protocol (bytearray, memoryview, mmap, ...), without copy
+===========================================================================*/
+{
+    BYTELIST* pbl;
+
+    pbl=mem_Malloc(sizeof(BYTELIST));
+    if( !pbl )
+    {
+        PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+        return NULL;
+    }
+    if( PyObject_GetBuffer(source, &pbl->view, PyBUF_WRITABLE) < 0 )
+    {
+        mem_Free( pbl );
+        return NULL;
+    }
+    pbl->ab = pbl->view.buf;
+    pbl->cBytes = (SCARDDWORDARG)pbl->view.len;
+    pbl->bAllocated=TRUE;
+    pbl->bBuffer=TRUE;
+    pbl->bPooled=FALSE;
+    return pbl;
+}
+
+
+/**==========================================================================
+                            Receive buffer pool
+===========================================================================*/
+
+// Receive buffers for SCardTransmit() and SCardControl() are taken from
+// and given back to this pool while holding the GIL, so that steady state
+// transmits do not allocate. All buffers have the same size.
+#define RECVBUFFER_POOL_SIZE 8
+static unsigned char* _apRecvBufferPool[RECVBUFFER_POOL_SIZE];
+static unsigned int _cRecvBufferPool = 0;
+static unsigned long _cRecvBufferAllocations = 0;
+
+/**=======================================================================**/
+int SCardHelper_AcquireRecvBuffer(BYTELIST* target, SCARDDWORDARG cBytes)
+/*===========================================================================
+sets the BYTELIST bytes to a receive buffer of cBytes bytes from the pool,
+allocating a new buffer if the pool is empty
+===========================================================================*/
+{
+    if( _cRecvBufferPool>0 )
+    {
+        target->ab = _apRecvBufferPool[--_cRecvBufferPool];
+    }
+    else
+    {
+        target->ab = mem_Malloc( cBytes*sizeof(unsigned char) );
+        if( !target->ab )
+        {
+            PyErr_SetString( PyExc_MemoryError, "Unable to allocate receive buffer" );
+            return 0;
+        }
+        _cRecvBufferAllocations++;
+    }
+    target->cBytes = cBytes;
+    target->bPooled = TRUE;
+    return 1;
+}
+
+/**=======================================================================**/
+static void _ReleaseRecvBuffer(unsigned char* ab)
+/*===========================================================================
+gives a receive buffer back to the pool, or frees it if the pool is full
+===========================================================================*/
+{
+    if( _cRecvBufferPool<RECVBUFFER_POOL_SIZE )
+    {
+        _apRecvBufferPool[_cRecvBufferPool++] = ab;
+    }
+    else
+    {
+        mem_Free( ab );
+    }
+}
+
+/**=======================================================================**/
+unsigned long SCardHelper_GetRecvBufferAllocations(void)
+/*===========================================================================
+returns the number of receive buffers allocated since the module was loaded
+===========================================================================*/
+{
+    return _cRecvBufferAllocations;
+}
+
+
+/**=======================================================================**/
+void SCardHelper_FreeBYTELIST(BYTELIST* source)
+/*===========================================================================
+release a BYTELIST: the borrowed buffer view or the allocated bytes, and
+the BYTELIST itself if it was allocated
+===========================================================================*/
+{
+    if(NULL==source)
+    {
+        return;
+    }
+    if(source->bBuffer==TRUE)
+    {
+        PyBuffer_Release( &source->view );
+    }
+    else if(source->bPooled==TRUE)
+    {
+        _ReleaseRecvBuffer( source->ab );
+    }
+    else if(NULL!=source->ab)
+    {
+        mem_Free( source->ab );
+    }
+    if(source->bAllocated==TRUE)
+    {
+        mem_Free( source );
+    }
+}
+
+
+/**==========================================================================
+                            BYTELISTLIST Helpers
+===========================================================================*/
+
+/**=======================================================================**/
+BYTELISTLIST* SCardHelper_PyByteListListToBYTELISTLIST(PyObject* source)
+/*===========================================================================
+build a BYTELISTLIST from a Python list or tuple of byte lists or
+bytes-like objects
+===========================================================================*/
+{
+    Py_ssize_t cItems, x;
+    BYTELISTLIST* pbll;
+
+    // sanity check
+    if (!PyList_Check(source) && !PyTuple_Check(source))
+    {
+        PyErr_SetString( PyExc_TypeError, "Expected a list of APDUs." );
+        return NULL;
+    }
+
+    pbll=mem_Malloc(sizeof(BYTELISTLIST));
+    if( !pbll )
+    {
+        PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+        return NULL;
+    }
+    pbll->abl = NULL;
+    pbll->cbl = 0;
+    pbll->blRecv.ab = NULL;
+    pbll->blRecv.bPooled = FALSE;
+
+    cItems = PySequence_Fast_GET_SIZE(source);
+    if( cItems>0 )
+    {
+        pbll->abl = mem_Malloc( cItems*sizeof(BYTELIST) );
+        if( !pbll->abl )
+        {
+            PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+            mem_Free( pbll );
+            return NULL;
+        }
+    }
+
+    for( x=0; x<cItems; x++ )
+    {
+        PyObject* o = PySequence_Fast_GET_ITEM( source, x );
+        if( !_PyObjectToBYTELIST(o, &pbll->abl[x]) )
+        {
+            SCardHelper_FreeBYTELISTLIST( pbll );
+            return NULL;
+        }
+        pbll->abl[x].bAllocated=FALSE;
+        pbll->cbl++;
+    }
+    return pbll;
+}
+
+/**=======================================================================**/
+void SCardHelper_AppendResponseListToPyObject(
+    BYTELISTLIST* source, PyObject** ptarget )
+/*===========================================================================
+builds a Python list of (bytes, sw1, sw2) tuples from a list of APDU
+responses; if less than two bytes were returned, the bytes object holds
+the raw response and sw1 and sw2 are None
+===========================================================================*/
+{
+    PyObject* oResponses;
+    unsigned int i;
+
+    oResponses = PyList_New( (NULL!=source) ? source->cbl : 0 );
+    for( i=0; (NULL!=source) && (i<source->cbl); i++ )
+    {
+        PyObject* oResponse = NULL;
+        SCardHelper_AppendResponseBytesToPyObject( &source->abl[i], &oResponse );
+        PyList_SetItem( oResponses, i, PyList_AsTuple( oResponse ) );
+        Py_DECREF( oResponse );
+    }
+
+    _AppendPyObject( oResponses, ptarget );
+}
+
+/**=======================================================================**/
+void SCardHelper_FreeBYTELISTLIST(BYTELISTLIST* source)
+/*===========================================================================
+release a BYTELISTLIST, its BYTELIST items and its receive buffer
+===========================================================================*/
+{
+    unsigned int i;
+
+    if(NULL==source)
+    {
+        return;
+    }
+    for( i=0; i<source->cbl; i++ )
+    {
+        SCardHelper_FreeBYTELIST( &source->abl[i] );
+    }
+    if(NULL!=source->abl)
+    {
+        mem_Free( source->abl );
+    }
+    if(source->blRecv.bPooled==TRUE)
+    {
+        _ReleaseRecvBuffer( source->blRecv.ab );
+    }
+    mem_Free( source );
+}
+
+
+/**==========================================================================
+                            SWLIST Helpers
+===========================================================================*/
+
+/**=======================================================================**/
+SWLIST* SCardHelper_PySWListToSWLIST(PyObject* source)
+/*===========================================================================
+build a SWLIST from None or from a Python iterable of status words
+===========================================================================*/
+{
+    PyObject* oSeq;
+    Py_ssize_t cItems, x;
+    SWLIST* psl;
+
+    psl=mem_Malloc(sizeof(SWLIST));
+    if( !psl )
+    {
+        PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+        return NULL;
+    }
+    psl->asw = NULL;
+    psl->csw = 0;
+    psl->bStop = FALSE;
+
+    if( Py_None==source )
+    {
+        return psl;
+    }
+
+    oSeq = PySequence_Fast( source, "Expected a list of status words." );
+    if( !oSeq )
+    {
+        mem_Free( psl );
+        return NULL;
+    }
+    psl->bStop = TRUE;
+    cItems = PySequence_Fast_GET_SIZE( oSeq );
+    if( cItems>0 )
+    {
+        psl->asw = mem_Malloc( cItems*sizeof(unsigned long) );
+        if( !psl->asw )
+        {
+            PyErr_SetString( PyExc_MemoryError, "Unable to allocate temporary array" );
+            Py_DECREF( oSeq );
+            mem_Free( psl );
+            return NULL;
+        }
+    }
+    for( x=0; x<cItems; x++ )
+    {
+        PyObject* o = PySequence_Fast_GET_ITEM( oSeq, x );
+        if( !PyLong_Check(o) )
+        {
+            PyErr_SetString( PyExc_TypeError, "Expected a list of status words." );
+            Py_DECREF( oSeq );
+            SCardHelper_FreeSWLIST( psl );
+            return NULL;
+        }
+        psl->asw[x] = PyLong_AsUnsignedLong( o );
+        if( ((unsigned long)-1==psl->asw[x]) && PyErr_Occurred() )
+        {
+            // negative or too large status word
+            Py_DECREF( oSeq );
+            SCardHelper_FreeSWLIST( psl );
+            return NULL;
+        }
+        psl->csw++;
+    }
+    Py_DECREF( oSeq );
+    return psl;
+}
+
+/**=======================================================================**/
+int SCardHelper_SWLISTAccepts(SWLIST* source, unsigned char sw1, unsigned char sw2)
+/*===========================================================================
+returns TRUE if the status words are in the list; a list item lower than
+0x100 is a SW1 value and matches any SW2
+===========================================================================*/
+{
+    unsigned int i;
+
+    if( (NULL==source) || !source->bStop )
+    {
+        return TRUE;
+    }
+    for( i=0; i<source->csw; i++ )
+    {
+        if( source->asw[i]<0x100 )
+        {
+            if( source->asw[i]==sw1 )
+            {
+                return TRUE;
+            }
+        }
+        else if( source->asw[i]==(unsigned long)((sw1<<8)|sw2) )
+        {
+            return TRUE;
+        }
+    }
+    return FALSE;
+}
+
+/**=======================================================================**/
+void SCardHelper_FreeSWLIST(SWLIST* source)
+/*===========================================================================
+release a SWLIST
+===========================================================================*/
+{
+    if(NULL==source)
+    {
+        return;
+    }
+    if(NULL!=source->asw)
+    {
+        mem_Free( source->asw );
+    }
+    mem_Free( source );
 }
 
 
@@ -25,8 +25,25 @@ typedef struct
     int bAllocated;
     unsigned char* ab;
     SCARDDWORDARG cBytes;
+    int bBuffer;        // ab points into view, release the view, not ab
+    Py_buffer view;
+    int bPooled;        // ab is a receive buffer from the pool
 } BYTELIST ;
 
+typedef struct
+{
+    BYTELIST* abl;
+    unsigned int cbl;
+    BYTELIST blRecv;    // receive buffer of a batched transmit
+} BYTELISTLIST ;
+
+typedef struct
+{
+    int bStop;          // FALSE if any status word is accepted
+    unsigned long* asw;
+    unsigned int csw;
+} SWLIST ;
+
 typedef char* ERRORSTRING;
 
 #ifdef PCSCLITE
@@ -74,7 +91,23 @@ typedef struct
 ==============================================================================*/
 // BYTELIST helpers
 void SCardHelper_AppendByteListToPyObject( BYTELIST* source, PyObject** ptarget );
+void SCardHelper_AppendResponseBytesToPyObject( BYTELIST* source, PyObject** ptarget );
+void SCardHelper_AppendResponseLengthToPyObject( BYTELIST* source, PyObject** ptarget );
 BYTELIST* SCardHelper_PyByteListToBYTELIST(PyObject* source);
+BYTELIST* SCardHelper_PyWritableBufferToBYTELIST(PyObject* source);
+void SCardHelper_FreeBYTELIST(BYTELIST* source);
+int SCardHelper_AcquireRecvBuffer(BYTELIST* target, SCARDDWORDARG cBytes);
+unsigned long SCardHelper_GetRecvBufferAllocations(void);
+
+// BYTELISTLIST helpers
+BYTELISTLIST* SCardHelper_PyByteListListToBYTELISTLIST(PyObject* source);
+void SCardHelper_AppendResponseListToPyObject( BYTELISTLIST* source, PyObject** ptarget );
+void SCardHelper_FreeBYTELISTLIST(BYTELISTLIST* source);
+
+// SWLIST helpers
+SWLIST* SCardHelper_PySWListToSWLIST(PyObject* source);
+int SCardHelper_SWLISTAccepts(SWLIST* source, unsigned char sw1, unsigned char sw2);
+void SCardHelper_FreeSWLIST(SWLIST* source);
 
 // ERRORSTRING helpers
 void SCardHelper_OutErrorStringAsPyObject( ERRORSTRING source, PyObject** ptarget );
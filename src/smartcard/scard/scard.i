@@ -448,7 +448,11 @@ static SCARDRETCODE _Control(
 {
     SCARDRETCODE lRet;
 
-    pblRecvBuffer->ab = (unsigned char*)mem_Malloc(MAX_BUFFER_SIZE_EXTENDED*sizeof(unsigned char));
+    // the receive buffer is normally provided by the typemap from the pool
+    if (NULL == pblRecvBuffer->ab)
+    {
+        pblRecvBuffer->ab = (unsigned char*)mem_Malloc(MAX_BUFFER_SIZE_EXTENDED*sizeof(unsigned char));
+    }
     pblRecvBuffer->cBytes = MAX_BUFFER_SIZE_EXTENDED;
 
     lRet = (mySCardControl)(
@@ -549,6 +553,464 @@ static SCARDRETCODE _GetStatusChange(
     return hresult;
 }
 
+///////////////////////////////////////////////////////////////////////////////
+// ReaderStateSet: a SCARD_READERSTATE array kept across SCardGetStatusChange
+// calls, the event state of a call being the current state of the next one
+typedef struct
+{
+    PyObject_HEAD
+    SCARD_READERSTATE* ars;
+    PyObject** aoReaders;       // reader names, as str
+    PyObject** aoReaderBytes;   // encoded reader names, szReader points there
+    Py_ssize_t cRStates;
+    Py_ssize_t cAllocated;
+    int bBusy;                  // SCardGetStatusChange() in progress
+} ReaderStateSetObject;
+
+static PyTypeObject ReaderStateSetType;
+
+static Py_ssize_t _ReaderStateSet_Find(ReaderStateSetObject* self, PyObject* oReader)
+{
+    Py_ssize_t i;
+
+    for (i=0; i<self->cRStates; i++)
+    {
+        if (0 == PyUnicode_Compare(self->aoReaders[i], oReader))
+        {
+            return i;
+        }
+    }
+    return -1;
+}
+
+static int _ReaderStateSet_CheckReader(PyObject* oReader)
+{
+    if (!PyUnicode_Check(oReader))
+    {
+        PyErr_SetString(PyExc_TypeError, "Expected a str as reader name.");
+        return 0;
+    }
+    return 1;
+}
+
+static int _ReaderStateSet_CheckIdle(ReaderStateSetObject* self)
+{
+    if (self->bBusy)
+    {
+        PyErr_SetString(PyExc_RuntimeError, "ReaderStateSet is in use by SCardGetStatusChange()");
+        return 0;
+    }
+    return 1;
+}
+
+static PyObject* _ReaderStateSet_State(ReaderStateSetObject* self, Py_ssize_t i, SCARDDWORDARG dwState)
+{
+    PyObject* oAtr;
+    SCARDDWORDARG j;
+    SCARD_READERSTATE* prs = &self->ars[i];
+
+    // ATR visibly not initialised
+    if (prs->cbAtr > SCARD_ATR_LENGTH)
+    {
+        prs->cbAtr = 0;
+    }
+    oAtr = PyList_New(prs->cbAtr);
+    if (NULL == oAtr)
+    {
+        return NULL;
+    }
+    for (j=0; j<prs->cbAtr; j++)
+    {
+        PyList_SET_ITEM(oAtr, j, PyLong_FromLong(prs->rgbAtr[j]));
+    }
+    return Py_BuildValue("(OkN)", self->aoReaders[i], (unsigned long)dwState, oAtr);
+}
+
+static int _ReaderStateSet_Add(ReaderStateSetObject* self, PyObject* oReader, SCARDDWORDARG dwState)
+{
+    PyObject* oReaderBytes;
+    SCARD_READERSTATE* prs;
+
+    oReaderBytes = PyUnicode_AsUTF8String(oReader);
+    if (NULL == oReaderBytes)
+    {
+        return 0;
+    }
+
+    if (self->cRStates == self->cAllocated)
+    {
+        Py_ssize_t cAllocated = self->cAllocated ? 2*self->cAllocated : 8;
+        SCARD_READERSTATE* ars;
+        PyObject** aoReaders;
+        PyObject** aoReaderBytes;
+
+        ars = PyMem_Realloc(self->ars, cAllocated*sizeof(SCARD_READERSTATE));
+        if (NULL != ars)
+        {
+            self->ars = ars;
+        }
+        aoReaders = PyMem_Realloc(self->aoReaders, cAllocated*sizeof(PyObject*));
+        if (NULL != aoReaders)
+        {
+            self->aoReaders = aoReaders;
+        }
+        aoReaderBytes = PyMem_Realloc(self->aoReaderBytes, cAllocated*sizeof(PyObject*));
+        if (NULL != aoReaderBytes)
+        {
+            self->aoReaderBytes = aoReaderBytes;
+        }
+        if (NULL == ars || NULL == aoReaders || NULL == aoReaderBytes)
+        {
+            Py_DECREF(oReaderBytes);
+            PyErr_NoMemory();
+            return 0;
+        }
+        self->cAllocated = cAllocated;
+    }
+
+    Py_INCREF(oReader);
+    self->aoReaders[self->cRStates] = oReader;
+    self->aoReaderBytes[self->cRStates] = oReaderBytes;
+    prs = &self->ars[self->cRStates];
+    /* zeroise SCARD_READERSTATE to work with remote desktop */
+    memset(prs, 0, sizeof(SCARD_READERSTATE));
+    prs->szReader = PyBytes_AS_STRING(oReaderBytes);
+    prs->dwCurrentState = dwState & (0xFFFFFFFF ^ SCARD_STATE_CHANGED);
+    self->cRStates++;
+    return 1;
+}
+
+static void _ReaderStateSet_Remove(ReaderStateSetObject* self, Py_ssize_t i)
+{
+    Py_ssize_t cMoved = self->cRStates - i - 1;
+
+    Py_DECREF(self->aoReaders[i]);
+    Py_DECREF(self->aoReaderBytes[i]);
+    memmove(&self->ars[i], &self->ars[i+1], cMoved*sizeof(SCARD_READERSTATE));
+    memmove(&self->aoReaders[i], &self->aoReaders[i+1], cMoved*sizeof(PyObject*));
+    memmove(&self->aoReaderBytes[i], &self->aoReaderBytes[i+1], cMoved*sizeof(PyObject*));
+    self->cRStates--;
+}
+
+static PyObject* ReaderStateSet_add(ReaderStateSetObject* self, PyObject* args)
+{
+    PyObject* oReader;
+    unsigned long ulState = SCARD_STATE_UNAWARE;
+
+    if (!PyArg_ParseTuple(args, "O|k:add", &oReader, &ulState))
+    {
+        return NULL;
+    }
+    if (!_ReaderStateSet_CheckReader(oReader) || !_ReaderStateSet_CheckIdle(self))
+    {
+        return NULL;
+    }
+    if (_ReaderStateSet_Find(self, oReader) >= 0)
+    {
+        PyErr_Format(PyExc_ValueError, "reader already in set: %S", oReader);
+        return NULL;
+    }
+    if (!_ReaderStateSet_Add(self, oReader, (SCARDDWORDARG)ulState))
+    {
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+static PyObject* ReaderStateSet_remove(ReaderStateSetObject* self, PyObject* oReader)
+{
+    Py_ssize_t i;
+
+    if (!_ReaderStateSet_CheckReader(oReader) || !_ReaderStateSet_CheckIdle(self))
+    {
+        return NULL;
+    }
+    i = _ReaderStateSet_Find(self, oReader);
+    if (i < 0)
+    {
+        PyErr_SetObject(PyExc_KeyError, oReader);
+        return NULL;
+    }
+    _ReaderStateSet_Remove(self, i);
+    Py_RETURN_NONE;
+}
+
+static PyObject* ReaderStateSet_update(ReaderStateSetObject* self, PyObject* oReaders)
+{
+    PyObject* oSeq;
+    PyObject* oAdded = NULL;
+    PyObject* oRemoved = NULL;
+    PyObject* oResult = NULL;
+    Py_ssize_t i, j, cReaders;
+
+    if (!_ReaderStateSet_CheckIdle(self))
+    {
+        return NULL;
+    }
+    oSeq = PySequence_Fast(oReaders, "Expected an iterable of reader names.");
+    if (NULL == oSeq)
+    {
+        return NULL;
+    }
+    cReaders = PySequence_Fast_GET_SIZE(oSeq);
+    for (j=0; j<cReaders; j++)
+    {
+        if (!_ReaderStateSet_CheckReader(PySequence_Fast_GET_ITEM(oSeq, j)))
+        {
+            goto end;
+        }
+    }
+    oAdded = PyList_New(0);
+    oRemoved = PyList_New(0);
+    if (NULL == oAdded || NULL == oRemoved)
+    {
+        goto end;
+    }
+
+    // remove the readers not in the new list, keeping their last state
+    for (i=self->cRStates-1; i>=0; i--)
+    {
+        int bFound = 0;
+
+        for (j=0; j<cReaders && !bFound; j++)
+        {
+            bFound = 0 == PyUnicode_Compare(self->aoReaders[i], PySequence_Fast_GET_ITEM(oSeq, j));
+        }
+        if (!bFound)
+        {
+            PyObject* oState = _ReaderStateSet_State(self, i, self->ars[i].dwCurrentState);
+            if (NULL == oState || 0 != PyList_Insert(oRemoved, 0, oState))
+            {
+                Py_XDECREF(oState);
+                goto end;
+            }
+            Py_DECREF(oState);
+            _ReaderStateSet_Remove(self, i);
+        }
+    }
+
+    // add the new readers, unaware of their state
+    for (j=0; j<cReaders; j++)
+    {
+        PyObject* oReader = PySequence_Fast_GET_ITEM(oSeq, j);
+
+        if (_ReaderStateSet_Find(self, oReader) < 0)
+        {
+            if (!_ReaderStateSet_Add(self, oReader, SCARD_STATE_UNAWARE) ||
+                0 != PyList_Append(oAdded, oReader))
+            {
+                goto end;
+            }
+        }
+    }
+    oResult = PyTuple_Pack(2, oAdded, oRemoved);
+
+end:
+    Py_XDECREF(oAdded);
+    Py_XDECREF(oRemoved);
+    Py_DECREF(oSeq);
+    return oResult;
+}
+
+static PyObject* ReaderStateSet_getStatusChange(ReaderStateSetObject* self, PyObject* args)
+{
+    PyObject* oContext;
+    PyObject* oTimeout;
+    PyObject* oChanges;
+    SCARDCONTEXT hcontext;
+    SCARDDWORDARG dwTimeout;
+    SCARDRETCODE hresult;
+    Py_ssize_t i;
+
+    if (!PyArg_ParseTuple(args, "OO:getStatusChange", &oContext, &oTimeout))
+    {
+        return NULL;
+    }
+    hcontext = SCardHelper_PyScardContextToSCARDCONTEXT(oContext);
+    if (PyErr_Occurred())
+    {
+        return NULL;
+    }
+    dwTimeout = SCardHelper_PySCardDwordArgToSCARDDWORDARG(oTimeout);
+    if (PyErr_Occurred())
+    {
+        return NULL;
+    }
+    if (!_ReaderStateSet_CheckIdle(self))
+    {
+        return NULL;
+    }
+
+    // the array is neither resized nor moved while the GIL is released
+    self->bBusy = 1;
+    Py_BEGIN_ALLOW_THREADS;
+    hresult = (mySCardGetStatusChangeA)(hcontext, dwTimeout, self->ars,
+        (SCARDDWORDARG)self->cRStates);
+    Py_END_ALLOW_THREADS;
+    self->bBusy = 0;
+
+    oChanges = PyList_New(0);
+    if (NULL == oChanges)
+    {
+        return NULL;
+    }
+    if (SCARD_S_SUCCESS == hresult)
+    {
+        for (i=0; i<self->cRStates; i++)
+        {
+            SCARD_READERSTATE* prs = &self->ars[i];
+
+            if (prs->dwEventState & SCARD_STATE_CHANGED)
+            {
+                PyObject* oState = _ReaderStateSet_State(self, i, prs->dwEventState);
+                if (NULL == oState || 0 != PyList_Append(oChanges, oState))
+                {
+                    Py_XDECREF(oState);
+                    Py_DECREF(oChanges);
+                    return NULL;
+                }
+                Py_DECREF(oState);
+                prs->dwCurrentState = prs->dwEventState & (0xFFFFFFFF ^ SCARD_STATE_CHANGED);
+            }
+        }
+    }
+    return Py_BuildValue("(lN)", (long)hresult, oChanges);
+}
+
+static PyObject* ReaderStateSet_states(ReaderStateSetObject* self, PyObject* args)
+{
+    PyObject* oStates;
+    unsigned long ulMask = 0;
+    Py_ssize_t i;
+
+    if (!PyArg_ParseTuple(args, "|k:states", &ulMask))
+    {
+        return NULL;
+    }
+    oStates = PyList_New(0);
+    if (NULL == oStates)
+    {
+        return NULL;
+    }
+    for (i=0; i<self->cRStates; i++)
+    {
+        SCARDDWORDARG dwState = self->ars[i].dwCurrentState;
+
+        if (0 == ulMask || (dwState & ulMask))
+        {
+            PyObject* oState = _ReaderStateSet_State(self, i, dwState);
+            if (NULL == oState || 0 != PyList_Append(oStates, oState))
+            {
+                Py_XDECREF(oState);
+                Py_DECREF(oStates);
+                return NULL;
+            }
+            Py_DECREF(oState);
+        }
+    }
+    return oStates;
+}
+
+static int ReaderStateSet_init(ReaderStateSetObject* self, PyObject* args, PyObject* kwds)
+{
+    static char* kwlist[] = {"readers", NULL};
+    PyObject* oReaders = NULL;
+    PyObject* oResult;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|O:ReaderStateSet", kwlist, &oReaders))
+    {
+        return -1;
+    }
+    if (NULL == oReaders)
+    {
+        return 0;
+    }
+    oResult = ReaderStateSet_update(self, oReaders);
+    if (NULL == oResult)
+    {
+        return -1;
+    }
+    Py_DECREF(oResult);
+    return 0;
+}
+
+static void ReaderStateSet_dealloc(ReaderStateSetObject* self)
+{
+    while (self->cRStates > 0)
+    {
+        _ReaderStateSet_Remove(self, self->cRStates-1);
+    }
+    PyMem_Free(self->ars);
+    PyMem_Free(self->aoReaders);
+    PyMem_Free(self->aoReaderBytes);
+    Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+static Py_ssize_t ReaderStateSet_len(ReaderStateSetObject* self)
+{
+    return self->cRStates;
+}
+
+static int ReaderStateSet_contains(ReaderStateSetObject* self, PyObject* oReader)
+{
+    if (!PyUnicode_Check(oReader))
+    {
+        return 0;
+    }
+    return _ReaderStateSet_Find(self, oReader) >= 0;
+}
+
+static PyMethodDef ReaderStateSet_methods[] = {
+    {"add", (PyCFunction)ReaderStateSet_add, METH_VARARGS,
+     "add(reader, state=SCARD_STATE_UNAWARE)\n\n"
+     "Add a reader with its current state. ValueError if the reader is already in the set."},
+    {"remove", (PyCFunction)ReaderStateSet_remove, METH_O,
+     "remove(reader)\n\n"
+     "Remove a reader. KeyError if the reader is not in the set."},
+    {"update", (PyCFunction)ReaderStateSet_update, METH_O,
+     "update(readers) -> (added, removed)\n\n"
+     "Add the readers not in the set, unaware of their state, and remove the\n"
+     "readers not in readers. Returns the list of added reader names and the\n"
+     "list of the (reader, state, atr) of the removed readers."},
+    {"getStatusChange", (PyCFunction)ReaderStateSet_getStatusChange, METH_VARARGS,
+     "getStatusChange(hcontext, timeout) -> (hresult, changes)\n\n"
+     "SCardGetStatusChange() on the readers of the set. On success, changes is\n"
+     "the list of (reader, eventstate, atr) of the readers whose state changed,\n"
+     "and their event state becomes the current state of the next call."},
+    {"states", (PyCFunction)ReaderStateSet_states, METH_VARARGS,
+     "states(mask=0) -> list\n\n"
+     "The (reader, state, atr) of the readers, in the order they were added;\n"
+     "only those with a state bit in mask if mask is not 0."},
+    {NULL, NULL, 0, NULL}
+};
+
+static PySequenceMethods ReaderStateSet_as_sequence = {
+    .sq_length = (lenfunc)ReaderStateSet_len,
+    .sq_contains = (objobjproc)ReaderStateSet_contains,
+};
+
+static PyTypeObject ReaderStateSetType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "smartcard.scard.ReaderStateSet",
+    .tp_basicsize = sizeof(ReaderStateSetObject),
+    .tp_dealloc = (destructor)ReaderStateSet_dealloc,
+    .tp_as_sequence = &ReaderStateSet_as_sequence,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc =
+        "ReaderStateSet(readers=())\n\n"
+        "A reusable set of reader states for SCardGetStatusChange(), held in a\n"
+        "native SCARD_READERSTATE array. getStatusChange() only reports the\n"
+        "readers whose state changed, and carries their event state forward\n"
+        "into the current state of the next call.\n\n"
+        ">>> readerstates = ReaderStateSet(readers)\n"
+        ">>> hresult, changes = readerstates.getStatusChange(hcontext, INFINITE)\n"
+        ">>> for reader, eventstate, atr in changes:\n"
+        ">>>     ...",
+    .tp_methods = ReaderStateSet_methods,
+    .tp_init = (initproc)ReaderStateSet_init,
+    .tp_new = PyType_GenericNew,
+};
+
 ///////////////////////////////////////////////////////////////////////////////
 static SCARDRETCODE _ListReaders(
     SCARDCONTEXT hcontext,
@@ -756,38 +1218,48 @@ static SCARDRETCODE _Status(
 }
 
 ///////////////////////////////////////////////////////////////////////////////
-static SCARDRETCODE _Transmit(
-  SCARDHANDLE hcard,
-  unsigned long pioSendPci,
-  BYTELIST* pblSendBuffer,
-  BYTELIST* pblRecvBuffer
-)
+static PSCARD_IO_REQUEST _IoRequest(unsigned long pioSendPci)
 {
-    PSCARD_IO_REQUEST piorequest=NULL;
-    long ret;
-
-    pblRecvBuffer->ab = (unsigned char*)mem_Malloc(MAX_BUFFER_SIZE_EXTENDED*sizeof(unsigned char));
-    pblRecvBuffer->cBytes = MAX_BUFFER_SIZE_EXTENDED;
-
     // keep in sync with redefinition in PcscDefs.i
     switch(pioSendPci)
     {
         case SCARD_PROTOCOL_T0:
-            piorequest = myg_prgSCardT0Pci;
-            break;
+            return myg_prgSCardT0Pci;
 
         case SCARD_PROTOCOL_T1:
-            piorequest = myg_prgSCardT1Pci;
-            break;
+            return myg_prgSCardT1Pci;
 
         case SCARD_PROTOCOL_RAW:
         case SCARD_PROTOCOL_UNDEFINED:
-            piorequest = myg_prgSCardRawPci;
-            break;
+            return myg_prgSCardRawPci;
 
         default:
-            return SCARD_E_INVALID_PARAMETER;
+            return NULL;
+    }
+}
 
+///////////////////////////////////////////////////////////////////////////////
+static SCARDRETCODE _Transmit(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* pblSendBuffer,
+  BYTELIST* pblRecvBuffer
+)
+{
+    PSCARD_IO_REQUEST piorequest=NULL;
+    long ret;
+
+    // the receive buffer is normally provided by the typemap from the pool
+    if (NULL == pblRecvBuffer->ab)
+    {
+        pblRecvBuffer->ab = (unsigned char*)mem_Malloc(MAX_BUFFER_SIZE_EXTENDED*sizeof(unsigned char));
+    }
+    pblRecvBuffer->cBytes = MAX_BUFFER_SIZE_EXTENDED;
+
+    piorequest = _IoRequest(pioSendPci);
+    if (NULL == piorequest)
+    {
+        return SCARD_E_INVALID_PARAMETER;
     }
     ret = (mySCardTransmit)(
                 hcard,
@@ -801,6 +1273,332 @@ static SCARDRETCODE _Transmit(
     return ret;
 }
 
+///////////////////////////////////////////////////////////////////////////////
+// build in abCommand a copy of the short APDU pbCommand with Le set to le;
+// return FALSE if pbCommand is not a short APDU
+static int _SetLe(
+  const unsigned char* pbCommand,
+  SCARDDWORDARG cbCommand,
+  unsigned char le,
+  unsigned char abCommand[4+1+255+1],
+  SCARDDWORDARG* pcbCommand
+)
+{
+    SCARDDWORDARG cbBody;
+
+    if (cbCommand < 4)
+    {
+        return FALSE;
+    }
+    if (cbCommand <= 5)
+    {
+        // case 1 or case 2: header and Le
+        cbBody = 4;
+    }
+    else if (0 != pbCommand[4] && cbCommand == 5 + (SCARDDWORDARG)pbCommand[4])
+    {
+        // case 3: header, Lc and data
+        cbBody = cbCommand;
+    }
+    else if (0 != pbCommand[4] && cbCommand == 6 + (SCARDDWORDARG)pbCommand[4])
+    {
+        // case 4: header, Lc, data and Le
+        cbBody = cbCommand - 1;
+    }
+    else
+    {
+        // extended APDU
+        return FALSE;
+    }
+    memcpy(abCommand, pbCommand, cbBody);
+    abCommand[cbBody] = le;
+    *pcbCommand = cbBody + 1;
+    return TRUE;
+}
+
+///////////////////////////////////////////////////////////////////////////////
+static SCARDRETCODE _TransmitAutoGetResponse(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* pblSendBuffer,
+  BYTELIST* pblRecvBuffer
+)
+{
+    PSCARD_IO_REQUEST piorequest=NULL;
+    unsigned char abGetResponse[5] = {0x00, 0xC0, 0x00, 0x00, 0x00};
+    unsigned char abResend[4+1+255+1];
+    const unsigned char* pbCommand = pblSendBuffer->ab;
+    SCARDDWORDARG cbCommand = pblSendBuffer->cBytes;
+    SCARDDWORDARG cbReceived = 0;
+    SCARDDWORDARG cbRecv;
+    int bResent = FALSE;
+    long ret;
+
+    if (NULL == pblRecvBuffer->ab)
+    {
+        pblRecvBuffer->ab = (unsigned char*)mem_Malloc(MAX_BUFFER_SIZE_EXTENDED*sizeof(unsigned char));
+        if (NULL == pblRecvBuffer->ab)
+        {
+            return SCARD_E_NO_MEMORY;
+        }
+    }
+    pblRecvBuffer->cBytes = 0;
+
+    piorequest = _IoRequest(pioSendPci);
+    if (NULL == piorequest)
+    {
+        return SCARD_E_INVALID_PARAMETER;
+    }
+
+    // GET RESPONSE uses the class of the command, without the chaining bit
+    if (cbCommand > 0)
+    {
+        abGetResponse[0] = pbCommand[0];
+        if (0 == (abGetResponse[0] & 0x80))
+        {
+            abGetResponse[0] &= ~0x10;
+        }
+    }
+
+    for (;;)
+    {
+        unsigned char sw1, sw2;
+
+        // the response data are accumulated in the receive buffer, each
+        // response overwriting the status words of the previous one
+        cbRecv = MAX_BUFFER_SIZE_EXTENDED - cbReceived;
+        ret = (mySCardTransmit)(
+                    hcard,
+                    piorequest,
+                    pbCommand,
+                    cbCommand,
+                    NULL,
+                    pblRecvBuffer->ab + cbReceived,
+                    &cbRecv);
+        if (SCARD_S_SUCCESS != ret)
+        {
+            return ret;
+        }
+        pblRecvBuffer->cBytes = cbReceived + cbRecv;
+        if (cbRecv < 2)
+        {
+            return ret;
+        }
+        sw1 = pblRecvBuffer->ab[pblRecvBuffer->cBytes - 2];
+        sw2 = pblRecvBuffer->ab[pblRecvBuffer->cBytes - 1];
+
+        if (0x6C == sw1 && !bResent &&
+            _SetLe(pbCommand, cbCommand, sw2, abResend, &cbCommand))
+        {
+            // wrong Le: send the same command again with Le = SW2
+            pbCommand = abResend;
+            bResent = TRUE;
+        }
+        else if (0x61 == sw1 && !(pbCommand == abGetResponse && 2 == cbRecv))
+        {
+            // SW2 bytes still available: GET RESPONSE, unless the previous
+            // GET RESPONSE did not return any data
+            cbReceived += cbRecv - 2;
+            abGetResponse[4] = sw2;
+            pbCommand = abGetResponse;
+            cbCommand = sizeof(abGetResponse);
+            bResent = FALSE;
+        }
+        else
+        {
+            return ret;
+        }
+    }
+}
+
+///////////////////////////////////////////////////////////////////////////////
+static SCARDRETCODE _TransmitBytes(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* pblSendBuffer,
+  BYTELIST* pblRecvBuffer
+)
+{
+    SCARDRETCODE lRet;
+
+    lRet = _Transmit(hcard, pioSendPci, pblSendBuffer, pblRecvBuffer);
+    if (SCARD_S_SUCCESS != lRet)
+    {
+        pblRecvBuffer->cBytes = 0;
+    }
+    return lRet;
+}
+
+///////////////////////////////////////////////////////////////////////////////
+static SCARDRETCODE _TransmitBytesAutoGetResponse(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* pblSendBuffer,
+  BYTELIST* pblRecvBuffer
+)
+{
+    SCARDRETCODE lRet;
+
+    lRet = _TransmitAutoGetResponse(hcard, pioSendPci, pblSendBuffer, pblRecvBuffer);
+    if (SCARD_S_SUCCESS != lRet)
+    {
+        pblRecvBuffer->cBytes = 0;
+    }
+    return lRet;
+}
+
+///////////////////////////////////////////////////////////////////////////////
+// return the maximum length of the response data to a command APDU, from
+// its Le field; 0 if the command has no Le field or is not a valid APDU
+static SCARDDWORDARG _ExpectedLength(
+  const unsigned char* pbCommand,
+  SCARDDWORDARG cbCommand
+)
+{
+    SCARDDWORDARG cbData;
+
+    if (cbCommand == 5)
+    {
+        // case 2: header and Le
+        return (0 == pbCommand[4]) ? 256 : pbCommand[4];
+    }
+    if (cbCommand < 7)
+    {
+        return 0;
+    }
+    if (0 != pbCommand[4])
+    {
+        // case 4: header, Lc, data and Le
+        cbData = pbCommand[4];
+        if (cbCommand == 6 + cbData)
+        {
+            return (0 == pbCommand[cbCommand-1]) ? 256 : pbCommand[cbCommand-1];
+        }
+        return 0;
+    }
+    if (cbCommand == 7)
+    {
+        // case 2E: header and extended Le
+        cbData = 0;
+    }
+    else
+    {
+        // case 4E: header, extended Lc, data and extended Le
+        cbData = (pbCommand[5] << 8) | pbCommand[6];
+        if (cbCommand != 9 + cbData)
+        {
+            return 0;
+        }
+    }
+    cbData = (pbCommand[cbCommand-2] << 8) | pbCommand[cbCommand-1];
+    return (0 == cbData) ? 65536 : cbData;
+}
+
+///////////////////////////////////////////////////////////////////////////////
+static SCARDRETCODE _TransmitInto(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* pblSendBuffer,
+  BYTELIST* pblOutBuffer,
+  BYTELIST* pblRecvBuffer
+)
+{
+    SCARDRETCODE lRet;
+    SCARDDWORDARG cbData;
+
+    // the response of a command would be lost after its execution by the
+    // card: do not transmit a command whose Le does not fit into outbuf
+    if (_ExpectedLength(pblSendBuffer->ab, pblSendBuffer->cBytes) >
+        pblOutBuffer->cBytes)
+    {
+        pblRecvBuffer->cBytes = 0;
+        return SCARD_E_INSUFFICIENT_BUFFER;
+    }
+
+    lRet = _TransmitBytes(hcard, pioSendPci, pblSendBuffer, pblRecvBuffer);
+    if (SCARD_S_SUCCESS != lRet || pblRecvBuffer->cBytes < 2)
+    {
+        return lRet;
+    }
+
+    // copy the response data, without the status words, to the caller buffer
+    cbData = pblRecvBuffer->cBytes - 2;
+    if (cbData > pblOutBuffer->cBytes)
+    {
+        return SCARD_E_INSUFFICIENT_BUFFER;
+    }
+    memcpy(pblOutBuffer->ab, pblRecvBuffer->ab, cbData);
+    return lRet;
+}
+
+///////////////////////////////////////////////////////////////////////////////
+static SCARDRETCODE _TransmitBatch(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELISTLIST* pbllSendBuffers,
+  SWLIST* pslStopOn,
+  BYTELISTLIST* pbllRecvBuffers
+)
+{
+    SCARDRETCODE lRet = SCARD_S_SUCCESS;
+    BYTELIST* pblRecvBuffer = &pbllRecvBuffers->blRecv;
+    unsigned int i;
+
+    if (0 == pbllSendBuffers->cbl)
+    {
+        return SCARD_S_SUCCESS;
+    }
+    pbllRecvBuffers->abl = (BYTELIST*)mem_Malloc(pbllSendBuffers->cbl*sizeof(BYTELIST));
+    if (NULL == pbllRecvBuffers->abl)
+    {
+        return SCARD_E_NO_MEMORY;
+    }
+
+    for (i=0; i<pbllSendBuffers->cbl; i++)
+    {
+        BYTELIST* pblResponse = &pbllRecvBuffers->abl[i];
+
+        lRet = _Transmit(hcard, pioSendPci, &pbllSendBuffers->abl[i], pblRecvBuffer);
+        if (SCARD_S_SUCCESS != lRet)
+        {
+            break;
+        }
+
+        // keep a copy of the response, the receive buffer is reused
+        pblResponse->bAllocated = FALSE;
+        pblResponse->bBuffer = FALSE;
+        pblResponse->bPooled = FALSE;
+        pblResponse->cBytes = pblRecvBuffer->cBytes;
+        pblResponse->ab = NULL;
+        if (pblRecvBuffer->cBytes > 0)
+        {
+            pblResponse->ab = (unsigned char*)mem_Malloc(pblRecvBuffer->cBytes);
+            if (NULL == pblResponse->ab)
+            {
+                lRet = SCARD_E_NO_MEMORY;
+                break;
+            }
+            memcpy(pblResponse->ab, pblRecvBuffer->ab, pblRecvBuffer->cBytes);
+        }
+        pbllRecvBuffers->cbl++;
+
+        if (pblResponse->cBytes >= 2 &&
+            !SCardHelper_SWLISTAccepts(pslStopOn,
+                pblResponse->ab[pblResponse->cBytes-2],
+                pblResponse->ab[pblResponse->cBytes-1]))
+        {
+            break;
+        }
+    }
+    return lRet;
+}
+
+///////////////////////////////////////////////////////////////////////////////
+static unsigned long _GetRecvBufferAllocations(void)
+{
+    return SCardHelper_GetRecvBufferAllocations();
+}
+
 ///////////////////////////////////////////////////////////////////////////////
 static long _SCARD_CTL_CODE(long code)
 {
@@ -867,13 +1665,19 @@ static ERRORSTRING _GetErrorMessage(long lErrCode)
 
 %typemap(doc, name="readername", type="") (STRING* pszReaderNameOut) "readername: on output, reader name";
 
-%typemap(doc, name="apducommand", type="byte[]") (BYTELIST* APDUCOMMAND) "apducommand: list of APDU bytes to transmit";
+%typemap(doc, name="apducommand", type="byte[]") (BYTELIST* APDUCOMMAND) "apducommand: list of APDU bytes, or bytes-like object, to transmit";
 %typemap(doc, name="apduresponse", type="byte[]") (BYTELIST* APDURESPONSE) "apduresponse: on output, the list of APDU response bytes";
+%typemap(doc, name="response", type="bytes") (BYTELIST* APDURESPONSEBYTES) "response, sw1, sw2: on output, the APDU response data bytes and the two status words";
+%typemap(doc, name="outbuf", type="bytearray") (BYTELIST* INTOBUFFER) "outbuf: writable bytes-like object receiving the APDU response data";
+%typemap(doc, name="apducommands", type="byte[][]") (BYTELISTLIST* APDUCOMMANDS) "apducommands: list of APDUs to transmit, each a list of bytes or a bytes-like object";
+%typemap(doc, name="apduresponses", type="") (BYTELISTLIST* APDURESPONSES) "apduresponses: on output, the list of (response, sw1, sw2) tuples of the transmitted APDUs";
+%typemap(doc, name="stop_on", type="int[]") (SWLIST* STOPON) "stop_on: None, or list of accepted status words; the sequence stops after the first response with another status word";
+%typemap(doc, name="length", type="int") (BYTELIST* APDURESPONSEINTO) "length, sw1, sw2: on output, the length of the APDU response data and the two status words";
 %typemap(doc, name="atr", type="byte[]") (BYTELIST* ATR) "atr: card ATR";
 %typemap(doc, name="atr", type="byte[]") (BYTELIST* ATROUT) "atr: on output, the card ATR";
 %typemap(doc, name="attributes", type="byte[]") (BYTELIST* ATTRIBUTES) "attributes: on output, a list of attributes";
 %typemap(doc, name="mask", type="byte[]") (BYTELIST* MASK) "mask: mask to apply to card ATR";
-%typemap(doc, name="inbuffer", type="byte[]") (BYTELIST* INBUFFER) "inbuffer: list of bytes to send with the control code";
+%typemap(doc, name="inbuffer", type="byte[]") (BYTELIST* INBUFFER) "inbuffer: list of bytes, or bytes-like object, to send with the control code";
 %typemap(doc, name="outbuffer", type="byte[]") (BYTELIST* OUTBUFFER) "outbuffer: on output, the bytes returned by execution of the control code";
 
 %typemap(doc, name="primaryprovider", type="GUID") (GUIDLIST* PRIMARYPROVIDER) "primaryprovidername: GUID of the smart card primary service provider";
@@ -1755,6 +2559,10 @@ dwTimeout or forever if INFINITE is used.  The new event state will be
 contained in state.  A status change might be a card insertion or
 removal event, a change in ATR, etc.
 
+To wait repeatedly on many readers, a ReaderStateSet keeps the reader
+states in a native array across calls, and only reports the readers
+whose state changed.
+
 Value of state:
  - SCARD_STATE_UNAWARE         The application is unaware of the current state, and would like to know. The use of this value results in an immediate return from state transition monitoring services. This is represented by all bits set to zero
  - SCARD_STATE_IGNORE          This reader should be ignored
@@ -2042,6 +2850,11 @@ Value of pioSendPci:
  - SCARD_PCI_T0            Pre-defined T=0 PCI structure
  - SCARD_PCI_T1            Pre-defined T=1 PCI structure
 
+The APDU command can be given as a list of bytes or as any object
+supporting the buffer protocol (bytes, bytearray, memoryview, ...).
+The memory of a bytes-like object is passed to the PC/SC layer without
+copy.
+
 >>> from smartcard.scard import *
 >>> from smartcard.pcsc import *
 >>> from smartcard.util import toHexString
@@ -2085,6 +2898,165 @@ SCARDRETCODE _Transmit(
   BYTELIST* APDURESPONSE
 );
 
+///////////////////////////////////////////////////////////////////////////////
+%define DOCSTRING_TRANSMITBYTES
+"
+This function sends an APDU to the smart card contained in the reader
+connected to by L{SCardConnect()}, like L{SCardTransmit()}.
+It returns a result, the response data as an immutable bytes object,
+and the status words sw1 and sw2 as integers. If the card returned
+less than two bytes, the bytes object holds the raw response and sw1
+and sw2 are None.
+
+>>> from smartcard.scard import *
+>>> ...
+>>> SELECT = bytes([0xA0, 0xA4, 0x00, 0x00, 0x02, 0x7F, 0x10])
+>>> hresult, response, sw1, sw2 = SCardTransmitBytes(hcard, SCARD_PCI_T0, SELECT)
+>>> if hresult != SCARD_S_SUCCESS:
+>>>     raise PCSCExceptions.BaseSCardException(hresult)
+>>> print(response.hex(), hex(sw1), hex(sw2))
+"
+%enddef
+%feature("docstring") DOCSTRING_TRANSMITBYTES;
+%rename(SCardTransmitBytes) _TransmitBytes(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* APDUCOMMAND,
+  BYTELIST* APDURESPONSEBYTES
+);
+SCARDRETCODE _TransmitBytes(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* APDUCOMMAND,
+  BYTELIST* APDURESPONSEBYTES
+);
+
+///////////////////////////////////////////////////////////////////////////////
+%define DOCSTRING_TRANSMITBYTESAUTOGETRESPONSE
+"
+This function sends an APDU to the smart card contained in the reader
+connected to by L{SCardConnect()}, like L{SCardTransmitBytes()}, and
+handles the T=0 response status words:
+ - 61xx: GET RESPONSE commands are sent, with Le = xx, as long as the
+   card returns 61xx, and the response data are concatenated
+ - 6Cxx: the command is sent again with Le = xx
+
+It returns a result, the assembled response data as a bytes object, and
+the status words sw1 and sw2 of the last response.
+
+>>> from smartcard.scard import *
+>>> ...
+>>> SELECT = bytes([0xA0, 0xA4, 0x00, 0x00, 0x02, 0x7F, 0x10])
+>>> hresult, response, sw1, sw2 = SCardTransmitBytesAutoGetResponse(
+>>>     hcard, SCARD_PCI_T0, SELECT)
+>>> if hresult != SCARD_S_SUCCESS:
+>>>     raise PCSCExceptions.BaseSCardException(hresult)
+>>> print(response.hex(), hex(sw1), hex(sw2))
+"
+%enddef
+%feature("docstring") DOCSTRING_TRANSMITBYTESAUTOGETRESPONSE;
+%rename(SCardTransmitBytesAutoGetResponse) _TransmitBytesAutoGetResponse(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* APDUCOMMAND,
+  BYTELIST* APDURESPONSEBYTES
+);
+SCARDRETCODE _TransmitBytesAutoGetResponse(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* APDUCOMMAND,
+  BYTELIST* APDURESPONSEBYTES
+);
+
+///////////////////////////////////////////////////////////////////////////////
+%define DOCSTRING_TRANSMITINTO
+"
+This function sends an APDU to the smart card contained in the reader
+connected to by L{SCardConnect()}, like L{SCardTransmit()}, and writes
+the response data into outbuf, a writable bytes-like object such as a
+bytearray, a memoryview or a mmap.
+It returns a result, the length of the response data written into
+outbuf, and the status words sw1 and sw2 as integers. The status words
+are not written into outbuf.
+
+If the Le field of the command is larger than outbuf, the command is
+not transmitted: the result is SCARD_E_INSUFFICIENT_BUFFER, length is 0
+and sw1 and sw2 are None. If the response data nevertheless does not
+fit into outbuf, e.g. for a command with no Le field, the response is
+lost: the result is SCARD_E_INSUFFICIENT_BUFFER, nothing is written and
+length is the length of the response data. If the card returned less
+than two bytes, sw1 and sw2 are None.
+
+>>> from smartcard.scard import *
+>>> ...
+>>> buffer = bytearray(4096)
+>>> READ_BINARY = bytes([0x00, 0xB0, 0x00, 0x00, 0x00])
+>>> hresult, length, sw1, sw2 = SCardTransmitInto(
+>>>     hcard, SCARD_PCI_T0, READ_BINARY, memoryview(buffer)[1024:])
+>>> if hresult != SCARD_S_SUCCESS:
+>>>     raise PCSCExceptions.BaseSCardException(hresult)
+"
+%enddef
+%feature("docstring") DOCSTRING_TRANSMITINTO;
+%rename(SCardTransmitInto) _TransmitInto(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* APDUCOMMAND,
+  BYTELIST* INTOBUFFER,
+  BYTELIST* APDURESPONSEINTO
+);
+SCARDRETCODE _TransmitInto(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELIST* APDUCOMMAND,
+  BYTELIST* INTOBUFFER,
+  BYTELIST* APDURESPONSEINTO
+);
+
+///////////////////////////////////////////////////////////////////////////////
+%define DOCSTRING_TRANSMITBATCH
+"
+This function sends a sequence of APDUs to the smart card contained in
+the reader connected to by L{SCardConnect()}. The whole sequence is run
+in one call, without going back to Python between the APDUs.
+It returns a result and the list of (response, sw1, sw2) tuples of the
+transmitted APDUs, response being a bytes object.
+
+If stop_on is a list of status words, the sequence stops after the
+first response whose status words are not in the list. An item lower
+than 0x100 is a SW1 value and accepts any SW2, e.g. 0x61 accepts all
+61xx status words. If stop_on is None, all the APDUs are transmitted.
+
+If a transmission fails, the result is the error code and the list
+holds the responses received before the failure.
+
+>>> from smartcard.scard import *
+>>> ...
+>>> apdus = [SELECT_MF, SELECT_EF, READ_BINARY]
+>>> hresult, responses = SCardTransmitBatch(
+>>>     hcard, SCARD_PCI_T0, apdus, [0x9000, 0x61])
+>>> if hresult != SCARD_S_SUCCESS:
+>>>     raise PCSCExceptions.BaseSCardException(hresult)
+>>> for response, sw1, sw2 in responses:
+>>>     print(response.hex(), hex(sw1), hex(sw2))
+"
+%enddef
+%feature("docstring") DOCSTRING_TRANSMITBATCH;
+%rename(SCardTransmitBatch) _TransmitBatch(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELISTLIST* APDUCOMMANDS,
+  SWLIST* STOPON=NULL,
+  BYTELISTLIST* APDURESPONSES
+);
+SCARDRETCODE _TransmitBatch(
+  SCARDHANDLE hcard,
+  unsigned long pioSendPci,
+  BYTELISTLIST* APDUCOMMANDS,
+  SWLIST* STOPON=NULL,
+  BYTELISTLIST* APDURESPONSES
+);
+
 ///////////////////////////////////////////////////////////////////////////////
 %define DOCSTRING_SCARD_CTL_CODE
 "
@@ -2117,6 +3089,27 @@ This function return a human readable text for the given PC/SC error code.
 %rename(SCardGetErrorMessage) _GetErrorMessage(long lErrCode);
 ERRORSTRING _GetErrorMessage(long lErrCode);
 
+///////////////////////////////////////////////////////////////////////////////
+%define DOCSTRING_GETRECVBUFFERALLOCATIONS
+"
+This function returns the number of receive buffers allocated by
+L{SCardTransmit()}, its variants, and L{SCardControl()} since the module
+was loaded. Receive buffers are reused between calls, so the value does
+not increase once the steady state is reached.
+
+>>> from smartcard.scard import *
+>>> ...
+>>> before = SCardGetRecvBufferAllocations()
+>>> for i in range(1000):
+>>>     hresult, response = SCardTransmit(hcard, SCARD_PCI_T0, SELECT)
+>>> print(SCardGetRecvBufferAllocations() - before)
+0
+"
+%enddef
+%feature("docstring") DOCSTRING_GETRECVBUFFERALLOCATIONS;
+%rename(SCardGetRecvBufferAllocations) _GetRecvBufferAllocations(void);
+unsigned long _GetRecvBufferAllocations(void);
+
 
 %inline
 %{
@@ -2138,6 +3131,9 @@ ERRORSTRING _GetErrorMessage(long lErrCode);
 
     /* load the PCSC library */
     winscard_init();
+
+    if (PyType_Ready(&ReaderStateSetType) == 0)
+            PyDict_SetItemString(d, "ReaderStateSet", (PyObject*)&ReaderStateSetType);
 %}
 
 //----------------------------------------------------------------------
@@ -2145,6 +3141,7 @@ ERRORSTRING _GetErrorMessage(long lErrCode);
 //----------------------------------------------------------------------
 %pythoncode %{
     error = _scard.error
+    ReaderStateSet = _scard.ReaderStateSet
 %}
 
 %include PcscDefs.i
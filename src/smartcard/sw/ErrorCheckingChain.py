@@ -94,3 +94,78 @@ class ErrorCheckingChain:
         if self.end():
             return None
         return self.next()(data, sw1, sw2)
+
+    def compile(self):
+        """Compile the chain, from this strategy to its end, into a
+        L{CompiledErrorCheckingChain}."""
+        return CompiledErrorCheckingChain(self)
+
+
+class CompiledErrorCheckingChain:
+    """An error checking chain compiled into a flat table of the 65536
+    (sw1, sw2) status words, so that checking a status word no strategy
+    raises an exception for costs one table lookup.
+
+    The table holds, for each status word, the position of the first
+    strategy of the chain raising an exception that is not filtered, or
+    0 if there is none. Checking a status word of an error calls the
+    chain from this strategy, which raises the exception with the
+    response data, as the chain would.
+
+    The strategies must depend only on sw1 and sw2, not on the response
+    data, as the built-in checkers do. The chain must be compiled again
+    after it is changed, except by L{addFilterException()}.
+
+    A compiled chain can replace the chain of a connection:
+
+        >>> errorchain = []
+        >>> errorchain = [
+        ...     ErrorCheckingChain(errorchain, ISO7816_9ErrorChecker()),
+        ...     ErrorCheckingChain(errorchain, ISO7816_4ErrorChecker()),
+        ... ]
+        >>> connection.setErrorCheckingChain([errorchain[0].compile()])
+    """
+
+    def __init__(self, link):
+        """Compile an error checking chain.
+
+        @param link: the L{ErrorCheckingChain} to compile the chain from
+        """
+        self.link = link
+        self.links = link.chain[link.chain.index(link) :]
+        if len(self.links) > 255:
+            raise ValueError("error checking chain too long to compile")
+        self.table = self._compile()
+
+    def _compile(self):
+        """Return the table of the position of the first strategy raising
+        an exception that is not filtered, for each status word."""
+        table = bytearray(65536)
+        for sw in range(65536):
+            sw1, sw2 = sw >> 8, sw & 0xFF
+            for position, link in enumerate(self.links, 1):
+                try:
+                    link.strategy([], sw1, sw2)
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    # same exact type filtering as ErrorCheckingChain
+                    if type(exc) not in link.excludes:
+                        table[sw] = position
+                    break
+        return bytes(table)
+
+    def addFilterException(self, exClass):
+        """Add an exception filter to the error checking chain, and compile
+        the chain again.
+
+        @param exClass: the exception to exclude, see
+        L{ErrorCheckingChain.addFilterException()}
+        """
+        self.link.addFilterException(exClass)
+        self.table = self._compile()
+
+    def __call__(self, data, sw1, sw2):
+        """Called to test data, sw1 and sw2 for error on the chain."""
+        position = self.table[sw1 << 8 | sw2]
+        if position:
+            return self.links[position - 1](data, sw1, sw2)
+        return None
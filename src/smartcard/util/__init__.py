@@ -192,12 +192,15 @@ def toGSM3_38Bytes(stringtoconvert: str | bytes) -> list[int]:
     return result
 
 
-def toHexString(data: list[int] | None = None, output_format: int = 0) -> str:
+def toHexString(
+    data: list[int] | bytes | bytearray | memoryview | None = None,
+    output_format: int = 0,
+) -> str:
     """Convert a list of integers to a formatted string of hexadecimal.
 
     Integers larger than 255 will be truncated to two-byte hexadecimal pairs.
 
-    @param data:   a list of bytes to stringify,
+    @param data:   a list of bytes (or a bytes-like object) to stringify,
                 e.g. [59, 22, 148, 32, 2, 1, 0, 0, 13]
     @param output_format: a logical OR of
       - COMMA: add a comma between bytes
@@ -222,7 +225,7 @@ def toHexString(data: list[int] | None = None, output_format: int = 0) -> str:
     '0X3B, 0X65, 0X00, 0X00, 0X9C, 0X11, 0X01, 0X01, 0X03'
     """
 
-    if not (data is None or isinstance(data, list)):
+    if not (data is None or isinstance(data, (list, bytes, bytearray, memoryview))):
         raise TypeError("not a list of bytes")
 
     if not data:
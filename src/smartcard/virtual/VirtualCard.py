@@ -0,0 +1,144 @@
+"""VirtualCard: scriptable model of a smart card for the virtual readers
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import random
+import threading
+import time
+
+from smartcard.util import toBytes
+
+SW_INS_NOT_SUPPORTED = b"\x6d\x00"
+""" the response to the commands the card does not know """
+
+
+def _apdu(apdu):
+    """Return an APDU given as bytes, list of bytes or hex string as
+    bytes."""
+    if isinstance(apdu, str):
+        apdu = toBytes(apdu)
+    return bytes(apdu)
+
+
+class VirtualCard:
+    """Model of a card: its ATR and how it responds to command APDUs.
+
+    The response to a command is, in this order:
+     - the response of the table of responses to the exact command
+     - the response of the handler, unless the handler returns None
+     - the status word 6D00, instruction not supported
+
+    Responses are response APDUs, i.e. the data followed by SW1 SW2:
+
+        >>> card = VirtualCard(
+        ...     "3B 00",
+        ...     responses={"00 A4 04 00 02 3F 00": "90 00"},
+        ...     handler=lambda command: b"\\x01\\x02\\x90\\x00",
+        ...     latency=0.010, jitter=0.002)
+
+    Each command takes latency seconds, plus or minus a random jitter,
+    with the GIL released, so that many cards can be exchanged with
+    concurrently from threads. Like a real card, a card processes one
+    command at a time, so that the handler can keep the state of the
+    card, e.g. the selected file."""
+
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-positional-arguments
+    def __init__(
+        self, atr, responses=None, handler=None, latency=0.0, jitter=0.0, control=None
+    ):
+        """Construct a virtual card.
+
+        @param atr: the ATR of the card, as a list of bytes, bytes or hex
+            string
+        @param responses: dictionary of the response APDU of command
+            APDUs, both as lists of bytes, bytes or hex strings
+        @param handler: callable returning the response APDU of a command
+            APDU, as bytes-like objects, or None to fall back to 6D00
+        @param latency: the mean duration of a command, in seconds
+        @param jitter: the maximum deviation from the latency, in seconds
+        @param control: callable returning the response to a control
+            command, called with the control code and the command as a
+            list of bytes; default is to return an empty response
+        """
+        self.atr = list(_apdu(atr))
+        self.responses = {}
+        for command, response in (responses or {}).items():
+            self.setResponse(command, response)
+        self.handler = handler
+        self.latency = latency
+        self.jitter = jitter
+        self.controlhandler = control
+        self.count = 0
+        """ the number of command APDUs the card responded to """
+        self.lock = threading.Lock()
+
+    def setResponse(self, command, response):
+        """Set the response APDU of a command APDU in the table of
+        responses.
+
+        @param command: the command APDU, list of bytes, bytes or hex string
+        @param response: the response APDU, list of bytes, bytes or hex
+            string
+        """
+        response = _apdu(response)
+        if len(response) < 2:
+            raise ValueError("response APDU without status word")
+        self.responses[_apdu(command)] = response
+
+    def delay(self):
+        """Wait for the duration of a command."""
+        duration = self.latency
+        if self.jitter:
+            duration += random.uniform(-self.jitter, self.jitter)
+        if duration > 0:
+            time.sleep(duration)
+
+    def transmit(self, command):
+        """Respond to a command APDU.
+
+        @param command: the command APDU, as bytes
+
+        @return: a tuple (data, sw1, sw2), data as bytes
+        """
+        with self.lock:
+            self.delay()
+            response = self.responses.get(command)
+            if response is None and self.handler is not None:
+                response = self.handler(command)
+                if response is not None:
+                    response = bytes(response)
+                    if len(response) < 2:
+                        raise ValueError("response APDU without status word")
+            if response is None:
+                response = SW_INS_NOT_SUPPORTED
+            self.count += 1
+        return response[:-2], response[-2], response[-1]
+
+    def control(self, controlCode, command):
+        """Respond to a control command.
+
+        @param controlCode: the control code
+        @param command: the command, as a list of bytes
+
+        @return: the response, as a list of bytes
+        """
+        if self.controlhandler is None:
+            return []
+        return list(self.controlhandler(controlCode, command))
@@ -0,0 +1,128 @@
+"""VirtualCardConnection class manages connections to a virtual card thru
+a virtual reader.
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import CardConnectionException, NoCardException
+from smartcard.scard import (
+    SCARD_ATTR_ATR_STRING,
+    SCARD_E_NO_SMARTCARD,
+    SCARD_W_REMOVED_CARD,
+)
+
+
+class VirtualCardConnection(CardConnection):
+    """Connection to a L{smartcard.virtual.VirtualCard.VirtualCard} in a
+    L{smartcard.virtual.VirtualReader.VirtualReader}.
+
+    The connection is to the card in the reader when L{connect()} is
+    called: if the card is removed or replaced afterwards, the connection
+    raises L{NoCardException} until it is reconnected."""
+
+    def __init__(self, reader, slot):
+        """Construct a new virtual card connection.
+
+        @param reader: the name of the virtual reader
+        @param slot: the slot of the virtual reader, holding its card
+        """
+        CardConnection.__init__(self, reader)
+        self.slot = slot
+        self.card = None
+
+    def connect(self, protocol=None, mode=None, disposition=None):
+        """Connect to the card in the reader.
+
+        If protocol is not specified, connect with the default
+        connection protocol; T=1 is preferred to T=0."""
+        CardConnection.connect(self, protocol)
+        card = self.slot.card
+        if card is None:
+            raise NoCardException("Unable to connect", hresult=SCARD_E_NO_SMARTCARD)
+        self.card = card
+        self._negotiate(protocol)
+
+    def reconnect(self, protocol=None, mode=None, disposition=None):
+        """Reconnect to the card, e.g. after it was replaced."""
+        CardConnection.reconnect(self, protocol)
+        if self.card is None:
+            raise CardConnectionException("Card not connected")
+        self.card = None
+        card = self.slot.card
+        if card is None:
+            raise NoCardException("Unable to reconnect", hresult=SCARD_E_NO_SMARTCARD)
+        self.card = card
+        self._negotiate(protocol)
+
+    def _negotiate(self, protocol):
+        """Set the protocol of the connection from a protocol mask."""
+        if protocol is None:
+            protocol = self.getProtocol()
+        for p in (CardConnection.T1_protocol, CardConnection.T0_protocol):
+            if protocol & p:
+                protocol = p
+                break
+        self.setProtocol(protocol)
+
+    def disconnect(self):
+        """Disconnect from the card."""
+        if self.card is not None:
+            CardConnection.disconnect(self)
+            self.card = None
+
+    def _connectedCard(self):
+        """Return the card, if still in the reader."""
+        if self.card is None:
+            raise CardConnectionException("Card not connected")
+        if self.slot.card is not self.card:
+            raise NoCardException("Card removed", hresult=SCARD_W_REMOVED_CARD)
+        return self.card
+
+    def getATR(self):
+        """Return card ATR"""
+        CardConnection.getATR(self)
+        return list(self._connectedCard().atr)
+
+    def doTransmit(self, command, protocol=None):
+        """Transmit an apdu to the virtual card.
+
+        @return: a tuple (response, sw1, sw2), response being a list of
+        bytes"""
+        data, sw1, sw2 = self.doTransmitBytes(command, protocol)
+        return list(data), sw1, sw2
+
+    def doTransmitBytes(self, command, protocol=None):
+        """Transmit an apdu to the virtual card.
+
+        @return: a tuple (response, sw1, sw2), response being a bytes
+        object"""
+        return self._connectedCard().transmit(bytes(command))
+
+    def doControl(self, controlCode, command=None):
+        """Send a control command to the virtual card."""
+        if command is None:
+            command = []
+        return self._connectedCard().control(controlCode, list(command))
+
+    def doGetAttrib(self, attribId):
+        """Return an attribute of the virtual reader: only the ATR is
+        supported, the response to the other attributes is empty."""
+        card = self._connectedCard()
+        if attribId == SCARD_ATTR_ATR_STRING:
+            return list(card.atr)
+        return []
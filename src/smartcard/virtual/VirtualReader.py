@@ -0,0 +1,184 @@
+"""VirtualReader: in-process reader of virtual cards
+
+This file is part of pyscard.
+
+pyscard is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+pyscard is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with pyscard; if not, write to the Free Software
+Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+"""
+
+import threading
+
+from smartcard.CardConnectionDecorator import CardConnectionDecorator
+from smartcard.Exceptions import InvalidReaderException
+from smartcard.pcsc.PCSCReader import PCSCReader
+from smartcard.reader.Reader import Reader
+from smartcard.reader.ReaderFactory import ReaderFactory
+from smartcard.virtual.VirtualCardConnection import VirtualCardConnection
+
+ALL_READERS_GROUPS = ("SCard$AllReaders", "SCard$DefaultReaders")
+""" the groups all the virtual readers belong to """
+
+
+class _Slot:
+    """The card and the groups of a virtual reader."""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self.card = None
+        self.groups = set()
+
+
+_slots = {}
+""" the slot of each virtual reader name, in order of addition """
+_lock = threading.Lock()
+
+
+class VirtualReader(Reader):
+    """Reader of L{smartcard.virtual.VirtualCard.VirtualCard} cards.
+
+    The virtual readers are in-process: a reader is added with
+    L{VirtualReader.add()}, and cards are inserted into it and removed
+    from it with L{insert()} and L{remove()}. Once registered with
+    L{register()}, the virtual readers are returned by
+    L{smartcard.System.readers()}, along with the PC/SC readers or in
+    place of them:
+
+        >>> register(exclusive=True)
+        >>> reader = VirtualReader.add("Virtual Reader 0")
+        >>> reader.insert(VirtualCard("3B 00", responses={...}))
+        >>> connection = smartcard.System.readers()[0].createConnection()
+
+    The readers with the same name share the same slot, so that any
+    L{VirtualReader} object of a name sees the card of the reader."""
+
+    def __init__(self, readername):
+        """Construct a virtual reader object; the reader must have been
+        added with L{VirtualReader.add()}."""
+        Reader.__init__(self, readername)
+
+    @staticmethod
+    def add(readername, card=None):
+        """Add a virtual reader.
+
+        @param readername: the name of the reader
+        @param card: the L{VirtualCard} inserted in the reader, None for
+            an empty reader
+
+        @return: the L{VirtualReader}
+        """
+        with _lock:
+            if readername in _slots:
+                raise ValueError(f"virtual reader already added: {readername}")
+            _slots[readername] = _Slot()
+            _slots[readername].card = card
+        return VirtualReader(readername)
+
+    @staticmethod
+    def delete(readername):
+        """Delete a virtual reader, e.g. unplug it."""
+        with _lock:
+            slot = _slots.pop(readername, None)
+        if slot is not None:
+            slot.card = None
+
+    @staticmethod
+    def clear():
+        """Delete all the virtual readers."""
+        with _lock:
+            slots = list(_slots.values())
+            _slots.clear()
+        for slot in slots:
+            slot.card = None
+
+    def _slot(self):
+        """Return the slot of the reader."""
+        slot = _slots.get(self.name)
+        if slot is None:
+            raise InvalidReaderException(self.name)
+        return slot
+
+    @property
+    def card(self):
+        """The L{VirtualCard} in the reader, None if the reader is empty."""
+        return self._slot().card
+
+    def insert(self, card):
+        """Insert a card, replacing the card in the reader if any.
+
+        @param card: the L{VirtualCard}
+        """
+        self._slot().card = card
+
+    def remove(self):
+        """Remove the card from the reader."""
+        self._slot().card = None
+
+    def addtoreadergroup(self, groupname):
+        """Add reader to a reader group."""
+        self._slot().groups.add(groupname)
+
+    def removefromreadergroup(self, groupname):
+        """Remove reader from a reader group."""
+        self._slot().groups.discard(groupname)
+
+    def createConnection(self):
+        """Return a card connection thru the virtual reader."""
+        return CardConnectionDecorator(VirtualCardConnection(self.name, self._slot()))
+
+    class Factory:
+        """Factory to create VirtualReader objects"""
+
+        # pylint: disable=too-few-public-methods
+
+        @staticmethod
+        def create(readername):
+            """Return a VirtualReader object"""
+            return VirtualReader(readername)
+
+    @staticmethod
+    def readers(groups=None):
+        """Return the list of virtual readers in groups, or of all the
+        virtual readers if groups is empty"""
+        with _lock:
+            slots = list(_slots.items())
+        return [
+            VirtualReader.Factory.create(name)
+            for name, slot in slots
+            if not groups
+            or any(g in slot.groups or g in ALL_READERS_GROUPS for g in groups)
+        ]
+
+
+def register(exclusive=False):
+    """Register the virtual readers as a factory method of the
+    L{ReaderFactory}.
+
+    @param exclusive: if True, the virtual readers replace the other
+        readers, e.g. the PC/SC readers on a machine without pcscd
+    """
+    if exclusive:
+        ReaderFactory.factorymethods[:] = [VirtualReader.readers]
+    elif VirtualReader.readers not in ReaderFactory.factorymethods:
+        ReaderFactory.factorymethods.append(VirtualReader.readers)
+
+
+def unregister():
+    """Remove the virtual readers from the factory methods of the
+    L{ReaderFactory}, and restore the PC/SC readers if they were
+    replaced."""
+    methods = ReaderFactory.factorymethods
+    methods[:] = [fm for fm in methods if fm != VirtualReader.readers]
+    if not methods:
+        methods.append(PCSCReader.readers)
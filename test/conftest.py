@@ -1,8 +1,22 @@
 # pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import threading
 
 import pytest
 
 import smartcard.reader.ReaderGroups
+from smartcard.pcsc.PCSCPnPNotification import PNP_NOTIFICATION
+from smartcard.scard import (
+    SCARD_E_CANCELLED,
+    SCARD_E_TIMEOUT,
+    SCARD_S_SUCCESS,
+    SCARD_STATE_CHANGED,
+    SCARD_STATE_EMPTY,
+    SCARD_STATE_PRESENT,
+)
+
+ATR = [0x3B, 0x00]
 
 
 @pytest.fixture(autouse=True)
@@ -11,3 +25,124 @@ def reset_reader_groups():
 
     smartcard.reader.ReaderGroups.readergroups.instance = None
     yield
+
+
+class FakeResourceManager:
+    """Readers and cards, with blocking SCardGetStatusChange()"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.cards = {"reader 1": None, "reader 2": ATR}
+        self.cancelled = False
+        self.listreaders = 0
+        self.threads = set()
+
+    def patch(self, monkeypatch, module):
+        """Use the fake in a module importing the PC/SC functions"""
+        monkeypatch.setattr(module, "getContextManager", lambda: self)
+        for name in ("SCardListReaders", "SCardCancel"):
+            monkeypatch.setattr(module, name, getattr(self, name))
+        monkeypatch.setattr(module, "ReaderStateSet", lambda: FakeReaderStateSet(self))
+
+    def acquire(self, shared=True):  # pylint: disable=unused-argument
+        return 1
+
+    def release(self, hcontext):
+        pass
+
+    def renew(self, hcontext):
+        return hcontext
+
+    def renewcontext(self, owner, exceptionclass):
+        pass
+
+    def insert(self, reader, atr=None):
+        with self.condition:
+            self.cards[reader] = atr
+            self.condition.notify_all()
+
+    def remove(self, reader):
+        with self.condition:
+            del self.cards[reader]
+            self.condition.notify_all()
+
+    def SCardListReaders(self, hcontext, groups):
+        # pylint: disable=invalid-name,unused-argument
+        self.listreaders += 1
+        return SCARD_S_SUCCESS, list(self.cards)
+
+    def SCardCancel(self, hcontext):
+        # pylint: disable=invalid-name,unused-argument
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+        return SCARD_S_SUCCESS
+
+    def _state(self, reader):
+        if reader == PNP_NOTIFICATION:
+            return len(self.cards) << 16, []
+        atr = self.cards.get(reader)
+        if atr is None:
+            return SCARD_STATE_EMPTY, []
+        return SCARD_STATE_PRESENT, atr
+
+    def wait(self, readerstates, timeout):
+        """SCardGetStatusChange() on a list of [reader, state, atr]"""
+        self.threads.add(threading.current_thread())
+        with self.condition:
+            self.cancelled = False
+
+            def changed():
+                found = False
+                for readerstate in readerstates:
+                    state, atr = self._state(readerstate[0])
+                    if state != readerstate[1] & ~SCARD_STATE_CHANGED:
+                        readerstate[1:] = [state | SCARD_STATE_CHANGED, atr]
+                        found = True
+                return found or self.cancelled
+
+            if not self.condition.wait_for(changed, timeout / 1000):
+                return SCARD_E_TIMEOUT
+            if self.cancelled:
+                return SCARD_E_CANCELLED
+            return SCARD_S_SUCCESS
+
+
+class FakeReaderStateSet:
+    """smartcard.scard.ReaderStateSet on a FakeResourceManager"""
+
+    def __init__(self, resource_manager):
+        self.resource_manager = resource_manager
+        self.readerstates = []
+
+    def __len__(self):
+        return len(self.readerstates)
+
+    def update(self, readers):
+        removed = [tuple(s) for s in self.readerstates if s[0] not in readers]
+        self.readerstates = [s for s in self.readerstates if s[0] in readers]
+        known = [s[0] for s in self.readerstates]
+        added = [reader for reader in readers if reader not in known]
+        self.readerstates += [[reader, 0, []] for reader in added]
+        return added, removed
+
+    def getStatusChange(self, hcontext, timeout):  # pylint: disable=unused-argument
+        readerstates = [list(s) for s in self.readerstates]
+        hresult = self.resource_manager.wait(readerstates, timeout)
+        if hresult != SCARD_S_SUCCESS:
+            return hresult, []
+        changes = [tuple(s) for s in readerstates if s[1] & SCARD_STATE_CHANGED]
+        for readerstate in readerstates:
+            readerstate[1] &= ~SCARD_STATE_CHANGED
+        self.readerstates = readerstates
+        return hresult, changes
+
+    def states(self, mask=0):
+        return [tuple(s) for s in self.readerstates if not mask or s[1] & mask]
+
+
+@pytest.fixture
+def resource_manager():
+    """Fake PC/SC resource manager with readers "reader 1", empty, and
+    "reader 2", with a card"""
+    return FakeResourceManager()
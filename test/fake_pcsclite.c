@@ -0,0 +1,318 @@
+/*
+ * Simulated PC/SC library for test_native.py: one reader with a card
+ * answering test commands, to exercise the C code of smartcard.scard
+ * without a reader. Built by the test as libpcsclite.so.1 and loaded
+ * through LD_LIBRARY_PATH.
+ *
+ * Test card commands, by INS byte:
+ *  - 0x01 echoes the command data, 90 00
+ *  - 0x02 returns 61 00 and makes P1 P2 bytes available, 0x00, 0x01, ...
+ *    to GET RESPONSE; GET RESPONSE with another class than the command,
+ *    without its chaining bit, returns 6E 00
+ *  - 0x03 returns 6C 08 unless Le is 8, then 8 bytes 0xA0, 0xA1, ...
+ *  - 0xC0 GET RESPONSE
+ *
+ * This file is part of pyscard.
+ *
+ * pyscard is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU Lesser General Public License as published by
+ * the Free Software Foundation; either version 2.1 of the License, or
+ * (at your option) any later version.
+ *
+ * pyscard is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with pyscard; if not, write to the Free Software
+ * Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+ */
+
+#include <stdlib.h>
+#include <string.h>
+#include <winscard.h>
+
+#define READER "Test Reader 00 00"
+#define CONTEXT 0x1000
+#define CARD 0x2000
+
+const SCARD_IO_REQUEST g_rgSCardT0Pci = {SCARD_PROTOCOL_T0, sizeof(SCARD_IO_REQUEST)};
+const SCARD_IO_REQUEST g_rgSCardT1Pci = {SCARD_PROTOCOL_T1, sizeof(SCARD_IO_REQUEST)};
+const SCARD_IO_REQUEST g_rgSCardRawPci = {SCARD_PROTOCOL_RAW, sizeof(SCARD_IO_REQUEST)};
+
+static const unsigned char atr[] = {0x3B, 0x00};
+
+static unsigned char pending[65536];
+static DWORD pendingLength = 0;
+static DWORD pendingOffset = 0;
+static unsigned char pendingClass = 0;
+
+/* number of SCardTransmit() calls, read by the tests with ctypes */
+long transmitCount = 0;
+
+LONG SCardEstablishContext(
+    DWORD dwScope, LPCVOID pvReserved1, LPCVOID pvReserved2,
+    LPSCARDCONTEXT phContext)
+{
+    *phContext = CONTEXT;
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardReleaseContext(SCARDCONTEXT hContext)
+{
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardIsValidContext(SCARDCONTEXT hContext)
+{
+    return (CONTEXT == hContext) ? SCARD_S_SUCCESS : SCARD_E_INVALID_HANDLE;
+}
+
+LONG SCardConnect(
+    SCARDCONTEXT hContext, LPCSTR szReader, DWORD dwShareMode,
+    DWORD dwPreferredProtocols, LPSCARDHANDLE phCard,
+    LPDWORD pdwActiveProtocol)
+{
+    if (0 != strcmp(szReader, READER))
+    {
+        return SCARD_E_UNKNOWN_READER;
+    }
+    *phCard = CARD;
+    *pdwActiveProtocol = (dwPreferredProtocols & SCARD_PROTOCOL_T1)
+        ? SCARD_PROTOCOL_T1 : SCARD_PROTOCOL_T0;
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardReconnect(
+    SCARDHANDLE hCard, DWORD dwShareMode, DWORD dwPreferredProtocols,
+    DWORD dwInitialization, LPDWORD pdwActiveProtocol)
+{
+    *pdwActiveProtocol = (dwPreferredProtocols & SCARD_PROTOCOL_T1)
+        ? SCARD_PROTOCOL_T1 : SCARD_PROTOCOL_T0;
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardDisconnect(SCARDHANDLE hCard, DWORD dwDisposition)
+{
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardBeginTransaction(SCARDHANDLE hCard)
+{
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardEndTransaction(SCARDHANDLE hCard, DWORD dwDisposition)
+{
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardStatus(
+    SCARDHANDLE hCard, LPSTR szReaderName, LPDWORD pcchReaderLen,
+    LPDWORD pdwState, LPDWORD pdwProtocol, LPBYTE pbAtr, LPDWORD pcbAtrLen)
+{
+    if (NULL != szReaderName)
+    {
+        strcpy(szReaderName, READER);
+    }
+    *pcchReaderLen = sizeof(READER);
+    *pdwState = SCARD_SPECIFIC;
+    *pdwProtocol = SCARD_PROTOCOL_T0;
+    memcpy(pbAtr, atr, sizeof(atr));
+    *pcbAtrLen = sizeof(atr);
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardGetStatusChange(
+    SCARDCONTEXT hContext, DWORD dwTimeout, SCARD_READERSTATE *rgReaderStates,
+    DWORD cReaders)
+{
+    return SCARD_E_TIMEOUT;
+}
+
+LONG SCardControl(
+    SCARDHANDLE hCard, DWORD dwControlCode, LPCVOID pbSendBuffer,
+    DWORD cbSendLength, LPVOID pbRecvBuffer, DWORD cbRecvLength,
+    LPDWORD lpBytesReturned)
+{
+    *lpBytesReturned = 0;
+    return SCARD_S_SUCCESS;
+}
+
+static DWORD respond(
+    unsigned char *pbResponse, const unsigned char *pbData, DWORD cbData,
+    unsigned char sw1, unsigned char sw2)
+{
+    memcpy(pbResponse, pbData, cbData);
+    pbResponse[cbData] = sw1;
+    pbResponse[cbData + 1] = sw2;
+    return cbData + 2;
+}
+
+LONG SCardTransmit(
+    SCARDHANDLE hCard, const SCARD_IO_REQUEST *pioSendPci,
+    LPCBYTE pbSendBuffer, DWORD cbSendLength, SCARD_IO_REQUEST *pioRecvPci,
+    LPBYTE pbRecvBuffer, LPDWORD pcbRecvLength)
+{
+    static unsigned char abResponse[65536 + 2];
+    static const unsigned char abEight[] = {
+        0xA0, 0xA1, 0xA2, 0xA3, 0xA4, 0xA5, 0xA6, 0xA7};
+    DWORD cbResponse, cbData = 0, le = 0, i;
+
+    transmitCount++;
+    if (cbSendLength < 4)
+    {
+        return SCARD_E_INVALID_PARAMETER;
+    }
+    if (5 == cbSendLength)
+    {
+        le = pbSendBuffer[4] ? pbSendBuffer[4] : 256;
+    }
+    else if (cbSendLength > 5 && 0 != pbSendBuffer[4])
+    {
+        cbData = pbSendBuffer[4];
+        if (cbSendLength == 6 + cbData)
+        {
+            le = pbSendBuffer[cbSendLength - 1] ? pbSendBuffer[cbSendLength - 1] : 256;
+        }
+    }
+    else if (7 == cbSendLength)
+    {
+        /* extended Le: the card supports short APDUs only */
+        le = 0x10000;
+    }
+
+    switch (pbSendBuffer[1])
+    {
+    case 0x01:
+        cbResponse = respond(abResponse, pbSendBuffer + 5, cbData, 0x90, 0x00);
+        break;
+    case 0x02:
+        pendingLength = (pbSendBuffer[2] << 8) | pbSendBuffer[3];
+        pendingOffset = 0;
+        for (i = 0; i < pendingLength; i++)
+        {
+            pending[i] = (unsigned char)i;
+        }
+        pendingClass = pbSendBuffer[0];
+        if (0 == (pendingClass & 0x80))
+        {
+            pendingClass &= ~0x10;
+        }
+        cbResponse = respond(abResponse, NULL, 0, 0x61, 0x00);
+        break;
+    case 0x03:
+        if (8 == le)
+        {
+            cbResponse = respond(abResponse, abEight, 8, 0x90, 0x00);
+        }
+        else
+        {
+            cbResponse = respond(abResponse, NULL, 0, 0x6C, 0x08);
+        }
+        break;
+    case 0xC0:
+        if (pbSendBuffer[0] != pendingClass)
+        {
+            cbResponse = respond(abResponse, NULL, 0, 0x6E, 0x00);
+        }
+        else if (pendingOffset >= pendingLength)
+        {
+            cbResponse = respond(abResponse, NULL, 0, 0x6F, 0x00);
+        }
+        else
+        {
+            DWORD cbLeft = pendingLength - pendingOffset;
+            DWORD cbSent = (le < cbLeft) ? le : cbLeft;
+
+            cbLeft -= cbSent;
+            cbResponse = respond(
+                abResponse, pending + pendingOffset, cbSent,
+                cbLeft ? 0x61 : 0x90, (cbLeft && cbLeft < 256) ? cbLeft : 0x00);
+            pendingOffset += cbSent;
+        }
+        break;
+    default:
+        cbResponse = respond(abResponse, NULL, 0, 0x6D, 0x00);
+    }
+
+    if (cbResponse > *pcbRecvLength)
+    {
+        return SCARD_E_INSUFFICIENT_BUFFER;
+    }
+    memcpy(pbRecvBuffer, abResponse, cbResponse);
+    *pcbRecvLength = cbResponse;
+    return SCARD_S_SUCCESS;
+}
+
+static LONG multiString(
+    const char *mszString, DWORD cchString, LPSTR mszOut, LPDWORD pcchOut)
+{
+    if (SCARD_AUTOALLOCATE == *pcchOut)
+    {
+        char *p = malloc(cchString);
+
+        if (NULL == p)
+        {
+            return SCARD_E_NO_MEMORY;
+        }
+        memcpy(p, mszString, cchString);
+        *(char **)mszOut = p;
+    }
+    else if (NULL != mszOut)
+    {
+        if (*pcchOut < cchString)
+        {
+            return SCARD_E_INSUFFICIENT_BUFFER;
+        }
+        memcpy(mszOut, mszString, cchString);
+    }
+    *pcchOut = cchString;
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardListReaderGroups(
+    SCARDCONTEXT hContext, LPSTR mszGroups, LPDWORD pcchGroups)
+{
+    static const char groups[] = "SCard$DefaultReaders\0";
+
+    return multiString(groups, sizeof(groups), mszGroups, pcchGroups);
+}
+
+LONG SCardListReaders(
+    SCARDCONTEXT hContext, LPCSTR mszGroups, LPSTR mszReaders,
+    LPDWORD pcchReaders)
+{
+    static const char readers[] = READER "\0";
+
+    return multiString(readers, sizeof(readers), mszReaders, pcchReaders);
+}
+
+LONG SCardFreeMemory(SCARDCONTEXT hContext, LPCVOID pvMem)
+{
+    free((void *)pvMem);
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardCancel(SCARDCONTEXT hContext)
+{
+    return SCARD_S_SUCCESS;
+}
+
+LONG SCardGetAttrib(
+    SCARDHANDLE hCard, DWORD dwAttrId, LPBYTE pbAttr, LPDWORD pcbAttrLen)
+{
+    return SCARD_E_UNSUPPORTED_FEATURE;
+}
+
+LONG SCardSetAttrib(
+    SCARDHANDLE hCard, DWORD dwAttrId, LPCBYTE pbAttr, DWORD cbAttrLen)
+{
+    return SCARD_E_UNSUPPORTED_FEATURE;
+}
+
+const char *pcsc_stringify_error(const LONG pcscError)
+{
+    return (SCARD_S_SUCCESS == pcscError) ? "Command successful." : "Error.";
+}
@@ -403,3 +403,24 @@ def test_invalid_checksums(ts, atr_bytes):
     assert atr.checksumOK is False
     assert atr.getChecksum() == atr_bytes[-1]
     assert f"checksum: {atr_bytes[-1]:x}\n" in atr.render()
+
+
+def test_atr_card_capabilities():
+    # historical bytes 80 73 00 00 C0: card capabilities with command
+    # chaining and extended Lc and Le fields
+    atr = ATR(toBytes("3B 85 80 01 80 73 00 00 C0 32"))
+    assert atr.getCardCapabilities() == [0x00, 0x00, 0xC0]
+    assert atr.isCommandChainingSupported()
+    assert atr.isExtendedLengthSupported()
+
+    # category 00: status indicator in the last 3 bytes
+    atr = ATR(toBytes("3B 88 80 01 00 73 00 00 40 00 90 00 CC"))
+    assert atr.getCardCapabilities() == [0x00, 0x00, 0x40]
+    assert not atr.isCommandChainingSupported()
+    assert atr.isExtendedLengthSupported()
+
+    # no card capabilities
+    atr = ATR([0x3F, 0x65, 0x25, 0x00, 0x2C, 0x09, 0x69, 0x90, 0x00])
+    assert atr.getCardCapabilities() is None
+    assert not atr.isCommandChainingSupported()
+    assert not atr.isExtendedLengthSupported()
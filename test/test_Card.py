@@ -0,0 +1,27 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+from smartcard.Card import Card
+from smartcard.reader.Reader import Reader
+
+ATR = [0x3B, 0x16, 0x94, 0x20, 0x02, 0x01, 0x00, 0x00, 0x0D]
+
+
+def test_hash_consistent_with_equality():
+    cards = [
+        Card("reader", ATR),
+        Card("reader", bytes(ATR)),
+        Card(Reader("reader"), ATR),
+    ]
+    for card in cards:
+        assert card == cards[0]
+        assert hash(card) == hash(cards[0])
+    assert len(set(cards)) == 1
+
+
+def test_not_equal():
+    card = Card("reader", ATR)
+    assert card != Card("reader", ATR[:-1])
+    assert card != Card("other reader", ATR)
+    assert card != "reader"
+    assert Card("reader", ATR) not in {Card("reader", [0x3B, 0x00])}
@@ -0,0 +1,266 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import array
+
+import pytest
+
+import smartcard.CardConnection
+from smartcard.CardConnection import CardConnection
+from smartcard.CardConnectionDecorator import CardConnectionDecorator
+from smartcard.CardConnectionObserver import CardConnectionObserver
+from smartcard.Exceptions import CardConnectionException
+
+
+class EchoCardConnection(CardConnection):
+    """Card connection returning the command data followed by 90 00."""
+
+    def doTransmit(self, command, protocol):
+        return list(command[5:]), 0x90, 0x00
+
+
+class EventRecorder(CardConnectionObserver):
+    def __init__(self):
+        self.events = []
+
+    def update(self, observable, handlers):
+        self.events.append((handlers.type, handlers.args))
+
+
+def test_transmit_as_bytes():
+    connection = EchoCardConnection("reader")
+    data, sw1, sw2 = connection.transmit([0, 1, 0, 0, 2, 0xAB, 0xCD], as_bytes=True)
+    assert data == b"\xab\xcd"
+    assert isinstance(data, bytes)
+    assert (sw1, sw2) == (0x90, 0x00)
+
+
+def test_transmit_as_bytes_notifies_observers():
+    connection = EchoCardConnection("reader")
+    recorder = EventRecorder()
+    connection.addObserver(recorder)
+    command = bytes([0, 1, 0, 0, 1, 0x42])
+    connection.transmit(command, as_bytes=True)
+    assert recorder.events == [
+        ("command", [command, None]),
+        ("response", [b"\x42", 0x90, 0x00]),
+    ]
+
+
+class LegacyDecorator(CardConnectionDecorator):
+    """Decorator overriding transmit() and addObserver() with the
+    signatures predating as_bytes and the event types."""
+
+    def transmit(self, command, protocol=None):
+        return self.component.transmit(command, protocol)
+
+    def addObserver(self, observer):
+        self.component.addObserver(observer)
+
+
+def test_transmit_legacy_decorator():
+    connection = CardConnectionDecorator(
+        LegacyDecorator(CardConnectionDecorator(EchoCardConnection("reader")))
+    )
+    assert connection.transmit([0, 1, 0, 0, 1, 0x42]) == ([0x42], 0x90, 0x00)
+    inner = CardConnectionDecorator(EchoCardConnection("reader"))
+    connection = CardConnectionDecorator(inner)
+    data, _sw1, _sw2 = connection.transmit([0, 1, 0, 0, 1, 0x42], as_bytes=True)
+    assert data == b"\x42"
+
+
+def test_add_observer_legacy_decorator():
+    inner = EchoCardConnection("reader")
+    connection = CardConnectionDecorator(LegacyDecorator(inner))
+    observer = CardConnectionObserver()
+    connection.addObserver(observer)
+    assert inner.countObservers() == 1
+    with pytest.raises(TypeError):
+        connection.addObserver(observer, {"response"})
+    connection = CardConnectionDecorator(inner)
+    connection.addObserver(observer, events={"response"})
+    assert inner.subscriptions[id(observer)] == {"response"}
+
+
+def test_transmit_default_returns_list():
+    connection = EchoCardConnection("reader")
+    data, sw1, sw2 = connection.transmit(bytes([0, 1, 0, 0, 1, 0x42]))
+    assert data == [0x42]
+    assert (sw1, sw2) == (0x90, 0x00)
+
+
+def test_transmit_into():
+    connection = EchoCardConnection("reader")
+    buffer = bytearray(8)
+    length, sw1, sw2 = connection.transmit_into(
+        [0, 1, 0, 0, 2, 0xAB, 0xCD], memoryview(buffer)[3:]
+    )
+    assert (length, sw1, sw2) == (2, 0x90, 0x00)
+    assert buffer == bytearray([0, 0, 0, 0xAB, 0xCD, 0, 0, 0])
+
+
+def test_transmit_into_buffer_too_small():
+    connection = EchoCardConnection("reader")
+    with pytest.raises(CardConnectionException):
+        connection.transmit_into([0, 1, 0, 0, 2, 0xAB, 0xCD], bytearray(1))
+
+
+def test_transmit_into_le_too_large():
+    connection = EchoCardConnection("reader")
+    recorder = EventRecorder()
+    connection.addObserver(recorder)
+    # Le of 256 bytes: not transmitted, the response would be lost
+    with pytest.raises(CardConnectionException):
+        connection.transmit_into([0, 0xB0, 0, 0, 0], bytearray(16))
+    with pytest.raises(CardConnectionException):
+        connection.transmit_into([0, 0xB0, 0, 0, 0, 0x01, 0x00], bytearray(16))
+    assert not recorder.events
+    length, _sw1, _sw2 = connection.transmit_into([0, 0xB0, 0, 0, 16], bytearray(16))
+    assert length == 0
+
+
+class CopyingRecorder(CardConnectionObserver):
+    def __init__(self):
+        self.responses = []
+
+    def update(self, observable, handlers):
+        if handlers.type == "response":
+            # the response view is released after the notification
+            self.responses.append(bytes(handlers.args[0]))
+
+
+def test_transmit_into_non_byte_buffer():
+    connection = EchoCardConnection("reader")
+    recorder = CopyingRecorder()
+    connection.addObserver(recorder)
+    buffer = array.array("H", [0] * 4)
+    length, _sw1, _sw2 = connection.transmit_into([0, 1, 0, 0, 3, 1, 2, 3], buffer)
+    assert length == 3
+    assert bytes(buffer)[:4] == b"\x01\x02\x03\x00"
+    assert recorder.responses == [b"\x01\x02\x03"]
+
+
+def test_transmit_into_releases_buffer():
+    connection = EchoCardConnection("reader")
+    connection.addObserver(EventRecorder())
+    buffer = bytearray(8)
+    connection.transmit_into([0, 1, 0, 0, 2, 0xAB, 0xCD], buffer)
+    # no view of the buffer is left exported
+    buffer.extend(b"\x00")
+
+
+class StatusCardConnection(CardConnection):
+    """Card connection returning the P1 P2 bytes of the command as SW."""
+
+    def doTransmit(self, command, protocol):
+        return [command[1]], command[2], command[3]
+
+
+def test_transmit_many():
+    connection = StatusCardConnection("reader")
+    recorder = EventRecorder()
+    connection.addObserver(recorder)
+    commands = [[0, 1, 0x90, 0x00], [0, 2, 0x61, 0x10], [0, 3, 0x6A, 0x82]]
+    responses = connection.transmit_many(commands)
+    assert responses == [([1], 0x90, 0x00), ([2], 0x61, 0x10), ([3], 0x6A, 0x82)]
+    assert [event[0] for event in recorder.events] == ["command", "response"] * 3
+    assert recorder.events[4] == ("command", [commands[2], None])
+
+
+def test_transmit_many_stop_on():
+    connection = StatusCardConnection("reader")
+    commands = [[0, 1, 0x90, 0x00], [0, 2, 0x61, 0x10], [0, 3, 0x6A, 0x82]]
+    responses = connection.transmit_many(commands, stop_on=[0x9000], as_bytes=True)
+    assert responses == [(b"\x01", 0x90, 0x00), (b"\x02", 0x61, 0x10)]
+    responses = connection.transmit_many(commands, stop_on=[0x9000, 0x61])
+    assert len(responses) == 3
+    responses = connection.transmit_many(commands, stop_on=[])
+    assert len(responses) == 1
+
+
+def test_transmit_many_generator():
+    connection = CardConnectionDecorator(StatusCardConnection("reader"))
+    recorder = EventRecorder()
+    connection.addObserver(recorder)
+    commands = [[0, 1, 0x90, 0x00], [0, 2, 0x61, 0x10]]
+    responses = connection.transmit_many(iter(commands), stop_on=[0x9000])
+    assert len(responses) == 2
+    assert [event[0] for event in recorder.events] == ["command", "response"] * 2
+
+
+class FailingCardConnection(StatusCardConnection):
+    """Card connection failing on the INS 0xFF commands."""
+
+    def doTransmit(self, command, protocol):
+        if command[1] == 0xFF:
+            raise CardConnectionException("transmit failed")
+        return StatusCardConnection.doTransmit(self, command, protocol)
+
+
+def test_transmit_many_partial():
+    connection = FailingCardConnection("reader")
+    recorder = EventRecorder()
+    connection.addObserver(recorder)
+    commands = [[0, 1, 0x90, 0x00], [0, 2, 0x90, 0x00], [0, 0xFF, 0, 0], [0, 3, 0, 0]]
+    with pytest.raises(CardConnectionException) as excinfo:
+        connection.transmit_many(commands)
+    assert excinfo.value.responses == [([1], 0x90, 0x00), ([2], 0x90, 0x00)]
+    assert recorder.events[2] == ("command", [commands[1], None])
+    assert len(recorder.events) == 4
+
+
+def test_transmit_without_observers(monkeypatch):
+    def no_event(*args):
+        raise AssertionError("no event expected without observers")
+
+    monkeypatch.setattr(smartcard.CardConnection, "CardConnectionEvent", no_event)
+    connection = EchoCardConnection("reader")
+    connection.setChanged = connection.notifyObservers = no_event
+    assert connection.transmit([0, 1, 0, 0, 1, 0x42]) == ([0x42], 0x90, 0x00)
+    assert connection.transmit_into([0, 1, 0, 0, 1, 0x42], bytearray(1))[0] == 1
+    connection.connect()
+    connection.disconnect()
+
+
+def test_event_filtered_observers(monkeypatch):
+    built = []
+
+    class CountingEvent(smartcard.CardConnection.CardConnectionEvent):
+        def __init__(self, event_type, args=None):
+            super().__init__(event_type, args)
+            built.append(event_type)
+
+    monkeypatch.setattr(smartcard.CardConnection, "CardConnectionEvent", CountingEvent)
+    connection = EchoCardConnection("reader")
+    responses = EventRecorder()
+    audit = EventRecorder()
+    connection.addObserver(responses, events={"response"})
+    connection.addObserver(audit, events=("connect", "disconnect"))
+    connection.connect()
+    connection.transmit([0, 1, 0, 0, 1, 0x42])
+    connection.transmit_many([[0, 1, 0, 0, 1, 0x43]])
+    connection.disconnect()
+    assert responses.events == [
+        ("response", [[0x42], 0x90, 0x00]),
+        ("response", [[0x43], 0x90, 0x00]),
+    ]
+    assert audit.events == [("connect", None), ("disconnect", None)]
+    assert "command" not in built
+
+    # adding an observer again replaces its subscription
+    connection.addObserver(audit)
+    connection.transmit([0, 1, 0, 0, 1, 0x44])
+    assert [event[0] for event in audit.events[2:]] == ["command", "response"]
+    assert connection.countObservers() == 2
+
+    connection.deleteObserver(audit)
+    connection.transmit([0, 1, 0, 0, 1, 0x45])
+    assert len(audit.events) == 4
+    assert len(responses.events) == 4
+
+
+def test_event_filter_unknown_type():
+    connection = EchoCardConnection("reader")
+    with pytest.raises(ValueError):
+        connection.addObserver(EventRecorder(), events={"responses"})
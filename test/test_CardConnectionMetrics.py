@@ -0,0 +1,172 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import gc
+import threading
+import urllib.request
+
+import pytest
+
+from smartcard.CardConnectionMetrics import (
+    LatencyHistogram,
+    Metrics,
+    MetricsCardConnection,
+    _bucket,
+    _bucketBounds,
+    startHTTPServer,
+    toOpenMetrics,
+)
+from smartcard.Exceptions import NoCardException
+from smartcard.virtual.VirtualCard import VirtualCard
+from smartcard.virtual.VirtualReader import VirtualReader
+
+SELECT_MF = [0x00, 0xA4, 0x00, 0x00, 0x02, 0x3F, 0x00]
+READ_BINARY = [0x00, 0xB0, 0x00, 0x00, 0x02]
+
+
+@pytest.fixture
+def reader():
+    card = VirtualCard("3B 00", responses={bytes(SELECT_MF): "90 00"})
+    yield VirtualReader.add("Virtual Reader 0", card)
+    VirtualReader.clear()
+
+
+def test_buckets():
+    for ns in list(range(100)) + [1000, 123456, 10**9, 3600 * 10**9]:
+        lower, upper = _bucketBounds(_bucket(ns))
+        assert lower <= ns < upper
+        assert upper - lower <= max(1, lower // 16)
+    assert _bucket(31) + 1 == _bucket(32)
+
+
+def test_histogram():
+    histogram = LatencyHistogram()
+    for ns in range(1000, 101000, 1000):
+        histogram.record(ns)
+    assert histogram.count == 100
+    assert histogram.min == 1000 and histogram.max == 100000
+    # within the 1/16 precision
+    assert 50000 <= histogram.percentile(50) <= 50000 * 17 / 16
+    assert histogram.percentile(100) == 100000
+    # the bucket of 10000 ns extends beyond the 10000 ns bound
+    assert histogram.cumulative([10000, 10**6]) == [9, 100]
+    other = LatencyHistogram()
+    other.record(5)
+    histogram.merge(other)
+    assert histogram.count == 101 and histogram.min == 5
+
+
+def test_connection(reader):
+    metrics = Metrics()
+    connection = MetricsCardConnection(reader.createConnection(), metrics)
+    connection.connect()
+    connection.transmit(SELECT_MF)
+    connection.transmit(READ_BINARY)
+    connection.transmit_many([SELECT_MF, SELECT_MF])
+    connection.control(0x42000001)
+    connection.getAttrib(0x90303)
+    reader.remove()
+    with pytest.raises(NoCardException):
+        connection.transmit(SELECT_MF)
+
+    snapshot = metrics.snapshot()
+    counts = {key: histogram.count for key, histogram in snapshot.latencies.items()}
+    assert counts == {
+        ("Virtual Reader 0", "connect", None, None): 1,
+        ("Virtual Reader 0", "transmit", 0x00, 0xA4): 4,
+        ("Virtual Reader 0", "transmit", 0x00, 0xB0): 1,
+        ("Virtual Reader 0", "control", None, None): 1,
+        ("Virtual Reader 0", "getAttrib", None, None): 1,
+    }
+    assert snapshot.sws == {
+        ("Virtual Reader 0", 0x00, 0xA4, 0x9000): 3,
+        ("Virtual Reader 0", 0x00, 0xB0, 0x6D00): 1,
+    }
+    assert snapshot.errors == {("Virtual Reader 0", "transmit"): 1}
+
+
+def test_transmit_many_generator(reader):
+    metrics = Metrics()
+    connection = MetricsCardConnection(reader.createConnection(), metrics)
+    connection.connect()
+    responses = connection.transmit_many(
+        command for command in [SELECT_MF, READ_BINARY]
+    )
+    assert [sw for _data, *sw in responses] == [[0x90, 0x00], [0x6D, 0x00]]
+    # stops after READ BINARY
+    responses = connection.transmit_many(
+        [SELECT_MF, READ_BINARY, SELECT_MF], stop_on=[0x9000]
+    )
+    assert len(responses) == 2
+    counts = {
+        key: histogram.count for key, histogram in metrics.snapshot().latencies.items()
+    }
+    assert counts[("Virtual Reader 0", "transmit", 0x00, 0xA4)] == 2
+    assert counts[("Virtual Reader 0", "transmit", 0x00, 0xB0)] == 2
+
+
+def test_threads():
+    metrics = Metrics()
+
+    def record():
+        for ns in range(1000):
+            metrics.record("reader", "transmit", ns)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    histogram = metrics.snapshot().latencies[("reader", "transmit", None, None)]
+    assert histogram.count == 4000
+    # the metrics of the ended threads are retired
+    gc.collect()
+    assert not metrics.threads
+    metrics.record("reader", "transmit", 1)
+    assert len(metrics.threads) == 1
+    histogram = metrics.snapshot().latencies[("reader", "transmit", None, None)]
+    assert histogram.count == 4001
+    metrics.reset()
+    assert not metrics.snapshot().latencies
+
+
+def test_openmetrics():
+    metrics = Metrics()
+    metrics.record('reader "1"', "transmit", 2_000_000, 0x80, 0xCA)
+    metrics.countSW('reader "1"', 0x90, 0x00, 0x80, 0xCA)
+    metrics.countError('reader "1"', "connect")
+    text = toOpenMetrics(metrics.snapshot(), bounds=(0.001, 0.01))
+    labels = 'reader="reader \\"1\\"",phase="transmit",cla="80",ins="CA"'
+    assert text.splitlines() == [
+        "# TYPE pyscard_operation_duration_seconds histogram",
+        "# UNIT pyscard_operation_duration_seconds seconds",
+        "# HELP pyscard_operation_duration_seconds "
+        "Duration of the card connection operations.",
+        f'pyscard_operation_duration_seconds_bucket{{{labels},le="0.001"}} 0',
+        f'pyscard_operation_duration_seconds_bucket{{{labels},le="0.01"}} 1',
+        f'pyscard_operation_duration_seconds_bucket{{{labels},le="+Inf"}} 1',
+        f"pyscard_operation_duration_seconds_count{{{labels}}} 1",
+        f"pyscard_operation_duration_seconds_sum{{{labels}}} 0.002",
+        "# TYPE pyscard_status_words counter",
+        "# HELP pyscard_status_words Status words of the responses.",
+        'pyscard_status_words_total{reader="reader \\"1\\"",cla="80",ins="CA",'
+        'sw="9000"} 1',
+        "# TYPE pyscard_errors counter",
+        "# HELP pyscard_errors Exceptions raised by the card connection operations.",
+        'pyscard_errors_total{reader="reader \\"1\\"",phase="connect"} 1',
+        "# EOF",
+    ]
+
+
+def test_http_server():
+    server = startHTTPServer(0, "127.0.0.1")
+    try:
+        host, port = server.server_address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith(
+                "application/openmetrics-text"
+            )
+            assert response.read().decode().endswith("# EOF\n")
+    finally:
+        server.shutdown()
+        server.server_close()
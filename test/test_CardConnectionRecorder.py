@@ -0,0 +1,171 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+from smartcard.CardConnectionRecorder import (
+    ATR,
+    COMMAND,
+    CONNECT,
+    CONTROL,
+    CONTROL_RESPONSE,
+    DISCONNECT,
+    ERROR,
+    RESPONSE,
+    SESSION,
+    APDULog,
+    CardConnectionRecorder,
+)
+from smartcard.Exceptions import CardConnectionException
+from smartcard.ReplayCardConnection import ReplayCardConnection
+from smartcard.virtual.VirtualCard import VirtualCard
+from smartcard.virtual.VirtualReader import VirtualReader
+
+SELECT_MF = [0x00, 0xA4, 0x00, 0x00, 0x02, 0x3F, 0x00]
+READ_BINARY = [0x00, 0xB0, 0x00, 0x00, 0x02]
+
+
+@pytest.fixture
+def reader():
+    card = VirtualCard(
+        "3B 00",
+        responses={bytes(SELECT_MF): "90 00", bytes(READ_BINARY): "01 02 90 00"},
+        control=lambda code, command: [code & 0xFF] + command,
+    )
+    yield VirtualReader.add("Virtual Reader 0", card)
+    VirtualReader.clear()
+
+
+@pytest.fixture
+def logpath(tmp_path, reader):
+    path = tmp_path / "session.apdu"
+    connection = reader.createConnection()
+    with CardConnectionRecorder(path) as recorder:
+        connection.addObserver(recorder)
+        connection.connect()
+        connection.transmit(SELECT_MF)
+        connection.transmit(READ_BINARY)
+        connection.control(0x42000001, [0x10])
+        connection.transmit([0x00, 0x00, 0x00, 0x00])
+        connection.disconnect()
+    return path
+
+
+def test_log(logpath):
+    with APDULog(logpath) as log:
+        assert [record.type for record in log] == [
+            SESSION,
+            CONNECT,
+            ATR,
+            COMMAND,
+            RESPONSE,
+            COMMAND,
+            RESPONSE,
+            CONTROL,
+            CONTROL_RESPONSE,
+            COMMAND,
+            RESPONSE,
+            DISCONNECT,
+        ]
+        assert log[1].payload == b"Virtual Reader 0"
+        assert log[6][:3] == (RESPONSE, 0x90, 0x00)
+        assert log[6].payload == b"\x01\x02"
+        assert log[7].value == 0x42000001
+        timestamps = [record.timestamp for record in log][1:]
+        assert timestamps == sorted(timestamps)
+        found = list(log.find(COMMAND, prefix=b"\x00\xb0"))
+        assert [index for index, _record in found] == [5]
+        assert found[0][1].payload == bytes(READ_BINARY)
+
+
+def test_index(logpath, tmp_path):
+    indexpath = tmp_path / "session.idx"
+    with APDULog(logpath) as log:
+        log.saveIndex(indexpath)
+        offsets = log.offsets
+    # append a session, and a truncated record
+    with CardConnectionRecorder(logpath) as recorder:
+        recorder.write(COMMAND, SELECT_MF)
+    with open(logpath, "ab") as log:
+        log.write(b"\xff\x00")
+    with APDULog(logpath, indexpath) as log:
+        assert log.offsets[: len(offsets)] == offsets
+        assert len(log) == len(offsets) + 2
+        assert log[-1].payload == bytes(SELECT_MF)
+
+
+def test_not_a_log(tmp_path):
+    path = tmp_path / "session.apdu"
+    path.write_bytes(b"\x00" * 32)
+    with pytest.raises(ValueError):
+        APDULog(path)
+
+
+def test_replay(logpath):
+    connection = ReplayCardConnection(logpath)
+    assert connection.getReader() == "Virtual Reader 0"
+    connection.connect()
+    assert connection.getATR() == [0x3B, 0x00]
+    assert connection.transmit(SELECT_MF) == ([], 0x90, 0x00)
+    assert connection.transmit(READ_BINARY, as_bytes=True) == (b"\x01\x02", 0x90, 0)
+    assert connection.control(0x42000001, [0x10]) == [0x01, 0x10]
+    assert connection.transmit([0x00, 0x00, 0x00, 0x00]) == ([], 0x6D, 0x00)
+    with pytest.raises(CardConnectionException):
+        connection.transmit(SELECT_MF)
+
+    # the replay is deterministic
+    connection.rewind()
+    assert connection.transmit(SELECT_MF) == ([], 0x90, 0x00)
+    # the command diverges from the recording
+    with pytest.raises(CardConnectionException):
+        connection.transmit(SELECT_MF)
+    connection.disconnect()
+    connection.release()
+
+
+def failing(command):
+    if command == b"\x01":
+        raise CardConnectionException("transmit failed")
+    return b"\x90\x00"
+
+
+def test_replay_failed_command(tmp_path):
+    path = tmp_path / "session.apdu"
+    card = VirtualCard("3B 00", handler=failing)
+    reader = VirtualReader.add("Virtual Reader 0", card)
+    try:
+        connection = reader.createConnection()
+        with CardConnectionRecorder(path) as recorder:
+            connection.addObserver(recorder)
+            connection.connect()
+            with pytest.raises(CardConnectionException):
+                connection.transmit([1])
+            connection.transmit([2])
+            connection.transmit([3])
+            with pytest.raises(CardConnectionException):
+                connection.transmit([1])
+    finally:
+        VirtualReader.clear()
+
+    with APDULog(path) as log:
+        assert [record.type for record in log][3:] == [
+            COMMAND,
+            ERROR,
+            COMMAND,
+            RESPONSE,
+            COMMAND,
+            RESPONSE,
+            COMMAND,
+            ERROR,
+        ]
+    connection = ReplayCardConnection(path)
+    connection.connect()
+    with pytest.raises(CardConnectionException):
+        connection.transmit([1])
+    assert connection.transmit([2]) == ([], 0x90, 0x00)
+    assert connection.transmit([3]) == ([], 0x90, 0x00)
+    with pytest.raises(CardConnectionException):
+        connection.transmit([1])
+    with pytest.raises(CardConnectionException):
+        connection.transmit([1])
+    connection.release()
@@ -0,0 +1,77 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+from smartcard.sw.ErrorChecker import ErrorChecker
+from smartcard.sw.ErrorCheckingChain import ErrorCheckingChain
+from smartcard.sw.ISO7816_4_SW1ErrorChecker import ISO7816_4_SW1ErrorChecker
+from smartcard.sw.ISO7816_4ErrorChecker import ISO7816_4ErrorChecker
+from smartcard.sw.ISO7816_8ErrorChecker import ISO7816_8ErrorChecker
+from smartcard.sw.ISO7816_9ErrorChecker import ISO7816_9ErrorChecker
+from smartcard.sw.op21_ErrorChecker import op21_ErrorChecker
+from smartcard.sw.SWExceptions import (
+    CheckingErrorException,
+    SWException,
+    WarningProcessingException,
+)
+
+
+class CustomSWException(SWException):
+    pass
+
+
+class CustomErrorChecker(ErrorChecker):
+    def __call__(self, data, sw1, sw2):
+        if sw1 == 0x56 or (sw1, sw2) == (0x90, 0x01):
+            raise CustomSWException(data, sw1, sw2)
+
+
+def outcome(chain, sw1, sw2):
+    try:
+        chain([0x01], sw1, sw2)
+    except SWException as exc:
+        return type(exc), exc.data, exc.sw1, exc.sw2, exc.message
+    return None
+
+
+@pytest.fixture
+def chain():
+    errorchain = []
+    errorchain = [
+        ErrorCheckingChain(errorchain, ISO7816_9ErrorChecker()),
+        ErrorCheckingChain(errorchain, CustomErrorChecker()),
+        ErrorCheckingChain(errorchain, ISO7816_8ErrorChecker()),
+        ErrorCheckingChain(errorchain, op21_ErrorChecker()),
+        ErrorCheckingChain(errorchain, ISO7816_4ErrorChecker()),
+        ErrorCheckingChain(errorchain, ISO7816_4_SW1ErrorChecker()),
+    ]
+    errorchain[2].addFilterException(WarningProcessingException)
+    errorchain[4].addFilterException(CheckingErrorException)
+    return errorchain
+
+
+def test_compiled(chain):
+    compiled = chain[0].compile()
+    for sw1 in range(256):
+        for sw2 in range(256):
+            assert outcome(compiled, sw1, sw2) == outcome(chain[0], sw1, sw2)
+    assert compiled([], 0x90, 0x00) is None
+    assert outcome(compiled, 0x90, 0x01)[0] is CustomSWException
+    # filtered by the ISO 7816-8 checker, ending the chain
+    assert compiled([], 0x63, 0x00) is None
+
+
+def test_compiled_tail(chain):
+    compiled = chain[3].compile()
+    assert compiled([], 0x90, 0x01) is None
+    assert outcome(compiled, 0x6A, 0x82) == outcome(chain[3], 0x6A, 0x82)
+
+
+def test_filter(chain):
+    compiled = chain[0].compile()
+    assert outcome(compiled, 0x56, 0x00)[0] is CustomSWException
+    compiled.addFilterException(CustomSWException)
+    assert compiled([], 0x56, 0x00) is None
+    assert chain[0]([], 0x56, 0x00) is None
@@ -0,0 +1,145 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import threading
+
+import pytest
+
+from smartcard.CardConnectionEvent import CardConnectionEvent
+from smartcard.Observer import Observable, Observer
+from smartcard.ObserverDispatcher import BLOCK, COALESCE, DROP, AsyncDispatcher
+
+
+class RecordingObserver(Observer):
+    def __init__(self, gate=None):
+        self.received = []
+        self.threads = set()
+        self.gate = gate
+
+    def update(self, observable, handlers):
+        if self.gate is not None:
+            self.gate.wait()
+        self.received.append(handlers)
+        self.threads.add(threading.current_thread())
+
+
+def notify(observable, handlers):
+    observable.setChanged()
+    observable.notifyObservers(handlers)
+
+
+def test_dispatch_from_worker_thread():
+    dispatcher = AsyncDispatcher()
+    observable = Observable()
+    observable.setDispatcher(dispatcher)
+    observer = RecordingObserver()
+    observable.addObserver(observer)
+    for i in range(100):
+        notify(observable, i)
+    assert dispatcher.flush(timeout=5)
+    assert observer.received == list(range(100))
+    assert threading.current_thread() not in observer.threads
+    assert dispatcher.dispatched == 100
+    assert dispatcher.depth == 0
+    dispatcher.stop()
+
+
+@pytest.mark.parametrize(
+    "policy, received, dropped, coalesced",
+    (
+        (DROP, [0, 1, 2], 3, 0),
+        (COALESCE, [0, 1, 5], 0, 3),
+    ),
+)
+def test_overflow(policy, received, dropped, coalesced):
+    gate = threading.Event()
+    dispatcher = AsyncDispatcher(maxsize=2, policy=policy)
+    observable = Observable()
+    observable.setDispatcher(dispatcher)
+    observer = RecordingObserver(gate)
+    observable.addObserver(observer)
+    notify(observable, 0)
+    # wait for the worker to block in the observer with the first event
+    while dispatcher.depth:
+        threading.Event().wait(0.001)
+    for i in range(1, 6):
+        notify(observable, i)
+    assert dispatcher.maxdepth == 2
+    gate.set()
+    assert dispatcher.flush(timeout=5)
+    assert observer.received == received
+    assert (dispatcher.dropped, dispatcher.coalesced) == (dropped, coalesced)
+    dispatcher.stop()
+
+
+def test_overflow_block():
+    gate = threading.Event()
+    dispatcher = AsyncDispatcher(maxsize=1, policy=BLOCK)
+    observable = Observable()
+    observable.setDispatcher(dispatcher)
+    observer = RecordingObserver(gate)
+    observable.addObserver(observer)
+    threading.Timer(0.05, gate.set).start()
+    for i in range(5):
+        notify(observable, i)
+    assert dispatcher.flush(timeout=5)
+    assert observer.received == list(range(5))
+    assert dispatcher.dropped == 0
+    dispatcher.stop()
+
+
+def test_coalesce_event_types():
+    gate = threading.Event()
+    dispatcher = AsyncDispatcher(maxsize=2, policy=COALESCE)
+    observable = Observable()
+    observable.setDispatcher(dispatcher)
+    observer = RecordingObserver(gate)
+    observable.addObserver(observer)
+    notify(observable, CardConnectionEvent("connect"))
+    while dispatcher.depth:
+        threading.Event().wait(0.001)
+    events = []
+    for i in range(3):
+        events.append(CardConnectionEvent("command", [[i], None]))
+        events.append(CardConnectionEvent("response", [[], 0x90, i]))
+    for event in events:
+        notify(observable, event)
+    gate.set()
+    assert dispatcher.flush(timeout=5)
+    # the latest command and response, in order
+    assert observer.received[1:] == events[-2:]
+    assert dispatcher.coalesced == 4
+    dispatcher.stop()
+
+
+def test_overflow_block_from_worker():
+    dispatcher = AsyncDispatcher(maxsize=1, policy=BLOCK)
+    observable = Observable()
+    observable.setDispatcher(dispatcher)
+    observer = RecordingObserver()
+    observable.addObserver(observer)
+
+    class Notifier(Observer):
+        def update(self, observable, handlers):
+            if handlers == 0:
+                # the queue is full: dropped instead of waiting forever
+                notify(observable, 2)
+
+    gate = threading.Event()
+    observable.addObserver(RecordingObserver(gate))
+    observable.addObserver(Notifier())
+    notify(observable, 0)
+    while dispatcher.depth:
+        threading.Event().wait(0.001)
+    notify(observable, 1)
+    gate.set()
+    assert dispatcher.flush(timeout=5)
+    assert observer.received == [0, 1]
+    assert dispatcher.dropped == 1
+    dispatcher.stop()
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        AsyncDispatcher(policy="lose")
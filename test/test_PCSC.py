@@ -2,14 +2,18 @@
 # pylint: disable=invalid-name
 # pylint: disable=missing-function-docstring
 
+import pytest
+
 from smartcard.scard import (
     SCARD_E_NO_READERS_AVAILABLE,
     SCARD_E_NO_SERVICE,
+    SCARD_PCI_T0,
     SCARD_S_SUCCESS,
     SCARD_SCOPE_USER,
     SCardEstablishContext,
     SCardListReaders,
     SCardReleaseContext,
+    SCardTransmitBatch,
 )
 
 
@@ -28,3 +32,10 @@ def test_low_level():
 
     hresult = SCardReleaseContext(hcontext)
     assert hresult == SCARD_S_SUCCESS
+
+
+def test_transmit_batch_invalid_stop_on():
+    with pytest.raises(OverflowError):
+        SCardTransmitBatch(1, SCARD_PCI_T0, [b"\x00\xa4\x00\x00"], [-1])
+    with pytest.raises(TypeError):
+        SCardTransmitBatch(1, SCARD_PCI_T0, [b"\x00\xa4\x00\x00"], ["9000"])
@@ -0,0 +1,92 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import threading
+
+import pytest
+
+import smartcard.pcsc.PCSCCardRequest
+from smartcard.Card import Card
+from smartcard.Exceptions import CardRequestTimeoutException
+from smartcard.pcsc.PCSCCardRequest import PCSCCardRequest
+
+ATR = [0x3B, 0x00]
+
+
+@pytest.fixture(autouse=True)
+def fake_resource_manager(monkeypatch, resource_manager):
+    resource_manager.patch(monkeypatch, smartcard.pcsc.PCSCCardRequest)
+
+
+def test_waitforcardevent(resource_manager):
+    request = PCSCCardRequest(timeout=5)
+    assert request.waitforcardevent() == [Card("reader 2", ATR)]
+    resource_manager.insert("reader 1", ATR)
+    assert request.waitforcardevent() == [
+        Card("reader 1", ATR),
+        Card("reader 2", ATR),
+    ]
+    listreaders = resource_manager.listreaders
+    for _ in range(10):
+        resource_manager.insert("reader 1")
+        assert request.waitforcardevent() == [Card("reader 2", ATR)]
+        resource_manager.insert("reader 1", ATR)
+        assert len(request.waitforcardevent()) == 2
+    # no reader change: neither a new thread nor a new list of readers
+    assert resource_manager.listreaders == listreaders
+    assert len(resource_manager.threads) == 1
+    request.release()
+
+
+def test_waitforcardevent_reader_change(resource_manager):
+    request = PCSCCardRequest(timeout=5)
+    request.waitforcardevent()
+    resource_manager.insert("reader 3", ATR)
+    assert Card("reader 3", ATR) in request.waitforcardevent()
+    resource_manager.remove("reader 2")
+    assert request.waitforcardevent() == [Card("reader 3", ATR)]
+    request.release()
+
+
+def test_cancel(resource_manager):
+    request = PCSCCardRequest(timeout=None)
+    request.waitforcardevent()
+    threading.Timer(0.05, request.cancel).start()
+    with pytest.raises(CardRequestTimeoutException):
+        request.waitforcardevent()
+    request.release()
+
+
+def test_timeout(resource_manager):
+    request = PCSCCardRequest(timeout=0.05, newcardonly=True)
+    with pytest.raises(CardRequestTimeoutException):
+        request.waitforcard()
+    request.release()
+
+
+class FakeConnection:
+    def __init__(self, reader):
+        self.reader = reader
+
+    def disconnect(self):
+        pass
+
+    def release(self):
+        pass
+
+
+class FakeReader:
+    def __init__(self, name):
+        self.name = name
+
+    def createConnection(self):
+        return FakeConnection(self.name)
+
+
+def test_waitforcard_newcardonly(monkeypatch, resource_manager):
+    monkeypatch.setattr(smartcard.pcsc.PCSCCardRequest, "PCSCReader", FakeReader)
+    request = PCSCCardRequest(timeout=5, newcardonly=True)
+    threading.Timer(0.05, resource_manager.insert, ("reader 1", ATR)).start()
+    assert request.waitforcard().connection.reader == "reader 1"
+    request.release()
@@ -0,0 +1,177 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import threading
+
+import pytest
+
+import smartcard.pcsc.PCSCConnectionPool
+from smartcard.CardConnection import CardConnection
+from smartcard.CardConnectionObserver import CardConnectionObserver
+from smartcard.Exceptions import CardConnectionException
+from smartcard.pcsc.PCSCConnectionPool import ConnectionPool
+from smartcard.scard import (
+    SCARD_LEAVE_CARD,
+    SCARD_S_SUCCESS,
+    SCARD_UNPOWER_CARD,
+    SCARD_W_REMOVED_CARD,
+    SCARD_W_RESET_CARD,
+)
+
+ATR1 = [0x3B, 0x01]
+ATR2 = [0x3B, 0x02]
+
+
+class Card:
+    """State of the simulated card, shared by the connections."""
+
+    atr = ATR1
+    status = SCARD_S_SUCCESS
+    connects = 0
+    reconnects = 0
+
+
+class FakeConnection(CardConnection):
+    def __init__(self, reader):
+        CardConnection.__init__(self, reader)
+        self.hcard = None
+        self.disposition = None
+        self.autogetresponse = False
+
+    def setAutoGetResponse(self, enable=True):
+        self.autogetresponse = enable
+
+    def connect(self, protocol=None, mode=None, disposition=None):
+        Card.connects += 1
+        Card.status = SCARD_S_SUCCESS
+        self.hcard = self
+        self.disposition = disposition
+
+    def reconnect(self, protocol=None, mode=None, disposition=None):
+        Card.reconnects += 1
+        Card.status = SCARD_S_SUCCESS
+        self.disposition = disposition
+
+    def disconnect(self):
+        self.hcard = None
+
+    def release(self):
+        self.disconnect()
+
+    def getATR(self):
+        return Card.atr
+
+
+@pytest.fixture(autouse=True)
+def fake_card(monkeypatch):
+    monkeypatch.setattr(
+        smartcard.pcsc.PCSCConnectionPool, "PCSCCardConnection", FakeConnection
+    )
+    monkeypatch.setattr(
+        smartcard.pcsc.PCSCConnectionPool,
+        "SCardStatus",
+        lambda hcard: (Card.status, "reader", 0, 0, Card.atr),
+    )
+    Card.atr = ATR1
+    Card.status = SCARD_S_SUCCESS
+    Card.connects = Card.reconnects = 0
+
+
+def test_connection_reused():
+    pool = ConnectionPool()
+    with pool.lease("reader") as connection:
+        assert connection.disposition == SCARD_LEAVE_CARD
+        connection.addObserver(CardConnectionObserver())
+    with pool.lease("reader") as other:
+        assert other is connection
+        assert other.countObservers() == 0
+    assert Card.connects == 1
+
+
+def test_lease_state_reset():
+    pool = ConnectionPool()
+    with pool.lease("reader") as connection:
+        protocol = connection.getProtocol()
+        connection.setAutoGetResponse(True)
+        connection.setProtocol(CardConnection.T1_protocol)
+        connection.setDispatcher(object())
+        connection.disposition = SCARD_UNPOWER_CARD
+    with pool.lease("reader") as other:
+        assert other is connection
+        assert not other.autogetresponse
+        assert other.getProtocol() == protocol
+        assert other.dispatcher is None
+        assert other.disposition == SCARD_LEAVE_CARD
+
+
+def test_checkin_not_leased():
+    pool = ConnectionPool(maxconnections=2)
+    connection = pool.checkout("reader")
+    pool.checkin(connection)
+    with pytest.raises(CardConnectionException):
+        pool.checkin(connection)
+    with pytest.raises(CardConnectionException):
+        pool.checkin(FakeConnection("reader"))
+    # the connection is handed out once
+    first = pool.checkout("reader")
+    second = pool.checkout("reader")
+    assert first is connection
+    assert second is not connection
+
+
+def test_card_reset():
+    pool = ConnectionPool()
+    with pool.lease("reader"):
+        pass
+    Card.status = SCARD_W_RESET_CARD
+    with pool.lease("reader"):
+        pass
+    assert (Card.connects, Card.reconnects) == (1, 1)
+
+
+def test_card_swapped():
+    pool = ConnectionPool()
+    with pool.lease("reader"):
+        pass
+    Card.atr = ATR2
+    with pool.lease("reader"):
+        pass
+    Card.status = SCARD_W_REMOVED_CARD
+    with pool.lease("reader"):
+        pass
+    assert Card.connects == 3
+
+
+def test_checkout_timeout():
+    pool = ConnectionPool()
+    connection = pool.checkout("reader")
+    with pytest.raises(CardConnectionException):
+        pool.checkout("reader", timeout=0.01)
+    # other readers are independent
+    pool.checkin(pool.checkout("other reader"))
+
+    thread = threading.Timer(0.05, pool.checkin, [connection])
+    thread.start()
+    assert pool.checkout("reader", timeout=5) is connection
+    thread.join()
+
+
+def test_close():
+    pool = ConnectionPool()
+    connection = pool.checkout("reader")
+    pool.close()
+    pool.checkin(connection)
+    assert connection.hcard is None
+    with pytest.raises(CardConnectionException):
+        pool.checkout("reader")
+
+
+def test_close_wakes_checkout():
+    pool = ConnectionPool()
+    pool.checkout("reader")
+    thread = threading.Timer(0.05, pool.close)
+    thread.start()
+    with pytest.raises(CardConnectionException, match="closed"):
+        pool.checkout("reader", timeout=5)
+    thread.join()
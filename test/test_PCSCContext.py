@@ -0,0 +1,153 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+import smartcard.pcsc.PCSCContext
+from smartcard.Exceptions import SmartcardException
+from smartcard.pcsc.PCSCContext import PCSCContextManager
+from smartcard.pcsc.PCSCExceptions import EstablishContextException
+from smartcard.scard import SCARD_E_INVALID_HANDLE, SCARD_E_NO_SERVICE, SCARD_S_SUCCESS
+
+
+class FakeResourceManager:
+    def __init__(self):
+        self.established = []
+        self.released = []
+        self.available = True
+
+    def establish(self, scope):
+        if not self.available:
+            return SCARD_E_NO_SERVICE, 0
+        self.established.append(len(self.established) + 1)
+        return SCARD_S_SUCCESS, self.established[-1]
+
+    def release(self, hcontext):
+        self.released.append(hcontext)
+        return SCARD_S_SUCCESS
+
+
+@pytest.fixture
+def resource_manager(monkeypatch):
+    fake = FakeResourceManager()
+    monkeypatch.setattr(
+        smartcard.pcsc.PCSCContext, "SCardEstablishContext", fake.establish
+    )
+    monkeypatch.setattr(smartcard.pcsc.PCSCContext, "SCardReleaseContext", fake.release)
+    return fake
+
+
+def test_shared_context(resource_manager):
+    manager = PCSCContextManager()
+    hcontext = manager.acquire()
+    assert manager.acquire() == hcontext
+    with manager.context() as other:
+        assert other == hcontext
+    manager.release(hcontext)
+    manager.release(hcontext)
+    assert resource_manager.established == [1]
+    assert not resource_manager.released
+    manager.close()
+    assert resource_manager.released == [1]
+
+
+def test_dedicated_context(resource_manager):
+    manager = PCSCContextManager()
+    shared = manager.acquire()
+    dedicated = manager.acquire(shared=False)
+    assert dedicated != shared
+    assert manager.acquire(shared=False) not in (shared, dedicated)
+    manager.release(dedicated)
+    # kept idle, and handed out again
+    assert not resource_manager.released
+    assert manager.acquire(shared=False) == dedicated
+    assert resource_manager.established == [1, 2, 3]
+
+
+def test_idle_contexts(resource_manager):
+    manager = PCSCContextManager(maxidle=1)
+    first = manager.acquire(shared=False)
+    second = manager.acquire(shared=False)
+    manager.release(first)
+    manager.release(second)
+    assert resource_manager.released == [second]
+    manager.close()
+    assert resource_manager.released == [second, first]
+
+
+def test_renew_dedicated_context(resource_manager):
+    manager = PCSCContextManager()
+    idle = manager.acquire(shared=False)
+    old = manager.acquire(shared=False)
+    manager.release(idle)
+    new = manager.renew(old)
+    assert new not in (idle, old)
+    # the failed context and the idle contexts are released
+    assert sorted(resource_manager.released) == [idle, old]
+    manager.release(new)
+    assert manager.acquire(shared=False) == new
+
+
+def test_reset(resource_manager):
+    manager = PCSCContextManager()
+    manager.acquire()
+    manager.release(manager.acquire(shared=False))
+    manager.reset()
+    hcontext = manager.acquire()
+    assert hcontext == 3
+    manager.release(hcontext)
+    manager.close()
+    # the contexts of before reset() are not released
+    assert resource_manager.released == [3]
+
+
+def test_renew_context(resource_manager):
+    manager = PCSCContextManager()
+    old = manager.acquire()
+    user = manager.acquire()
+    new = manager.renew(old)
+    assert new != old
+    assert manager.acquire() == new
+    # the old context is released by its last user
+    assert not resource_manager.released
+    manager.release(user)
+    assert resource_manager.released == [old]
+
+
+def test_call_renews_context(resource_manager):
+    manager = PCSCContextManager()
+    calls = []
+
+    def function(hcontext, arg):
+        calls.append((hcontext, arg))
+        return (SCARD_E_INVALID_HANDLE if hcontext == 1 else SCARD_S_SUCCESS), arg
+
+    assert manager.call(function, "a") == (SCARD_S_SUCCESS, "a")
+    assert calls == [(1, "a"), (2, "a")]
+    assert resource_manager.released == [1]
+
+
+def test_establish_failure(resource_manager):
+    manager = PCSCContextManager()
+    resource_manager.available = False
+    with pytest.raises(EstablishContextException):
+        manager.acquire()
+    resource_manager.available = True
+    assert manager.acquire() == 1
+
+
+def test_renewcontext(resource_manager):
+    manager = PCSCContextManager()
+
+    class Owner:
+        hcontext = manager.acquire(shared=False)
+
+    owner = Owner()
+    manager.renewcontext(owner, SmartcardException)
+    assert owner.hcontext == 2
+    resource_manager.available = False
+    with pytest.raises(SmartcardException, match="Failed to establish context"):
+        manager.renewcontext(owner, SmartcardException)
+    assert owner.hcontext is None
+    assert resource_manager.released == [1, 2]
@@ -0,0 +1,101 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+from smartcard.CardConnection import CardConnection
+from smartcard.ReadBinary import iter_read_binary, read_binary_into
+from smartcard.sw.SWExceptions import SWException
+from smartcard.util import toBytes
+
+EF = bytes(i % 251 for i in range(1000))
+
+
+class FileCardConnection(CardConnection):
+    """Card connection with a transparent EF 0102, also with SFI 2."""
+
+    def __init__(self):
+        CardConnection.__init__(self, "reader")
+        self.commands = []
+
+    def getATR(self):
+        return toBytes("3B 16 94 20 02 01 00 00 0D")
+
+    def doTransmit(self, command, protocol):
+        command = bytes(command)
+        self.commands.append(command)
+        if command[1] == 0xA4:
+            if command[5:] == b"\x01\x02":
+                return [], 0x90, 0x00
+            return [], 0x6A, 0x82
+        if command[2] & 0x80:
+            if command[2] != 0x82:
+                return [], 0x6A, 0x82
+            offset = command[3]
+        else:
+            offset = int.from_bytes(command[2:4], "big")
+        le = command[4] or 256
+        if offset >= len(EF):
+            return [], 0x6B, 0x00
+        data = EF[offset : offset + le]
+        if len(data) < le:
+            return list(data), 0x62, 0x82
+        return list(data), 0x90, 0x00
+
+
+def test_iter_read_binary_fid():
+    connection = FileCardConnection()
+    chunks = list(iter_read_binary(connection, fid=b"\x01\x02"))
+    assert [len(chunk) for chunk in chunks] == [256, 256, 256, 232]
+    assert all(isinstance(chunk, memoryview) for chunk in chunks)
+    assert b"".join(chunks) == EF
+    assert connection.commands[0] == b"\x00\xa4\x02\x0c\x02\x01\x02"
+    assert connection.commands[2] == b"\x00\xb0\x01\x00\x00"
+
+
+def test_iter_read_binary_sfi():
+    connection = FileCardConnection()
+    chunks = list(iter_read_binary(connection, sfi=2, chunk=200, offset=100))
+    assert b"".join(chunks) == EF[100:]
+    assert connection.commands[0] == b"\x00\xb0\x82\x64\xc8"
+    assert connection.commands[1] == b"\x00\xb0\x01\x2c\xc8"
+    # the last read is answered with 6282
+    assert len(connection.commands) == 5
+
+
+def test_iter_read_binary_end_of_file():
+    connection = FileCardConnection()
+    chunks = list(iter_read_binary(connection, sfi=2, chunk=100))
+    assert b"".join(chunks) == EF
+    # the read at offset 1000 is answered with 6B00
+    assert len(connection.commands) == 11
+
+
+def test_iter_read_binary_size():
+    connection = FileCardConnection()
+    chunks = list(iter_read_binary(connection, sfi=2, offset=10, size=300))
+    assert b"".join(chunks) == EF[10:310]
+    assert connection.commands[1] == b"\x00\xb0\x01\x0a\x2c"
+
+
+def test_read_binary_into():
+    connection = FileCardConnection()
+    buffer = bytearray(2000)
+    assert read_binary_into(connection, buffer, fid=b"\x01\x02") == len(EF)
+    assert buffer[: len(EF)] == EF
+
+
+def test_read_binary_into_full_buffer():
+    connection = FileCardConnection()
+    buffer = bytearray(300)
+    assert read_binary_into(connection, buffer, sfi=2) == 300
+    assert buffer == EF[:300]
+
+
+def test_read_binary_error():
+    connection = FileCardConnection()
+    with pytest.raises(SWException):
+        list(iter_read_binary(connection, fid=b"\x3f\x00"))
+    with pytest.raises(SWException):
+        list(iter_read_binary(connection, sfi=3))
@@ -0,0 +1,94 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import queue
+import threading
+
+import pytest
+
+import smartcard.ReaderMonitoring
+from smartcard.Exceptions import SmartcardException
+from smartcard.ReaderMonitoring import ReaderMonitor, ReaderObserver
+
+
+class FakeNotification:
+    def __init__(self, supported=True):
+        self.supported = supported
+        self.event = threading.Event()
+        self.changed = False
+        self.released = False
+
+    def wait(self):
+        if not self.supported:
+            raise SmartcardException("PnP notification not supported")
+        self.event.wait()
+        self.event.clear()
+        changed, self.changed = self.changed, False
+        return changed
+
+    def notify(self):
+        self.changed = True
+        self.event.set()
+
+    def cancel(self):
+        self.event.set()
+
+    def release(self):
+        self.released = True
+
+
+class QueueObserver(ReaderObserver):
+    def __init__(self):
+        super().__init__()
+        self.queue = queue.Queue()
+
+    def update(self, observable, handlers):
+        self.queue.put(handlers)
+
+
+@pytest.fixture
+def readers():
+    return ["reader 1"]
+
+
+def monitor_with(monkeypatch, notification, readers, period):
+    monkeypatch.setattr(
+        smartcard.ReaderMonitoring, "PCSCPnPNotification", lambda: notification
+    )
+    return ReaderMonitor(
+        readerProc=lambda: list(readers), period=period, eventDriven=True
+    )
+
+
+def test_event_driven(monkeypatch, readers):
+    notification = FakeNotification()
+    # a period long enough to fail the test if the monitor polled
+    monitor = monitor_with(monkeypatch, notification, readers, period=60)
+    observer = QueueObserver()
+    monitor.addObserver(observer)
+    try:
+        assert observer.queue.get(timeout=5) == (["reader 1"], [])
+        readers.append("reader 2")
+        notification.notify()
+        assert observer.queue.get(timeout=5) == (["reader 2"], [])
+        readers.remove("reader 1")
+        notification.notify()
+        assert observer.queue.get(timeout=5) == ([], ["reader 1"])
+    finally:
+        monitor.deleteObserver(observer)
+    assert notification.released
+
+
+def test_polling_fallback(monkeypatch, readers):
+    notification = FakeNotification(supported=False)
+    monitor = monitor_with(monkeypatch, notification, readers, period=0.01)
+    observer = QueueObserver()
+    monitor.addObserver(observer)
+    try:
+        assert observer.queue.get(timeout=5) == (["reader 1"], [])
+        readers.append("reader 2")
+        assert observer.queue.get(timeout=5) == (["reader 2"], [])
+    finally:
+        monitor.deleteObserver(observer)
+    assert notification.released
@@ -0,0 +1,80 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+from smartcard.scard import (
+    SCARD_E_NO_SERVICE,
+    SCARD_E_TIMEOUT,
+    SCARD_S_SUCCESS,
+    SCARD_SCOPE_USER,
+    SCARD_STATE_CHANGED,
+    SCARD_STATE_EMPTY,
+    SCARD_STATE_UNAWARE,
+    ReaderStateSet,
+    SCardEstablishContext,
+    SCardListReaders,
+    SCardReleaseContext,
+)
+
+
+def test_update():
+    readerstates = ReaderStateSet(["reader 1", "reader 2"])
+    assert len(readerstates) == 2
+    assert "reader 1" in readerstates
+    assert readerstates.update(["reader 2", "reader 3"]) == (
+        ["reader 3"],
+        [("reader 1", SCARD_STATE_UNAWARE, [])],
+    )
+    assert readerstates.states() == [
+        ("reader 2", SCARD_STATE_UNAWARE, []),
+        ("reader 3", SCARD_STATE_UNAWARE, []),
+    ]
+
+
+def test_add_remove():
+    readerstates = ReaderStateSet()
+    for i in range(20):
+        readerstates.add(f"reader {i}", SCARD_STATE_EMPTY)
+    with pytest.raises(ValueError):
+        readerstates.add("reader 0")
+    readerstates.remove("reader 0")
+    with pytest.raises(KeyError):
+        readerstates.remove("reader 0")
+    with pytest.raises(TypeError):
+        readerstates.add(0)
+    assert len(readerstates) == 19
+    assert readerstates.states(SCARD_STATE_EMPTY)[0] == (
+        "reader 1",
+        SCARD_STATE_EMPTY,
+        [],
+    )
+
+
+def test_getStatusChange():
+    hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+    assert hresult in (SCARD_S_SUCCESS, SCARD_E_NO_SERVICE)
+
+    if hresult == SCARD_E_NO_SERVICE:
+        return
+
+    hresult, readers = SCardListReaders(hcontext, [])
+    if hresult != SCARD_S_SUCCESS or not readers:
+        SCardReleaseContext(hcontext)
+        return
+
+    # all readers change from the unaware state, then nothing changes
+    readerstates = ReaderStateSet(readers)
+    hresult, changes = readerstates.getStatusChange(hcontext, 0)
+    assert hresult == SCARD_S_SUCCESS
+    assert [reader for reader, _state, _atr in changes] == readers
+    # the event states are the current states of the next call
+    assert readerstates.states() == [
+        (reader, state & ~SCARD_STATE_CHANGED, atr) for reader, state, atr in changes
+    ]
+    hresult, changes = readerstates.getStatusChange(hcontext, 0)
+    assert hresult == SCARD_E_TIMEOUT
+    assert not changes
+
+    hresult = SCardReleaseContext(hcontext)
+    assert hresult == SCARD_S_SUCCESS
@@ -0,0 +1,113 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import pytest
+
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import CardConnectionException
+from smartcard.SegmentingCardConnection import (
+    SegmentingCardConnection,
+    buildAPDU,
+    splitAPDU,
+)
+from smartcard.util import toBytes
+
+# card capabilities with command chaining and extended length
+ATR_CHAINING_EXTENDED = toBytes("3B 85 80 01 80 73 00 00 C0 32")
+ATR_CHAINING = toBytes("3B 85 80 01 80 73 00 00 80 72")
+
+
+class RecordingCardConnection(CardConnection):
+    def __init__(self, atr):
+        CardConnection.__init__(self, "reader")
+        self.atr = atr
+        self.commands = []
+
+    def getATR(self):
+        return self.atr
+
+    def doTransmit(self, command, protocol):
+        self.commands.append(bytes(command))
+        return [len(self.commands)], 0x90, 0x00
+
+
+@pytest.mark.parametrize(
+    "command, fields",
+    (
+        ("00 A4 00 00", (b"", None)),
+        ("00 B0 00 00 00", (b"", 256)),
+        ("00 D6 00 00 02 01 02", (b"\x01\x02", None)),
+        ("00 A4 04 00 02 01 02 00", (b"\x01\x02", 256)),
+        ("00 B0 00 00 00 01 00", (b"", 256)),
+        ("00 B0 00 00 00 00 00", (b"", 65536)),
+        ("00 D6 00 00 00 00 02 01 02", (b"\x01\x02", None)),
+        ("00 D6 00 00 00 00 02 01 02 04 00", (b"\x01\x02", 1024)),
+    ),
+)
+def test_split_build_apdu(command, fields):
+    command = bytes(toBytes(command))
+    header, data, le = splitAPDU(command)
+    assert header == command[:4]
+    assert (data, le) == fields
+    extended = len(command) > 5 and command[4] == 0
+    assert buildAPDU(header, data, le, extended) == command
+
+
+def test_split_invalid_apdu():
+    with pytest.raises(CardConnectionException):
+        splitAPDU([0x00, 0xD6, 0x00, 0x00, 0x03, 0x01])
+
+
+def test_short_command_unchanged():
+    component = RecordingCardConnection(ATR_CHAINING_EXTENDED)
+    connection = SegmentingCardConnection(component, maxdatasize=0)
+    connection.transmit([0x00, 0xD6, 0x00, 0x00, 0x02, 0x01, 0x02])
+    assert component.commands == [bytes([0x00, 0xD6, 0x00, 0x00, 0x02, 0x01, 0x02])]
+
+
+def test_extended_le_without_reader_support():
+    component = RecordingCardConnection(ATR_CHAINING_EXTENDED)
+    connection = SegmentingCardConnection(component, maxdatasize=0)
+    connection.transmit(buildAPDU(b"\x00\xb0\x00\x00", le=1024, extended=True))
+    # short APDU, Le of 256 bytes
+    assert component.commands == [b"\x00\xb0\x00\x00\x00"]
+
+
+def test_extended_length():
+    component = RecordingCardConnection(ATR_CHAINING_EXTENDED)
+    connection = SegmentingCardConnection(component, maxdatasize=65535)
+    data = bytes(range(256)) * 2
+    command = buildAPDU(b"\x00\xd6\x00\x00", data, extended=True)
+    connection.transmit(command)
+    assert component.commands == [command]
+
+
+def test_command_chaining():
+    component = RecordingCardConnection(ATR_CHAINING)
+    connection = SegmentingCardConnection(component, maxdatasize=65535)
+    data = bytes(range(256)) * 2
+    command = buildAPDU(b"\x00\xe2\x00\x00", data, 0, extended=True)
+    response = connection.transmit(command)
+    assert component.commands == [
+        b"\x10\xe2\x00\x00\xff" + data[:255],
+        b"\x10\xe2\x00\x00\xff" + data[255:510],
+        b"\x00\xe2\x00\x00\x02" + data[510:] + b"\x00",
+    ]
+    assert response == ([3], 0x90, 0x00)
+
+
+def test_command_chaining_reader_limit():
+    component = RecordingCardConnection(ATR_CHAINING_EXTENDED)
+    connection = SegmentingCardConnection(component, maxdatasize=261)
+    data = bytes(300)
+    connection.transmit(buildAPDU(b"\x00\xe2\x00\x00", data, extended=True))
+    assert len(component.commands) == 2
+    assert component.commands[0][0] == 0x10
+
+
+def test_not_supported():
+    component = RecordingCardConnection(toBytes("3B 65 00 00 9C 11 01 01 03"))
+    connection = SegmentingCardConnection(component, maxdatasize=65535)
+    with pytest.raises(CardConnectionException):
+        connection.transmit(buildAPDU(b"\x00\xe2\x00\x00", bytes(300), extended=True))
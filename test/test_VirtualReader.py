@@ -0,0 +1,112 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import threading
+import time
+
+import pytest
+
+import smartcard.System
+from smartcard.Card import Card
+from smartcard.CardConnection import CardConnection
+from smartcard.Exceptions import NoCardException
+from smartcard.reader.ReaderFactory import ReaderFactory
+from smartcard.scard import SCARD_ATTR_ATR_STRING
+from smartcard.virtual.VirtualCard import VirtualCard
+from smartcard.virtual.VirtualReader import VirtualReader, register, unregister
+
+SELECT_MF = [0x00, 0xA4, 0x00, 0x00, 0x02, 0x3F, 0x00]
+
+
+@pytest.fixture(autouse=True)
+def virtual_readers():
+    factorymethods = list(ReaderFactory.factorymethods)
+    register(exclusive=True)
+    yield
+    VirtualReader.clear()
+    unregister()
+    assert ReaderFactory.factorymethods == factorymethods
+
+
+def test_readers():
+    VirtualReader.add("Virtual Reader 0")
+    reader = VirtualReader.add("Virtual Reader 1")
+    reader.addtoreadergroup("Rack")
+    assert smartcard.System.readers() == [
+        VirtualReader("Virtual Reader 0"),
+        VirtualReader("Virtual Reader 1"),
+    ]
+    assert smartcard.System.readers(["Rack"]) == [reader]
+    assert len(smartcard.System.readers(["SCard$DefaultReaders"])) == 2
+    with pytest.raises(ValueError):
+        VirtualReader.add("Virtual Reader 0")
+    VirtualReader.delete("Virtual Reader 0")
+    assert smartcard.System.readers() == [reader]
+
+
+def test_transmit():
+    state = {"selected": None}
+
+    def handler(command):
+        if command[:2] == b"\x00\xb0" and state["selected"] == 0x3F00:
+            return b"\x01\x02\x90\x00"
+        return None
+
+    card = VirtualCard("3B 00", handler=handler)
+    card.setResponse(SELECT_MF, "90 00")
+    VirtualReader.add("Virtual Reader 0", card)
+    connection = smartcard.System.readers()[0].createConnection()
+    connection.connect()
+    assert connection.getATR() == [0x3B, 0x00]
+    assert connection.getProtocol() == CardConnection.T1_protocol
+    assert connection.getAttrib(SCARD_ATTR_ATR_STRING) == [0x3B, 0x00]
+    assert connection.transmit(SELECT_MF) == ([], 0x90, 0x00)
+    assert connection.transmit([0x00, 0xB0, 0x00, 0x00, 0x02]) == ([], 0x6D, 0x00)
+    state["selected"] = 0x3F00
+    assert connection.transmit(
+        bytes([0x00, 0xB0, 0x00, 0x00, 0x02]), as_bytes=True
+    ) == (b"\x01\x02", 0x90, 0x00)
+    assert card.count == 3
+    connection.disconnect()
+
+
+def test_card_removal():
+    reader = VirtualReader.add("Virtual Reader 0")
+    connection = Card(reader, None).createConnection()
+    with pytest.raises(NoCardException):
+        connection.connect()
+    reader.insert(VirtualCard([0x3B, 0x00]))
+    connection.connect()
+    reader.insert(VirtualCard([0x3B, 0x01]))
+    with pytest.raises(NoCardException):
+        connection.transmit(SELECT_MF)
+    connection.reconnect()
+    assert connection.getATR() == [0x3B, 0x01]
+    reader.remove()
+    with pytest.raises(NoCardException):
+        connection.reconnect()
+
+
+def test_latency():
+    connections = []
+    for n in range(20):
+        reader = VirtualReader.add(f"Virtual Reader {n}", VirtualCard("3B 00"))
+        connections.append(reader.createConnection())
+        connections[-1].connect()
+    card = VirtualCard("3B 00", latency=0.1, jitter=0.01)
+    start = time.perf_counter()
+    card.transmit(bytes(SELECT_MF))
+    assert 0.09 <= time.perf_counter() - start
+    for connection in connections:
+        connection.component.card.latency = 0.1
+    threads = [
+        threading.Thread(target=connection.transmit, args=(SELECT_MF,))
+        for connection in connections
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the cards respond concurrently
+    assert time.perf_counter() - start < 1
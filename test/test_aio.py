@@ -0,0 +1,183 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import asyncio
+import threading
+
+import pytest
+
+import smartcard.aio
+from smartcard.aio import AsyncCardConnection, card_events, reader_events, wait_for_card
+from smartcard.Card import Card
+from smartcard.CardType import ATRCardType
+from smartcard.Exceptions import CardRequestTimeoutException, SmartcardException
+
+ATR = [0x3B, 0x00]
+OTHER_ATR = [0x3B, 0x01]
+
+
+@pytest.fixture(autouse=True)
+def fake_resource_manager(monkeypatch, resource_manager):
+    resource_manager.patch(monkeypatch, smartcard.aio)
+    yield
+    # the hub thread stops with the last subscription
+    thread = smartcard.aio._hub.thread  # pylint: disable=protected-access
+    if thread is not None:
+        thread.join(5)
+
+
+def later(delay, function, *args):
+    asyncio.get_running_loop().call_later(delay, function, *args)
+
+
+def test_card_events(resource_manager):
+    async def main():
+        events = card_events()
+        assert await events.__anext__() == ([Card("reader 2", ATR)], [])
+        resource_manager.insert("reader 1", ATR)
+        assert await events.__anext__() == ([Card("reader 1", ATR)], [])
+        resource_manager.insert("reader 2")
+        assert await events.__anext__() == ([], [Card("reader 2", ATR)])
+        await events.aclose()
+
+    asyncio.run(main())
+
+
+def test_card_events_readers(resource_manager):
+    async def main():
+        events = card_events(readers=["reader 1"])
+        resource_manager.insert("reader 2")
+        resource_manager.insert("reader 1", ATR)
+        assert await events.__anext__() == ([Card("reader 1", ATR)], [])
+        await events.aclose()
+
+    asyncio.run(main())
+
+
+def test_reader_events(resource_manager):
+    async def main():
+        events = reader_events()
+        added, removed = await events.__anext__()
+        assert [str(reader) for reader in added] == ["reader 1", "reader 2"]
+        assert not removed
+        resource_manager.remove("reader 1")
+        added, removed = await events.__anext__()
+        assert not added
+        assert [str(reader) for reader in removed] == ["reader 1"]
+        await events.aclose()
+
+    asyncio.run(main())
+
+
+def test_wait_for_card(resource_manager):
+    async def main():
+        later(0.05, resource_manager.insert, "reader 1", OTHER_ATR)
+        waiters = [
+            wait_for_card(ATRCardType(OTHER_ATR), timeout=5) for _ in range(1000)
+        ]
+        waiters.append(wait_for_card(timeout=5))
+        waiters.append(wait_for_card(timeout=5, newcardonly=True))
+        cards = await asyncio.gather(*waiters)
+        assert cards[:1000] == [Card("reader 1", OTHER_ATR)] * 1000
+        assert cards[1000:] == [Card("reader 2", ATR), Card("reader 1", OTHER_ATR)]
+
+    asyncio.run(main())
+    # a single waiter thread for all the coroutines
+    assert len(resource_manager.threads) == 1
+
+
+def test_wait_for_card_timeout():
+    async def main():
+        with pytest.raises(CardRequestTimeoutException):
+            await wait_for_card(timeout=0.05, newcardonly=True)
+
+    asyncio.run(main())
+
+
+def test_card_events_error(monkeypatch, resource_manager):
+    def fail(shared=True):  # pylint: disable=unused-argument
+        resource_manager.acquires += 1
+        raise SmartcardException("no resource manager")
+
+    resource_manager.acquires = 0
+    monkeypatch.setattr(resource_manager, "acquire", fail)
+
+    async def main():
+        events = [card_events() for _ in range(3)]
+        results = await asyncio.gather(
+            *(iterator.__anext__() for iterator in events), return_exceptions=True
+        )
+        assert all(isinstance(result, SmartcardException) for result in results)
+        # the subscriptions are dropped with the error, no restart
+        thread = smartcard.aio._hub.thread  # pylint: disable=protected-access
+        if thread is not None:
+            thread.join(5)
+        assert resource_manager.acquires == 1
+        with pytest.raises(SmartcardException):
+            await wait_for_card(timeout=5)
+        assert resource_manager.acquires == 2
+
+    asyncio.run(main())
+
+
+class SlowConnection:
+    def __init__(self, reader, gate):
+        self.reader = reader
+        self.gate = gate
+        self.hcontext = 1
+        self.commands = []
+        self.threads = set()
+        self.released = False
+
+    def getReader(self):
+        return self.reader
+
+    def transmit(self, command, protocol=None, as_bytes=False):
+        # pylint: disable=unused-argument
+        self.gate.wait()
+        self.commands.append(command)
+        self.threads.add(threading.current_thread())
+        return [], 0x90, 0x00
+
+    def release(self):
+        self.released = True
+
+
+def test_async_connection_ordered(resource_manager):
+    gate = threading.Event()
+    connections = [SlowConnection("reader 1", gate), SlowConnection("reader 2", gate)]
+
+    async def main():
+        conns = [AsyncCardConnection(connection) for connection in connections]
+        later(0.05, gate.set)
+        await asyncio.gather(*(conn.transmit([i]) for i in range(20) for conn in conns))
+        for conn in conns:
+            await conn.release()
+
+    asyncio.run(main())
+    for connection in connections:
+        assert connection.commands == [[i] for i in range(20)]
+        assert connection.released
+    # one thread per reader
+    assert len(connections[0].threads | connections[1].threads) == 2
+
+
+def test_async_connection_cancel(resource_manager):
+    gate = threading.Event()
+    connection = SlowConnection("reader 1", gate)
+
+    async def main():
+        conn = AsyncCardConnection(connection)
+        tasks = [asyncio.ensure_future(conn.transmit([i])) for i in range(3)]
+        await asyncio.sleep(0.05)
+        tasks[1].cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await tasks[2] == ([], 0x90, 0x00)
+        await conn.release()
+
+    asyncio.run(main())
+    # the second call was dropped, and the context cancelled
+    assert connection.commands == [[0], [2]]
+    assert resource_manager.cancelled
@@ -0,0 +1,55 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import json
+
+from smartcard.bench import BENCHMARKS, MONITORED_CARDS, Fixtures, compare, main, run
+from smartcard.reader.ReaderFactory import ReaderFactory
+from smartcard.virtual.VirtualReader import VirtualReader
+
+
+def test_run():
+    factorymethods = list(ReaderFactory.factorymethods)
+    fixtures = Fixtures()
+    try:
+        results = run(fixtures, repeat=2, mintime=0.001)
+    finally:
+        fixtures.close()
+    # without a PC/SC reader, only the PC/SC benchmarks do not run
+    assert set(results) == {name for name, _setup in BENCHMARKS} - {
+        "scard.SCardTransmit",
+        "PCSCCardConnection.doTransmit",
+        "PCSCCardConnection.transmit",
+    }
+    assert all(0 < r["min_us"] <= r["median_us"] for r in results.values())
+    assert ReaderFactory.factorymethods == factorymethods
+    assert not VirtualReader.readers()
+
+
+def test_monitor_diff():
+    diff = dict(BENCHMARKS)[f"monitor diff, {MONITORED_CARDS} cards"](None)
+    addedcards, removedcards = diff()
+    assert len(addedcards) == len(removedcards) == MONITORED_CARDS
+    assert {bytes(card.atr) for card in addedcards} == {b"\x3b\x01"}
+
+
+def test_compare():
+    previous = {"a": {"min_us": 1.0}, "b": {"min_us": 1.0}}
+    results = {"a": {"min_us": 1.05}, "b": {"min_us": 1.5}, "c": {}}
+    assert compare(results, previous, threshold=10) == [("b", 1.0, 1.5, 50.0)]
+
+
+def test_history(tmp_path, capsys):
+    history = tmp_path / "history.json"
+    argv = ["--history", str(history), "--repeat", "2", "--mintime", "0.001"]
+    assert main(argv + ["toHexString"]) == 0
+    runs = json.loads(history.read_text())
+    assert list(runs[0]["results"]) == ["toHexString, 256 bytes"]
+    assert runs[0]["environment"]["python"]
+
+    # a previous run much faster than possible
+    runs[0]["results"]["toHexString, 256 bytes"]["min_us"] = 1e-6
+    history.write_text(json.dumps(runs))
+    assert main(argv + ["--no-save", "toHexString"]) == 1
+    assert "regression: toHexString" in capsys.readouterr().err
+    assert len(json.loads(history.read_text())) == 1
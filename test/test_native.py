@@ -0,0 +1,172 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-function-docstring
+
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+PRELUDE = """
+import ctypes
+
+from smartcard.CardConnection import CardConnection
+from smartcard.CardConnectionDecorator import CardConnectionDecorator
+from smartcard.pcsc.PCSCReader import PCSCReader
+from smartcard.scard import *
+
+library = ctypes.CDLL("libpcsclite.so.1")
+transmitCount = ctypes.c_long.in_dll(library, "transmitCount")
+hresult, hcontext = SCardEstablishContext(SCARD_SCOPE_USER)
+hresult, hcard, protocol = SCardConnect(
+    hcontext, "Test Reader 00 00", SCARD_SHARE_SHARED, SCARD_PROTOCOL_T0
+)
+assert hresult == SCARD_S_SUCCESS
+"""
+
+
+def _cflags():
+    try:
+        result = subprocess.run(
+            ["pkg-config", "--cflags", "libpcsclite"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.split()
+    except (OSError, subprocess.CalledProcessError):
+        return ["-I/usr/include/PCSC", "-I/usr/local/include/PCSC"]
+
+
+@pytest.fixture(scope="module")
+def libdir(tmp_path_factory):
+    """Build the simulated PC/SC library of fake_pcsclite.c."""
+    if not sys.platform.startswith("linux"):
+        pytest.skip("the simulated PC/SC library is loaded with LD_LIBRARY_PATH")
+    cc = shutil.which(os.environ.get("CC", "cc"))
+    if cc is None:
+        pytest.skip("no C compiler")
+    path = tmp_path_factory.mktemp("pcsclite")
+    source = os.path.join(os.path.dirname(__file__), "fake_pcsclite.c")
+    result = subprocess.run(
+        [cc, "-shared", "-fPIC", "-o", path / "libpcsclite.so.1", source] + _cflags(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        pytest.skip("cannot build the simulated PC/SC library: " + result.stderr)
+    return path
+
+
+def run(libdir, script):
+    """Run a test script in a process loading the simulated library."""
+    env = dict(os.environ)
+    env["LD_LIBRARY_PATH"] = os.pathsep.join(
+        [str(libdir)] + env.get("LD_LIBRARY_PATH", "").split(os.pathsep)
+    )
+    env["PYTHONPATH"] = os.pathsep.join(sys.path)
+    result = subprocess.run(
+        [sys.executable, "-c", PRELUDE + textwrap.dedent(script)],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=60,
+        check=False,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def test_transmit_buffers(libdir):
+    run(
+        libdir,
+        """
+        ECHO = [0x00, 0x01, 0x00, 0x00, 0x02, 0xAB, 0xCD]
+        for command in (ECHO, bytes(ECHO), bytearray(ECHO), memoryview(bytes(ECHO))):
+            hresult, response = SCardTransmit(hcard, SCARD_PCI_T0, command)
+            assert response == [0xAB, 0xCD, 0x90, 0x00]
+
+        hresult, data, sw1, sw2 = SCardTransmitBytes(hcard, SCARD_PCI_T0, ECHO)
+        assert (data, sw1, sw2) == (b"\\xab\\xcd", 0x90, 0x00)
+
+        # steady state transmits reuse the pooled receive buffers
+        allocations = SCardGetRecvBufferAllocations()
+        for _ in range(100):
+            SCardTransmitBytes(hcard, SCARD_PCI_T0, ECHO)
+        assert SCardGetRecvBufferAllocations() == allocations
+
+        buffer = bytearray(8)
+        hresult, length, sw1, sw2 = SCardTransmitInto(
+            hcard, SCARD_PCI_T0, ECHO, memoryview(buffer)[3:]
+        )
+        assert (hresult, length, sw1, sw2) == (SCARD_S_SUCCESS, 2, 0x90, 0x00)
+        assert buffer == bytearray([0, 0, 0, 0xAB, 0xCD, 0, 0, 0])
+
+        # Le larger than the buffer: not transmitted
+        count = transmitCount.value
+        hresult, length, sw1, sw2 = SCardTransmitInto(
+            hcard, SCARD_PCI_T0, [0x00, 0x03, 0x00, 0x00, 0x00], buffer
+        )
+        assert hresult == SCARD_E_INSUFFICIENT_BUFFER
+        assert (length, sw1, sw2) == (0, None, None)
+        assert transmitCount.value == count
+        """,
+    )
+
+
+def test_auto_get_response(libdir):
+    run(
+        libdir,
+        """
+        transmit = SCardTransmitBytesAutoGetResponse
+
+        # 300 bytes pending: two GET RESPONSE
+        hresult, data, sw1, sw2 = transmit(hcard, SCARD_PCI_T0, [0, 2, 1, 0x2C])
+        assert (hresult, sw1, sw2) == (SCARD_S_SUCCESS, 0x90, 0x00)
+        assert data == bytes(i % 256 for i in range(300))
+
+        # GET RESPONSE uses the class of the command, without chaining bit
+        for cla in (0x10, 0x01, 0x90):
+            hresult, data, sw1, sw2 = transmit(hcard, SCARD_PCI_T0, [cla, 2, 0, 4])
+            assert (data, sw1, sw2) == (b"\\x00\\x01\\x02\\x03", 0x90, 0x00)
+
+        # wrong Le: sent again with Le = SW2, for case 2 and case 4
+        for command in ([0, 3, 0, 0, 0], [0, 3, 0, 0, 1, 0xFF, 0x10]):
+            hresult, data, sw1, sw2 = transmit(hcard, SCARD_PCI_T0, command)
+            assert (data, sw1, sw2) == (bytes(range(0xA0, 0xA8)), 0x90, 0x00)
+
+        # an extended Le is not rewritten
+        hresult, data, sw1, sw2 = transmit(hcard, SCARD_PCI_T0, [0, 3, 0, 0, 0, 0, 0])
+        assert (data, sw1, sw2) == (b"", 0x6C, 0x08)
+        """,
+    )
+
+
+def test_auto_get_response_connection(libdir):
+    run(
+        libdir,
+        """
+        connection = CardConnectionDecorator(
+            PCSCReader("Test Reader 00 00").createConnection()
+        )
+        connection.connect(CardConnection.T0_protocol)
+        assert connection.transmit([0, 2, 1, 0x2C]) == ([], 0x61, 0x00)
+
+        connection.setAutoGetResponse(True)
+        data, sw1, sw2 = connection.transmit([0, 2, 1, 0x2C])
+        assert (len(data), sw1, sw2) == (300, 0x90, 0x00)
+        data, sw1, sw2 = connection.transmit([0, 3, 0, 0, 0], as_bytes=True)
+        assert (data, sw1, sw2) == (bytes(range(0xA0, 0xA8)), 0x90, 0x00)
+        buffer = bytearray(300)
+        assert connection.transmit_into([0, 2, 1, 0x2C], buffer) == (300, 0x90, 0)
+        responses = connection.transmit_many([[0, 2, 0, 2], [0, 3, 0, 0, 0]])
+        assert responses == [
+            ([0, 1], 0x90, 0x00),
+            (list(range(0xA0, 0xA8)), 0x90, 0x00),
+        ]
+        connection.disconnect()
+        connection.release()
+        """,
+    )
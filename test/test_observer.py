@@ -155,3 +155,23 @@ def test_default_observer_updates():
 
     observable = smartcard.Observer.Observable()
     assert smartcard.Observer.Observer().update(observable, "arg") is None
+
+
+def test_observers_copy_on_write():
+    """Verify that the published observer tuple is replaced, not modified,
+    and that obs remains a list."""
+    # pylint: disable=protected-access
+
+    observer = smartcard.Observer.Observer()
+    observable = smartcard.Observer.Observable()
+    published = observable._observers
+    observable.addObserver(observer)
+    assert published == ()
+    assert observable._observers == (observer,)
+    assert observable.obs == [observer]
+
+    published = observable._observers
+    observable.deleteObserver(observer)
+    assert published == (observer,)
+    assert not observable._observers
+    assert observable.obs == []
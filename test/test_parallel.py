@@ -0,0 +1,118 @@
+# pylint: disable=missing-module-docstring
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import multiprocessing
+import threading
+
+import pytest
+
+import smartcard.parallel
+import smartcard.pcsc.PCSCCardRequest
+from smartcard.CardType import ATRCardType
+from smartcard.Exceptions import CardConnectionException
+from smartcard.parallel import JobRunner, run
+
+ATR = [0x3B, 0x00]
+OTHER_ATR = [0x3B, 0x01]
+
+
+class FakeConnection:
+    def __init__(self, reader):
+        self.reader = reader
+        self.connected = False
+
+    def connect(self, protocol=None, mode=None):  # pylint: disable=unused-argument
+        if self.reader == "broken reader":
+            raise CardConnectionException("Unable to connect")
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def release(self):
+        pass
+
+    def getReader(self):
+        return self.reader
+
+
+class FakeReader:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def createConnection(self):
+        return FakeConnection(self.name)
+
+
+@pytest.fixture(autouse=True)
+def fake_readers(monkeypatch, resource_manager):
+    resource_manager.patch(monkeypatch, smartcard.pcsc.PCSCCardRequest)
+    monkeypatch.setattr(smartcard.parallel, "PCSCReader", FakeReader)
+    resource_manager.cards = {f"reader {n}": ATR for n in range(8)}
+
+
+def reader_name(connection):
+    assert connection.connected
+    return connection.getReader()
+
+
+def test_run_concurrently():
+    barrier = threading.Barrier(8, timeout=5)
+
+    def job(connection):
+        # every job waits for the others: one thread per reader
+        barrier.wait()
+        return connection.getReader()
+
+    results = list(run(job))
+    assert sorted(result.result for result in results) == [
+        f"reader {n}" for n in range(8)
+    ]
+    assert all(result.ok and result.elapsed >= 0 for result in results)
+    assert all(result.atr == ATR for result in results)
+
+
+def test_selection(resource_manager):
+    resource_manager.insert("reader 1", OTHER_ATR)
+    resource_manager.insert("reader 2")
+    resource_manager.insert("reader 3", OTHER_ATR)
+    runner = JobRunner(
+        readers=["reader 1", "reader 2", "reader 3", "reader 4"],
+        cardType=ATRCardType(OTHER_ATR),
+    )
+    assert sorted(result.result for result in runner.run(reader_name)) == [
+        "reader 1",
+        "reader 3",
+    ]
+    assert not list(JobRunner(readers=[]).run(reader_name))
+
+
+def test_errors(resource_manager):
+    resource_manager.insert("broken reader", ATR)
+
+    def job(connection):
+        if connection.getReader() == "reader 0":
+            raise ValueError("job failed")
+        return True
+
+    results = {result.reader: result for result in run(job)}
+    assert len(results) == 9
+    assert isinstance(results["reader 0"].exception, ValueError)
+    assert isinstance(results["broken reader"].exception, CardConnectionException)
+    assert results["reader 0"].result is None
+    assert sum(result.ok for result in results.values()) == 7
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="the fake readers are inherited by forked workers only",
+)
+def test_processes():
+    results = list(JobRunner(processes=3).run(reader_name))
+    assert sorted(result.result for result in results) == [
+        f"reader {n}" for n in range(8)
+    ]
@@ -155,6 +155,13 @@ def test_to_hex_string():
         toHexString("foo")
 
 
+def test_to_hex_string_bytes():
+    data_out = "3B 65 00 00 9C"
+    assert toHexString(bytes([0x3B, 0x65, 0x00, 0x00, 0x9C])) == data_out
+    assert toHexString(bytearray([0x3B, 0x65, 0x00, 0x00, 0x9C])) == data_out
+    assert toHexString(memoryview(b"\x3b\x65\x00\x00\x9c")) == data_out
+
+
 def test_hex_list_to_bin_string():
     data_in = [1, 2, 3]
     data_out = "\x01\x02\x03"